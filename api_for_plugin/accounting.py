@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import logging
+import itertools
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from typing import Iterable, Optional
+
+
+logger = logging.getLogger("Accounting")
+
+@dataclass
+class SessionQuotas:
+    """
+    Мягкие квоты одной сессии. Превышение не рвёт сессию, а включает деградацию:
+    - queue_items: очередь в стейте обрезается до окна ±queue_window вокруг текущего трека;
+    - messages_per_min: апдейты Ynison, в которых поменялся только прогресс, рассылаются не чаще progress_interval;
+    - track_cache_entries: жёсткий потолок LRU-кэша метаданных (память сессии предсказуема);
+    - likes, requests_per_min: только отмечаются в /debug/sessions;
+    - enrich_tasks, broadcast_tasks: сколько обогащений и рассылок стейта идёт одновременно,
+      лишние ждут, и из ждущих остаётся только последний стейт (см. supervisor.py).
+    Любое значение переопределяется переменной окружения YM_API_QUOTA_<ИМЯ>, например YM_API_QUOTA_QUEUE_ITEMS=500.
+    """
+    queue_items: int = 1000
+    queue_window: int = 50
+    messages_per_min: int = 600
+    progress_interval: float = 5.0
+    track_cache_entries: int = 512
+    likes: int = 100_000
+    requests_per_min: int = 120
+    enrich_tasks: int = 2
+    broadcast_tasks: int = 1
+
+    @classmethod
+    def from_env(cls) -> "SessionQuotas":
+        values = {}
+        for f in fields(cls):
+            name = f"YM_API_QUOTA_{f.name.upper()}"
+            raw = os.getenv(name)
+            if raw is None:
+                continue
+            try:
+                values[f.name] = type(f.default)(raw)
+            except ValueError:
+                logger.warning(f"{name}={raw!r} is not a valid {type(f.default).__name__}, using {f.default}")
+        return cls(**values)
+
+
+class RateWindow:
+    """Число событий за последние `window` секунд (кольцо посекундных корзин, O(1) памяти)."""
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self._buckets = [0] * window
+        self._seconds = [0] * window
+
+    def hit(self, amount: int = 1):
+        now = int(time.monotonic())
+        i = now % self.window
+        if self._seconds[i] != now:
+            self._seconds[i], self._buckets[i] = now, 0
+        self._buckets[i] += amount
+
+    def total(self) -> int:
+        now = int(time.monotonic())
+        return sum(b for b, s in zip(self._buckets, self._seconds) if now - s < self.window)
+
+
+class LRUCache(OrderedDict):
+    """dict с потолком по числу записей: при переполнении вытесняется давно не использованная."""
+
+    def __init__(self, limit: int, *args, **kwargs):
+        self.limit = limit
+        super().__init__(*args, **kwargs)
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.limit:
+            self.popitem(last=False)
+
+
+def _deep_size(obj) -> int:
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k) + _deep_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item) for item in obj)
+    return size
+
+
+def estimate_bytes(container, items: Optional[Iterable] = None, sample: int = 64) -> int:
+    """
+    Оценка памяти контейнера: сам контейнер + средний размер первых `sample` элементов × их число.
+    Стоимость не зависит от размера библиотеки, поэтому /debug/sessions можно дёргать на проде.
+    """
+    if not container:
+        return sys.getsizeof(container)
+    items = list(itertools.islice(items if items is not None else iter(container), sample))
+    avg = sum(_deep_size(item) for item in items) / len(items)
+    return int(sys.getsizeof(container) + avg * len(container))
+
+
+def window_queue(state_dict: dict, window: int) -> bool:
+    """Оставляет в playable_list только ±window треков вокруг текущего. Возвращает True, если очередь обрезана."""
+    queue = (state_dict.get("player_state") or {}).get("player_queue") or {}
+    items = queue.get("playable_list") or []
+    idx = queue.get("current_playable_index", 0)
+    if len(items) <= 2 * window + 1 or not (0 <= idx < len(items)):
+        return False
+    start = max(0, idx - window)
+    queue["playable_list"] = items[start:idx + window + 1]
+    queue["current_playable_index"] = idx - start
+    queue["windowed_from"] = len(items)
+    return True
@@ -0,0 +1,176 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+from metrics import Gauge, Histogram
+from utils.token_bucket import TokenBucket
+
+
+logger = logging.getLogger("Admission")
+
+CONNECT_QUEUE_DEPTH = Gauge(
+    "ym_api_connect_queue_depth",
+    "Ynison (re)connections waiting for admission",
+)
+CONNECT_WAIT_SECONDS = Histogram(
+    "ym_api_connect_wait_seconds",
+    "Time a Ynison (re)connection waited for admission",
+    labelnames=("priority",),
+    buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+CONNECT_STORM_SECONDS = Histogram(
+    "ym_api_connect_storm_seconds",
+    "Time from the admission queue filling up to it draining (time to recover N sessions)",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+CONNECT_STORM_SIZE = Histogram(
+    "ym_api_connect_storm_size",
+    "How many sessions queued for admission during one storm",
+    buckets=(1, 5, 10, 50, 100, 500, 1000, 5000, 10000),
+)
+
+
+@dataclass
+class _Waiter:
+    token: str
+    urgent: bool
+    not_before: float
+    fut: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class ConnectAdmission:
+    """
+    Глобальный контроль (пере)подключений к Ynison.
+
+    После рестарта API или падения апстрима все сессии переподключаются одновременно:
+    редирект, TLS и рукопожатие state-сокета на каждую. Здесь подключения выдаются
+    из общего token bucket (`rate` в секунду, `burst` подряд), причём:
+    - первое подключение сессии и токены с живыми /ws клиентами идут первыми;
+    - переподключение токена без клиентов откладывается на `idle_delay` (+ случайный `idle_jitter`),
+      и даже после этого уступает приоритетным. Если клиент появится раньше — токен сразу становится приоритетным.
+      Отсрочка действует только пока скорость выбрана: при свободном ведре и пустой очереди токен без клиентов
+      подключается сразу, а отложенные отпускаются, как только ведро восстановилось целиком.
+    REST-запросы старта сессии сюда не входят: их уже ограничивает RequestScheduler.
+    """
+    RECHECK_INTERVAL = 1.0  # как часто пересматривать приоритеты ожидающих
+
+    def __init__(self, rate: float = 2.0, burst: float = 5.0, idle_delay: float = 15.0, idle_jitter: float = 15.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.idle_delay = idle_delay
+        self.idle_jitter = idle_jitter
+        self.is_watched: Callable[[str], bool] = lambda token: False
+        self._waiters: List[_Waiter] = []
+        self._wakeup = asyncio.Event()
+        self._pump: Optional[asyncio.Task] = None
+        self._storm_started: Optional[float] = None
+        self._storm_size = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _priority(self, waiter: _Waiter) -> int:
+        return 0 if waiter.urgent or self.is_watched(waiter.token) else 1
+
+    async def admit(self, token: str, urgent: bool = False):
+        """Ждёт разрешения на подключение. urgent — первое подключение сессии, которое кто-то ждёт прямо сейчас."""
+        now = time.monotonic()
+        priority = 0 if urgent or self.is_watched(token) else 1
+        if not self._waiters and self.bucket.try_acquire():
+            CONNECT_WAIT_SECONDS.observe(0.0, priority="live" if priority == 0 else "idle")
+            return
+
+        # дальше скорость выбрана: в очереди уже ждут или ведро пусто
+        not_before = now if priority == 0 else now + self.idle_delay + random.uniform(0, self.idle_jitter)
+        waiter = _Waiter(token, urgent, not_before, asyncio.get_running_loop().create_future())
+        if not self._waiters:
+            self._storm_started, self._storm_size = now, 0
+        self._waiters.append(waiter)
+        self._storm_size += 1
+        CONNECT_QUEUE_DEPTH.set(len(self._waiters))
+
+        self._wakeup.set()
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run())
+        try:
+            await waiter.fut
+        except asyncio.CancelledError:
+            self._remove(waiter)
+            raise
+
+    def _remove(self, waiter: _Waiter):
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            CONNECT_QUEUE_DEPTH.set(len(self._waiters))
+            self._finish_storm()
+
+    def _finish_storm(self):
+        if self._waiters or self._storm_started is None:
+            return
+        duration = time.monotonic() - self._storm_started
+        CONNECT_STORM_SECONDS.observe(duration)
+        CONNECT_STORM_SIZE.observe(self._storm_size)
+        if self._storm_size > 1:
+            logger.info(f"Reconnect storm of {self._storm_size} sessions drained in {duration:.1f}s")
+        self._storm_started = None
+
+    def _pick(self, now: float) -> Optional[_Waiter]:
+        """
+        Самый старый приоритетный, иначе самый старый отложенный, чья отсрочка истекла.
+        Полное ведро значит, что насыщение кончилось: тогда отсрочка не держит.
+        """
+        recovered = self.bucket.delay(self.bucket.capacity) == 0
+        idle = None
+        for waiter in self._waiters:
+            if self._priority(waiter) == 0:
+                return waiter
+            if idle is None and (recovered or waiter.not_before <= now):
+                idle = waiter
+        return idle
+
+    async def _sleep(self, timeout: float):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), min(timeout, self.RECHECK_INTERVAL))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while self._waiters:
+            now = time.monotonic()
+            waiter = self._pick(now)
+            if waiter is None:
+                deferred = min(w.not_before for w in self._waiters) - now
+                await self._sleep(min(deferred, self.bucket.delay(self.bucket.capacity)))
+                continue
+
+            delay = self.bucket.delay()
+            if delay > 0:
+                await self._sleep(delay)  # за это время мог прийти более приоритетный — выбираем заново
+                continue
+
+            self.bucket.try_acquire()
+            self._waiters.remove(waiter)
+            CONNECT_QUEUE_DEPTH.set(len(self._waiters))
+            priority = "live" if self._priority(waiter) == 0 else "idle"
+            CONNECT_WAIT_SECONDS.observe(time.monotonic() - waiter.enqueued_at, priority=priority)
+            if not waiter.fut.done():
+                waiter.fut.set_result(None)
+            self._finish_storm()
+
+
+_admission: Optional[ConnectAdmission] = None
+
+
+def get_admission() -> ConnectAdmission:
+    global _admission
+    if _admission is None:
+        _admission = ConnectAdmission(
+            rate=float(os.getenv("YM_API_CONNECT_RATE", 2.0)),
+            burst=float(os.getenv("YM_API_CONNECT_BURST", 5.0)),
+        )
+    return _admission
@@ -0,0 +1,133 @@
+"""
+Бенчмарк раздачи стейта в многопроцессном режиме (cluster.py).
+
+Модель: T токенов, у каждого 1-3 /ws клиента, которых балансировщик раскидал по случайным воркерам.
+Владелец токена (по HashRing) сериализует обновлённый стейт и раздаёт его своим клиентам,
+а чужим воркерам — по LocalBus; те отдают полученные байты своим клиентам.
+Апстрим (Ynison, REST) не участвует: меряется только то, что масштабируется числом воркеров.
+
+    python bench_cluster.py --workers 1,2,4,8 --tokens 400 --seconds 5
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+from cluster import Cluster, HashRing
+
+
+def make_state(token: str, tick: int, queue_len: int) -> dict:
+    return {
+        "player_state": {
+            "status": {"paused": False, "progress_ms": tick * 1000, "duration_ms": 215000,
+                       "version": {"device_id": token, "version": tick, "timestamp_ms": tick}},
+            "player_queue": {
+                "current_playable_index": tick % queue_len,
+                "entity_id": f"album-{token}",
+                "playable_list": [
+                    {"playable_id": str(1000 + i), "playable_type": "TRACK", "title": f"Track {i}",
+                     "album_id_optional": "42", "artists_enriched": "Artist", "is_liked": i % 3 == 0,
+                     "cover_uri_enriched": "avatars.yandex.net/get-music-content/42/%%"}
+                    for i in range(queue_len)
+                ],
+            },
+        }
+    }
+
+
+def placement(token: str, workers: int) -> list:
+    """На каких воркерах сидят клиенты токена (детерминированно, одинаково во всех процессах)."""
+    rnd = random.Random(token)
+    return [rnd.randrange(workers) for _ in range(rnd.randint(1, 3))]
+
+
+async def _worker(index: int, workers: int, tokens: list, seconds: float, queue_len: int, directory: str) -> dict:
+    node = Cluster(index, workers, Path(directory)) if workers > 1 else None
+    ring = HashRing(range(workers))
+    received = 0
+    sent_bytes = 0
+
+    async def deliver(data: str, clients: int):
+        nonlocal sent_bytes
+        sent_bytes += len(data) * clients  # вместо ws.send_text
+        await asyncio.sleep(0)
+
+    async def on_state(header, body):
+        nonlocal received
+        received += 1
+        token = header["token"]
+        await deliver(body.decode(), placement(token, workers).count(index))
+
+    owned = [t for t in tokens if ring.owner(t) == index]
+    if node:
+        node.on("state", on_state)
+        await node.start()
+        for token in owned:
+            for peer in placement(token, workers):
+                if peer != index:
+                    node.watchers.setdefault(token, set()).add(peer)
+        while not all(node.bus.path(i).exists() for i in range(workers)):
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.2)
+
+    published = 0
+    deadline = time.monotonic() + seconds
+    tick = 0
+    while time.monotonic() < deadline:
+        for token in owned:
+            data = json.dumps(make_state(token, tick, queue_len))
+            local = placement(token, workers).count(index)
+            if node:
+                await asyncio.gather(deliver(data, local), node.publish(token, data))
+            else:
+                await deliver(data, local)
+            published += 1
+        tick += 1
+        if not owned:
+            await asyncio.sleep(0.05)
+
+    await asyncio.sleep(0.3)  # дочитываем то, что ещё в сокетах
+    if node:
+        await node.stop()
+    return {"published": published, "received": received, "bytes": sent_bytes}
+
+
+def _run_worker(index, workers, tokens, seconds, queue_len, directory, results):
+    results.put(asyncio.run(_worker(index, workers, tokens, seconds, queue_len, directory)))
+
+
+def run(workers: int, tokens: int, seconds: float, queue_len: int) -> dict:
+    names = [f"token-{i}" for i in range(tokens)]
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    with tempfile.TemporaryDirectory() as directory:
+        processes = [ctx.Process(target=_run_worker, args=(i, workers, names, seconds, queue_len, directory, results))
+                     for i in range(workers)]
+        for process in processes:
+            process.start()
+        stats = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    return {
+        "workers": workers,
+        "states_per_s": sum(s["published"] for s in stats) / seconds,
+        "bus_msgs_per_s": sum(s["received"] for s in stats) / seconds,
+        "client_mb_per_s": sum(s["bytes"] for s in stats) / seconds / 1e6,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--queue-len", type=int, default=50, help="tracks in each state's queue (payload size)")
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'states/s':>10} {'bus msg/s':>10} {'client MB/s':>12}")
+    for count in (int(w) for w in args.workers.split(",")):
+        r = run(count, args.tokens, args.seconds, args.queue_len)
+        print(f"{r['workers']:>7} {r['states_per_s']:>10.0f} {r['bus_msgs_per_s']:>10.0f} {r['client_mb_per_s']:>12.1f}")
@@ -0,0 +1,305 @@
+import os
+import sys
+import json
+import uuid
+import bisect
+import socket
+import struct
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Sequence, Set, Tuple
+from utils.private_files import private_dir
+
+
+logger = logging.getLogger("Cluster")
+
+# заголовок кадра: длина JSON-заголовка и длина сырого тела
+FRAME = struct.Struct(">II")
+MAX_FRAME = 16 * 1024 * 1024
+
+Handler = Callable[[dict, bytes], Awaitable[Optional[dict]]]
+
+
+class HashRing:
+    """Консистентное хэширование токенов по воркерам: при смене числа воркеров переезжает ~1/N токенов."""
+
+    def __init__(self, nodes: Sequence[int], replicas: int = 64):
+        self._points = sorted((self._hash(f"{node}:{i}"), node) for node in nodes for i in range(replicas))
+        self._keys = [point for point, _ in self._points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def owner(self, key: str) -> int:
+        idx = bisect.bisect(self._keys, self._hash(key)) % len(self._points)
+        return self._points[idx][1]
+
+
+class LocalBus:
+    """
+    Шина между воркерами одного хоста поверх UNIX-сокетов.
+
+    У каждого воркера свой сокет `worker-<index>.sock`, соединения к соседям открываются лениво
+    и переиспользуются. Кадр — JSON-заголовок и необязательное сырое тело (стейт уходит как есть,
+    без повторной сериализации). Заголовок с "rid" — запрос: ответ приходит по тому же соединению.
+    По шине идут OAuth-токены и управляющие операции, поэтому каталог сокетов должен быть только нашим (0700),
+    а сами сокеты — 0600; иначе start() не поднимает шину.
+    """
+
+    def __init__(self, index: int, directory: Path, handler: Handler):
+        self.index = index
+        self.directory = directory
+        self.handler = handler
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Dict[int, Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = {}
+        self._peer_locks: Dict[int, asyncio.Lock] = {}
+        self._readers: Set[asyncio.Task] = set()
+        self._inbound: Set[asyncio.StreamWriter] = set()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def path(self, index: int) -> Path:
+        return self.directory / f"worker-{index}.sock"
+
+    async def start(self):
+        private_dir(str(self.directory), "ym_api_bus", strict=True)
+        path = self.path(self.index)
+        path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(self._serve, path=str(path))
+        os.chmod(path, 0o600)
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+        for writer in [*self._inbound, *(w for _, w in self._peers.values())]:
+            writer.close()
+        for task in list(self._readers):
+            task.cancel()
+        self._peers.clear()
+        self.path(self.index).unlink(missing_ok=True)
+
+    @staticmethod
+    def _encode(header: dict, body: bytes = b"") -> bytes:
+        raw = json.dumps(header, separators=(",", ":")).encode()
+        return FRAME.pack(len(raw), len(body)) + raw + body
+
+    @staticmethod
+    async def _read(reader: asyncio.StreamReader) -> Tuple[dict, bytes]:
+        head_len, body_len = FRAME.unpack(await reader.readexactly(FRAME.size))
+        if head_len + body_len > MAX_FRAME:
+            raise ValueError(f"Frame too large: {head_len + body_len}")
+        data = await reader.readexactly(head_len + body_len)
+        return json.loads(data[:head_len]), data[head_len:]
+
+    def _track(self, task: asyncio.Task):
+        self._readers.add(task)
+        task.add_done_callback(self._readers.discard)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._inbound.add(writer)
+        try:
+            while True:
+                header, body = await self._read(reader)
+                self._track(asyncio.create_task(self._dispatch(header, body, writer)))
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # CancelledError не пробрасываем: иначе asyncio при остановке цикла пишет трейсбек из колбэка сервера
+            pass
+        except Exception as e:
+            logger.error(f"Bus connection failed: {e}")
+        finally:
+            self._inbound.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, header: dict, body: bytes, writer: asyncio.StreamWriter):
+        try:
+            reply = await self.handler(header, body)
+        except Exception as e:
+            logger.error(f"Bus handler {header.get('op')} failed: {e}")
+            reply = {"error": str(e)}
+        if "rid" in header and not writer.is_closing():
+            writer.write(self._encode({"rid": header["rid"], "reply": reply or {}}))
+            await writer.drain()
+
+    async def _connect(self, peer: int) -> asyncio.StreamWriter:
+        conn = self._peers.get(peer)
+        if conn and not conn[1].is_closing():
+            return conn[1]
+        async with self._peer_locks.setdefault(peer, asyncio.Lock()):
+            conn = self._peers.get(peer)
+            if conn and not conn[1].is_closing():
+                return conn[1]
+            reader, writer = await asyncio.open_unix_connection(str(self.path(peer)))
+            self._peers[peer] = (reader, writer)
+            self._track(asyncio.create_task(self._read_replies(peer, reader)))
+            return writer
+
+    async def _read_replies(self, peer: int, reader: asyncio.StreamReader):
+        try:
+            while True:
+                header, _ = await self._read(reader)
+                fut = self._pending.pop(header.get("rid"), None)
+                if fut and not fut.done():
+                    fut.set_result(header.get("reply") or {})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._peers.pop(peer, None)
+
+    async def send(self, peer: int, header: dict, body: bytes = b""):
+        writer = await self._connect(peer)
+        writer.write(self._encode({**header, "from": self.index}, body))
+        await writer.drain()
+
+    async def request(self, peer: int, header: dict, body: bytes = b"", timeout: float = 10.0) -> dict:
+        rid = uuid.uuid4().hex
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[rid] = fut
+        try:
+            await self.send(peer, {**header, "rid": rid}, body)
+            return await asyncio.wait_for(fut, timeout)
+        finally:
+            self._pending.pop(rid, None)
+
+
+class Cluster:
+    """
+    Несколько процессов-воркеров API на одном хосте.
+
+    Сессия токена (YnisonSession) живёт ровно в одном воркере — владельце по HashRing.
+    /ws и /control принимает любой воркер: чужие токены он проксирует владельцу через LocalBus,
+    а владелец рассылает стейт подписанным воркерам (op "state"), которые раздают его своим /ws клиентам.
+    Обработчики операций регистрирует main через `on(op, handler)`.
+    """
+
+    def __init__(self, index: int, workers: int, directory: Path):
+        self.index = index
+        self.workers = workers
+        self.ring = HashRing(range(workers))
+        self.bus = LocalBus(index, directory, self._on_message)
+        self.watchers: Dict[str, Set[int]] = {}  # token -> воркеры с /ws клиентами этого токена
+        self.handlers: Dict[str, Handler] = {}
+
+    def owner(self, token: str) -> int:
+        return self.ring.owner(token)
+
+    def owns(self, token: str) -> bool:
+        return self.owner(token) == self.index
+
+    def remote_watchers(self, token: str) -> int:
+        """Сколько других воркеров держат /ws клиентов токена (знает только владелец)."""
+        return len(self.watchers.get(token, ()))
+
+    def on(self, op: str, handler: Handler):
+        self.handlers[op] = handler
+
+    async def start(self):
+        await self.bus.start()
+        logger.info(f"Worker {self.index}/{self.workers} listening on {self.bus.path(self.index)}")
+
+    async def stop(self):
+        await self.bus.stop()
+
+    async def _on_message(self, header: dict, body: bytes) -> Optional[dict]:
+        op, token = header.get("op"), header.get("token")
+        if op == "watch":
+            self.watchers.setdefault(token, set()).add(header["from"])
+        elif op == "unwatch":
+            peers = self.watchers.get(token)
+            if peers is not None:
+                peers.discard(header["from"])
+                if not peers:
+                    del self.watchers[token]
+            return {}
+        handler = self.handlers.get(op)
+        if handler is None:
+            return {"error": f"unknown op {op}"}
+        return await handler(header, body)
+
+    async def call(self, token: str, op: str, body: bytes = b"", timeout: float = 10.0, **payload) -> dict:
+        """Вызывает операцию у воркера-владельца токена."""
+        return await self.bus.request(self.owner(token), {"op": op, "token": token, **payload}, body, timeout)
+
+    async def send_state(self, peer: int, token: str, data: str):
+        try:
+            await self.bus.send(peer, {"op": "state", "token": token}, data.encode())
+        except (OSError, ConnectionError) as e:
+            logger.warning(f"Worker {peer} unreachable, dropping its watch on {token[:5]}: {e}")
+            self.watchers.get(token, set()).discard(peer)
+
+    async def publish(self, token: str, data: str):
+        """Рассылает уже сериализованный стейт воркерам, у которых есть клиенты этого токена."""
+        peers = self.watchers.get(token)
+        if peers:
+            await asyncio.gather(*(self.send_state(peer, token, data) for peer in list(peers)))
+
+    async def unwatch(self, token: str):
+        try:
+            await self.bus.send(self.owner(token), {"op": "unwatch", "token": token})
+        except (OSError, ConnectionError):
+            pass
+
+
+def bus_directory() -> Path:
+    """YM_API_BUS_DIR или свой для пользователя ОС каталог во временной папке; чужой или открытый — ошибка."""
+    return private_dir(os.getenv("YM_API_BUS_DIR"), "ym_api_bus", strict=True)
+
+
+_cluster: Optional[Cluster] = None
+
+
+def get_cluster() -> Optional[Cluster]:
+    """Кластер текущего воркера; None в обычном однопроцессном режиме (воркер не запущен через run_cluster)."""
+    global _cluster
+    workers = int(os.getenv("YM_API_WORKERS", "1"))
+    index = os.getenv("YM_API_WORKER_INDEX")
+    if _cluster is None and workers > 1 and index is not None:
+        _cluster = Cluster(int(index), workers, bus_directory())
+    return _cluster
+
+
+def _serve_worker(index: int, workers: int, sock: socket.socket):
+    os.environ["YM_API_WORKERS"] = str(workers)
+    os.environ["YM_API_WORKER_INDEX"] = str(index)
+    sys.path.insert(0, str(Path(__file__).parent))
+
+    import uvicorn
+    from main import app
+    uvicorn.Server(uvicorn.Config(app, log_level="info")).run(sockets=[sock])
+
+
+def run_cluster(workers: int, host: str = "0.0.0.0", port: int = 8000):
+    """Поднимает `workers` процессов uvicorn на одном слушающем сокете."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_serve_worker, args=(i, workers, sock), name=f"ym-api-{i}") for i in range(workers)]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {workers} workers on {host}:{port}")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+            process.join()
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the API as several worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] [Cluster] %(message)s', datefmt='%H:%M:%S')
+    run_cluster(args.workers, args.host, args.port)
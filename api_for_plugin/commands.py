@@ -0,0 +1,273 @@
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from metrics import Histogram
+from supervisor import Spawn, spawn_unsupervised
+
+
+logger = logging.getLogger("Commands")
+
+COMMAND_QUEUE_SECONDS = Histogram(
+    "ym_api_command_queue_seconds",
+    "Time a /control command waited in the per-token queue",
+    labelnames=("action",),
+)
+COMMAND_EXEC_SECONDS = Histogram(
+    "ym_api_command_exec_seconds",
+    "Time spent executing a /control command",
+    labelnames=("action",),
+)
+COMMAND_COALESCED_SIZE = Histogram(
+    "ym_api_command_coalesced_size",
+    "How many /control presses were folded into one upstream command",
+    labelnames=("action",),
+    buckets=(1, 2, 3, 5, 10, 20, 50),
+)
+
+# next/prev/play_pause, которые можно склеить в одну команду transport
+TRANSPORT_OFFSETS = {"next": 1, "prev": -1, "play_pause": 0}
+# volume_up/volume_down/mute, которые склеиваются в одну команду volume
+VOLUME_STEPS = {"volume_up": 1, "volume_down": -1, "mute": 0}
+
+
+@dataclass
+class Command:
+    action: str
+    params: Dict = field(default_factory=dict)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    merged: List["Command"] = field(default_factory=list)
+
+    @property
+    def originals(self) -> List["Command"]:
+        return self.merged or [self]
+
+
+def fold_transport(batch: List[Command]) -> Command:
+    """
+    Склеивает подряд идущие next/prev/play_pause в одну команду transport.
+
+    offset — суммарный сдвиг по очереди; skip — был ли переход (он снимает паузу);
+    toggle — чётность нажатий play_pause после последнего перехода (пара нажатий взаимно гасится).
+    """
+    offset, skip, toggle = 0, False, False
+    for command in batch:
+        if command.action == "play_pause":
+            toggle = not toggle
+        else:
+            offset += TRANSPORT_OFFSETS[command.action]
+            skip, toggle = True, False
+    return Command(
+        action="transport",
+        params={"offset": offset, "skip": skip, "toggle": toggle},
+        enqueued_at=batch[0].enqueued_at,
+        merged=list(batch),
+    )
+
+
+def fold_volume(batch: List[Command]) -> Command:
+    """
+    Склеивает подряд идущие volume_up/volume_down/mute в одну команду volume по тем же правилам,
+    что и fold_transport: шаги суммируются и снимают mute, mute — чётность нажатий после последнего шага.
+    """
+    steps, toggle_mute = 0, False
+    for command in batch:
+        if command.action == "mute":
+            toggle_mute = not toggle_mute
+        else:
+            steps += VOLUME_STEPS[command.action]
+            toggle_mute = False
+    return Command(
+        action="volume",
+        params={"steps": steps, "toggle_mute": toggle_mute},
+        enqueued_at=batch[0].enqueued_at,
+        merged=list(batch),
+    )
+
+
+def fold_seek(batch: List[Command]) -> Command:
+    """
+    Склеивает серию seek в одну цель: последняя абсолютная позиция плюс все относительные сдвиги после неё.
+    """
+    position_ms, offset_ms = None, 0
+    for command in batch:
+        if command.params.get("position_ms") is not None:
+            position_ms, offset_ms = command.params["position_ms"], 0
+        else:
+            offset_ms += command.params.get("offset_ms") or 0
+    return Command(
+        action="seek",
+        params={"position_ms": position_ms, "offset_ms": offset_ms},
+        enqueued_at=batch[0].enqueued_at,
+        merged=list(batch),
+    )
+
+
+# действие -> функция склейки; склеиваются только соседние команды одной группы
+COALESCERS = {
+    **{action: fold_transport for action in TRANSPORT_OFFSETS},
+    **{action: fold_volume for action in VOLUME_STEPS},
+    "seek": fold_seek,
+}
+# команды, которые собирает сама очередь; снаружи (/control, /ws) их не принимаем
+FOLDED_ACTIONS = frozenset({"transport", "volume"})
+
+# шаги, из которых можно собрать макрос
+MACRO_ACTIONS = frozenset({*TRANSPORT_OFFSETS, *VOLUME_STEPS, "like", "dislike", "seek"})
+MAX_MACRO_STEPS = 16
+
+
+def parse_macro_steps(raw) -> List[Tuple[str, Dict]]:
+    """
+    Нормализует шаги макроса в список (action, params).
+    Шаг — либо строка ("next"), либо {"action": "seek", "params": {"position_ms": 0}}.
+    """
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("steps must be a non-empty list")
+    if len(raw) > MAX_MACRO_STEPS:
+        raise ValueError(f"too many steps (max {MAX_MACRO_STEPS})")
+
+    steps = []
+    for item in raw:
+        if isinstance(item, str):
+            action, params = item, {}
+        elif isinstance(item, dict):
+            action, params = item.get("action"), item.get("params") or {}
+        else:
+            raise ValueError(f"invalid macro step: {item!r}")
+        if action not in MACRO_ACTIONS or not isinstance(params, dict):
+            raise ValueError(f"unsupported macro step: {action}")
+        steps.append((action, params))
+    return steps
+
+
+class CommandQueue:
+    """
+    Упорядоченная очередь команд одного токена.
+
+    /control только ставит команду в очередь и сразу отвечает её ID, а выполнение идёт
+    в фоне строго по порядку. Результат уходит событием в /ws поток токена через `on_event`.
+
+    Подряд идущие next/prev/play_pause в пределах `coalesce_window` секунд склеиваются
+    в одну команду transport (см. fold_transport): пять нажатий Next — один запрос в Ynison.
+    Так же volume_up/volume_down/mute склеиваются в одну абсолютную цель громкости (fold_volume),
+    а серия seek — в одну позицию (fold_seek).
+    Воркер очереди запускается через `spawn` (в сессии — её TaskGroup, вид "commands").
+    """
+
+    def __init__(self, execute: Callable[[Command], Awaitable[bool]],
+                 on_event: Optional[Callable[[dict], Awaitable[None]]] = None,
+                 coalesce_window: float = 0.12, spawn: Spawn = spawn_unsupervised):
+        self.execute = execute
+        self.on_event = on_event
+        self.coalesce_window = coalesce_window
+        self.spawn = spawn
+        self._pending: Deque[Command] = deque()
+        self._taken: List[Command] = []  # забранные из очереди, но ещё без результата (пачка или выполняемая)
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def submit(self, action: str, params: Optional[Dict] = None) -> Command:
+        command = Command(action=action, params=params or {})
+        self._pending.append(command)
+        self._wakeup.set()
+        if self._worker is None or self._worker.done():
+            self._worker = self.spawn("commands", self._run())  # None — группа закрыта, команду провалит close()
+        return command
+
+    async def _wait(self, timeout: Optional[float] = None) -> bool:
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _next(self) -> Command:
+        while not self._pending:
+            await self._wait()
+        command = self._pending.popleft()
+        batch = self._taken = [command]
+        fold = COALESCERS.get(command.action)
+        if fold is None or self.coalesce_window <= 0:
+            return command
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.coalesce_window
+        while True:
+            while self._pending and COALESCERS.get(self._pending[0].action) is fold:
+                batch.append(self._pending.popleft())
+            if self._pending:
+                break  # следующая команда другого типа — порядок не нарушаем
+            remaining = deadline - loop.time()
+            if remaining <= 0 or not await self._wait(remaining):
+                break
+
+        COMMAND_COALESCED_SIZE.observe(len(batch), action=command.action)
+        return command if len(batch) == 1 else fold(batch)
+
+    async def _run(self):
+        while True:
+            command = await self._next()
+            started = time.monotonic()
+            waited = started - command.enqueued_at
+            COMMAND_QUEUE_SECONDS.observe(waited, action=command.action)
+
+            error = None
+            try:
+                ok = await self.execute(command)
+                if not ok:
+                    error = "command was not delivered"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Command {command.action} failed: {e}")
+                error = str(e)
+
+            elapsed = time.monotonic() - started
+            COMMAND_EXEC_SECONDS.observe(elapsed, action=command.action)
+            while self._taken:
+                original = self._taken.pop(0)
+                await self._emit(original, error, started - original.enqueued_at, elapsed, len(command.originals))
+
+    async def _emit(self, command: Command, error: Optional[str], waited: float, elapsed: float, coalesced: int = 1):
+        if not self.on_event:
+            return
+        event = {
+            "event": "command_result",
+            "id": command.id,
+            "action": command.action,
+            "status": "failed" if error else "done",
+            "queue_ms": round(waited * 1000, 1),
+            "exec_ms": round(elapsed * 1000, 1),
+        }
+        if coalesced > 1:
+            event["coalesced"] = coalesced
+        if error:
+            event["error"] = error
+        try:
+            await self.on_event(event)
+        except Exception as e:
+            logger.error(f"Failed to emit command event: {e}")
+
+    async def close(self):
+        """Останавливает очередь. Каждая команда, оставшаяся без результата, получает command_result failed."""
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        unfinished = [*self._taken, *self._pending]
+        self._taken, self._pending = [], deque()
+        now = time.monotonic()
+        for command in unfinished:
+            await self._emit(command, "session closed", now - command.enqueued_at, 0.0)
@@ -0,0 +1,4 @@
+"""
+Локальные стенды апстримов (Ynison, REST) для бенчмарков и тестов без сети.
+Запускаются из каталога api_for_plugin: `python -m fakes.ynison --port 8765`.
+"""
@@ -0,0 +1,261 @@
+"""
+Фейковый REST Яндекс Музыки на aiohttp — ровно те эндпоинты, которыми пользуется YandexMusicAPI:
+
+    GET  /account/status
+    GET  /users/{uid}/likes/tracks, /users/{uid}/dislikes/tracks
+    POST /users/{uid}/likes|dislikes/tracks/add-multiple|remove   (form: track-ids)
+    POST /tracks                                                   (form: track-ids)
+
+Пользователь выводится из токена детерминированно: uid и размер библиотеки (лог-равномерно между
+library_min и library_max) одинаковы от запуска к запуску, поэтому нагрузочные прогоны воспроизводимы.
+ID треков берутся из начала того же каталога, что и очереди fakes/ynison.py: лайкнут примерно каждый
+LIKE_DENSITY-й трек очереди, как у живого пользователя, слушающего свою библиотеку.
+Библиотека отдаётся с ревизией и ETag; мутации поднимают ревизию.
+
+Задержка (общая + на каждый трек в /tracks, чтобы батчинг было видно), джиттер и доля ответов 503
+настраиваются в FakeRestConfig. Токены из reject_tokens получают 401.
+
+    YM_API_REST_URL=http://127.0.0.1:8766 python main.py
+    python -m fakes.rest --port 8766 --library-min 1000 --library-max 100000 --latency 0.05 --error-rate 0.01
+"""
+import json
+import math
+import random
+import asyncio
+import hashlib
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from aiohttp import web
+from fakes.ynison import ALBUM_BASE, TRACK_BASE, duration_ms
+
+
+logger = logging.getLogger("FakeRest")
+
+CATALOG_SIZE = 2_000_000
+LIKE_DENSITY = 4
+
+
+@dataclass
+class FakeRestConfig:
+    library_min: int = 1_000
+    library_max: int = 100_000
+    dislike_ratio: float = 0.02       # размер dislikes относительно likes
+    latency: float = 0.0              # задержка каждого ответа, с
+    jitter: float = 0.0               # + равномерная случайная добавка 0..jitter, с
+    latency_per_track: float = 0.0    # добавка к /tracks за каждый запрошенный трек, с
+    error_rate: float = 0.0           # доля запросов, получающих 503
+    reject_tokens: Tuple[str, ...] = ("invalid",)
+    seed: Optional[int] = None
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.sha256(value.encode()).digest()[:8], "big")
+
+
+def track_object(track_id: int) -> dict:
+    """Трек в форме ответа /tracks (только поля, на которые смотрят клиенты, плюс типичный балласт)."""
+    index = track_id - TRACK_BASE
+    album_id = ALBUM_BASE + index // 12
+    artist_id = 500_000 + index // 40
+    cover = f"avatars.yandex.net/get-music-content/{album_id}/fake/%%"
+    return {
+        "id": str(track_id),
+        "realId": str(track_id),
+        "title": f"Track {index}",
+        "available": True,
+        "durationMs": duration_ms(index),
+        "coverUri": cover,
+        "ogImage": cover,
+        "artists": [{"id": artist_id, "name": f"Artist {artist_id}", "various": False, "composer": False}],
+        "albums": [{"id": album_id, "title": f"Album {album_id}", "year": 2000 + index % 25, "coverUri": cover,
+                    "trackPosition": {"volume": 1, "index": index % 12 + 1}}],
+        "lyricsAvailable": index % 3 == 0,
+        "type": "music",
+    }
+
+
+class FakeUser:
+    """Синтетический пользователь: библиотека генерируется при первом обращении и живёт в памяти."""
+
+    def __init__(self, token: str, config: FakeRestConfig):
+        seed = _hash(token)
+        self.uid = str(100_000_000 + seed % 900_000_000)
+        self.login = f"user{self.uid}"
+        low, high = max(1, config.library_min), max(config.library_min, config.library_max)
+        size = int(math.exp(random.Random(seed).uniform(math.log(low), math.log(high))))
+        self._seed = seed
+        self._sizes = {"likes": size, "dislikes": max(0, int(size * config.dislike_ratio))}
+        self._libraries: Dict[str, Dict[int, int]] = {}  # тип -> {track_id: timestamp}, порядок вставки = порядок в ответе
+        self.revisions: Dict[str, int] = {"likes": 1, "dislikes": 1}
+
+    def library(self, type_: str) -> Dict[int, int]:
+        if not self._libraries:
+            rnd = random.Random(self._seed)
+            likes, dislikes = self._sizes["likes"], self._sizes["dislikes"]
+            span = min(CATALOG_SIZE, (likes + dislikes) * LIKE_DENSITY)
+            ids = rnd.sample(range(TRACK_BASE, TRACK_BASE + span), likes + dislikes)
+            self._libraries = {
+                "likes": {track_id: 1_600_000_000 + i for i, track_id in enumerate(ids[:likes])},
+                "dislikes": {track_id: 1_600_000_000 + i for i, track_id in enumerate(ids[likes:])},
+            }
+        return self._libraries[type_]
+
+    def mutate(self, type_: str, action: str, track_ids: List[int]) -> int:
+        tracks = self.library(type_)
+        for track_id in track_ids:
+            if action == "add-multiple":
+                tracks.pop(track_id, None)
+                tracks[track_id] = 1_700_000_000 + self.revisions[type_]
+            else:
+                tracks.pop(track_id, None)
+        self.revisions[type_] += 1
+        return self.revisions[type_]
+
+
+class FakeRest:
+    """Фейковый REST в текущем event loop: `base_url = await fake.start()`, затем `await fake.stop()`."""
+
+    def __init__(self, config: Optional[FakeRestConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeRestConfig()
+        self.host = host
+        self.port = port
+        self.users: Dict[str, FakeUser] = {}  # token -> пользователь
+        self.stats: Counter = Counter()
+        self._random = random.Random(self.config.seed)
+        self._runner: Optional[web.AppRunner] = None
+        self.app = web.Application(middlewares=[self._faults])
+        self.app.router.add_get("/account/status", self.account_status)
+        self.app.router.add_get("/users/{uid}/{type:likes|dislikes}/tracks", self.library)
+        self.app.router.add_post("/users/{uid}/{type:likes|dislikes}/tracks/{action:add-multiple|remove}", self.library_action)
+        self.app.router.add_post("/tracks", self.tracks)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        self._runner = web.AppRunner(self.app, handle_signals=False)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Fake REST listening on {self.base_url}")
+        return self.base_url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    @staticmethod
+    def _token(request: web.Request) -> str:
+        return request.headers.get("Authorization", "").removeprefix("OAuth ").strip()
+
+    def user(self, token: str) -> FakeUser:
+        user = self.users.get(token)
+        if user is None:
+            user = self.users[token] = FakeUser(token, self.config)
+        return user
+
+    @staticmethod
+    def _error(status: int, name: str, message: str) -> web.Response:
+        return web.json_response({"error": {"name": name, "message": message}}, status=status)
+
+    @web.middleware
+    async def _faults(self, request: web.Request, handler):
+        resource = request.match_info.route.resource
+        self.stats[f"{request.method} {resource.canonical if resource else request.path}"] += 1
+        delay = self.config.latency + self._random.uniform(0, self.config.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        token = self._token(request)
+        if not token or token in self.config.reject_tokens:
+            self.stats["unauthorized"] += 1
+            return self._error(401, "session-expired", "Your OAuth token is invalid")
+        if self._random.random() < self.config.error_rate:
+            self.stats["errors"] += 1
+            return self._error(503, "service-unavailable", "Injected failure")
+        return await handler(request)
+
+    @staticmethod
+    async def _track_ids(request: web.Request) -> List[int]:
+        form = await request.post()
+        return [int(tid.split(":")[0]) for tid in str(form.get("track-ids", "")).split(",") if tid.strip().isdigit()]
+
+    async def account_status(self, request: web.Request) -> web.Response:
+        user = self.user(self._token(request))
+        return web.json_response({"invocationInfo": {"req-id": "fake"}, "result": {
+            "account": {"uid": int(user.uid), "login": user.login, "displayName": user.login, "serviceAvailable": True},
+            "permissions": {"values": ["landing-play", "feed-play", "mix-play"]},
+            "plus": {"hasPlus": True, "isTutorialCompleted": True},
+        }})
+
+    async def library(self, request: web.Request) -> web.Response:
+        user = self.user(self._token(request))
+        if request.match_info["uid"] != user.uid:
+            return self._error(403, "not-allowed", "Library of another user")
+        type_ = request.match_info["type"]
+        etag = f'"{user.uid}-{type_}-{user.revisions[type_]}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        tracks = [{"id": str(tid), "albumId": str(ALBUM_BASE + (tid - TRACK_BASE) // 12), "timestamp": ts}
+                  for tid, ts in user.library(type_).items()]
+        body = json.dumps({"invocationInfo": {"req-id": "fake"}, "result": {"library": {
+            "uid": int(user.uid), "revision": user.revisions[type_], "tracks": tracks,
+        }}})
+        return web.Response(text=body, content_type="application/json", headers={"ETag": etag})
+
+    async def library_action(self, request: web.Request) -> web.Response:
+        user = self.user(self._token(request))
+        if request.match_info["uid"] != user.uid:
+            return self._error(403, "not-allowed", "Library of another user")
+        revision = user.mutate(request.match_info["type"], request.match_info["action"], await self._track_ids(request))
+        return web.json_response({"result": {"revision": revision}})
+
+    async def tracks(self, request: web.Request) -> web.Response:
+        track_ids = await self._track_ids(request)
+        if self.config.latency_per_track > 0:
+            await asyncio.sleep(self.config.latency_per_track * len(track_ids))
+        result = [track_object(tid) for tid in track_ids if TRACK_BASE <= tid < TRACK_BASE + CATALOG_SIZE]
+        return web.json_response({"invocationInfo": {"req-id": "fake"}, "result": result})
+
+
+async def _serve(config: FakeRestConfig, host: str, port: int):
+    fake = FakeRest(config, host, port)
+    await fake.start()
+    print(f"YM_API_REST_URL={fake.base_url}")
+    try:
+        while True:
+            await asyncio.sleep(60)
+            logger.info(f"users={len(fake.users)} {dict(fake.stats)}")
+    finally:
+        await fake.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--library-min", type=int, default=FakeRestConfig.library_min)
+    parser.add_argument("--library-max", type=int, default=FakeRestConfig.library_max)
+    parser.add_argument("--dislike-ratio", type=float, default=FakeRestConfig.dislike_ratio)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--latency-per-track", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--reject-tokens", default="invalid", help="comma-separated tokens answered with 401")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] [FakeRest] %(message)s', datefmt='%H:%M:%S')
+    config = FakeRestConfig(
+        library_min=args.library_min, library_max=args.library_max, dislike_ratio=args.dislike_ratio,
+        latency=args.latency, jitter=args.jitter, latency_per_track=args.latency_per_track,
+        error_rate=args.error_rate, reject_tokens=tuple(filter(None, args.reject_tokens.split(","))), seed=args.seed,
+    )
+    try:
+        asyncio.run(_serve(config, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,385 @@
+"""
+Фейковый Ynison на aiohttp: редиректор и PutYnisonState с теми же формами сообщений, что у настоящего сервиса.
+
+У каждого токена своя "комната": общий стейт (очередь из queue_size треков, статус, устройства)
+и все сокеты этого токена. Команды update_player_state / update_playing_status / update_volume_info
+применяются к стейту, после чего полный стейт рассылается всем сокетам комнаты, как это делает Ynison.
+Неизвестные сообщения просто подтверждаются текущим стейтом.
+
+Неисправности включаются в FakeYnisonConfig: задержка ответов с джиттером, ответ редиректора
+ошибкой с backoff, обрыв сокета стейта без close-фрейма (клиент видит 1006) с заданной вероятностью
+или через заданное время жизни соединения.
+
+    YM_API_YNISON_URL=ws://127.0.0.1:8765 python main.py
+    python -m fakes.ynison --port 8765 --queue-size 200 --latency 0.03 --drop-rate 0.01
+"""
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Set
+from aiohttp import web, WSMsgType
+from ynison.player import REDIRECT_PATH, STATE_PATH
+
+
+logger = logging.getLogger("FakeYnison")
+
+TRACK_BASE = 10_000_000
+ALBUM_BASE = 1_000_000
+
+
+@dataclass
+class FakeYnisonConfig:
+    queue_size: int = 50
+    latency: float = 0.0              # задержка перед каждым ответом сервера, с
+    jitter: float = 0.0               # + равномерная случайная добавка 0..jitter, с
+    progress_interval: float = 0.0    # как часто "играющее" устройство шлёт прогресс; 0 — не шлёт
+    redirect_error_rate: float = 0.0  # доля редиректов, на которые приходит ошибка с backoff
+    backoff_ms: int = 5000
+    drop_rate: float = 0.0            # вероятность оборвать сокет стейта (1006) после входящего сообщения
+    drop_after: float = 0.0           # обрывать каждый сокет стейта через столько секунд; 0 — никогда
+    seed: Optional[int] = None
+
+
+def _ms() -> int:
+    return int(time.time() * 1000)
+
+
+def playable(index: int) -> dict:
+    return {
+        "playable_id": str(TRACK_BASE + index),
+        "album_id_optional": str(ALBUM_BASE + index // 12),
+        "playable_type": "TRACK",
+        "from": "desktop_win-own_tracks-track-default",
+        "title": "",
+        "cover_url_optional": f"avatars.yandex.net/get-music-content/{ALBUM_BASE + index // 12}/fake/%%",
+        "navigation_id_optional": None,
+        "playback_action_id_optional": None,
+    }
+
+
+def duration_ms(index: int) -> int:
+    return 150_000 + (index * 7919) % 120_000
+
+
+def error_message(message: str, code: str, http_code: int, grpc_code: int, backoff_ms: Optional[int] = None) -> dict:
+    details = {"ynison_error_code": code}
+    if backoff_ms is not None:
+        details["ynison_backoff_millis"] = str(backoff_ms)
+    return {"error": {
+        "details": details,
+        "grpc_code": grpc_code,
+        "http_code": http_code,
+        "http_status": {401: "Unauthorized", 429: "Too Many Requests"}.get(http_code, "Error"),
+        "message": message,
+    }}
+
+
+def parse_protocol(request: web.Request) -> dict:
+    """Достаёт JSON из Sec-WebSocket-Protocol: "Bearer, v2, {...}" (клиент может склеить без пробелов)."""
+    raw = request.headers.get("Sec-WebSocket-Protocol", "")
+    parts = raw.split(",", 2)
+    try:
+        return json.loads(parts[2]) if len(parts) == 3 else {}
+    except json.JSONDecodeError:
+        return {}
+
+
+class Room:
+    """Стейт одного токена и его сокеты."""
+
+    def __init__(self, token: str, queue_size: int):
+        self.token = token
+        self.player_id = "fake-desktop-" + hashlib.sha256(token.encode()).hexdigest()[:12]
+        self.version = 0
+        self.sockets: Dict[web.WebSocketResponse, Optional[str]] = {}  # сокет -> device_id, зарегистрированный им
+        self.ticker: Optional[asyncio.Task] = None
+        self.devices: Dict[str, dict] = {self.player_id: {
+            "info": {"device_id": self.player_id, "type": "DESKTOP", "title": "Fake Desktop",
+                     "app_name": "Yandex Music", "app_version": "5.79.7"},
+            "capabilities": {"can_be_player": True, "can_be_remote_controller": True, "volume_granularity": 16},
+            "volume_info": {"volume": 0.5, "version": self.next_version(self.player_id)},
+            "volume": 0.5,
+            "session": {"id": str(uuid.uuid4())},
+            "is_offline": False,
+            "is_shadow": False,
+        }}
+        self.player_state = {
+            "player_queue": {
+                "current_playable_index": 0,
+                "entity_id": "",
+                "entity_type": "VARIOUS",
+                "entity_context": "BASED_ON_ENTITY_BY_DEFAULT",
+                "options": {"repeat_mode": "NONE"},
+                "playable_list": [playable(i) for i in range(queue_size)],
+                "from_optional": "",
+                "version": self.next_version(self.player_id),
+            },
+            "status": {
+                "duration_ms": duration_ms(0),
+                "progress_ms": 0,
+                "paused": True,
+                "playback_speed": 1,
+                "version": self.next_version(self.player_id),
+            },
+        }
+
+    def next_version(self, device_id: str) -> dict:
+        self.version += 1
+        return {"device_id": device_id, "version": self.version, "timestamp_ms": _ms()}
+
+    def message(self, rid: Optional[str] = None) -> str:
+        return json.dumps({
+            "player_state": self.player_state,
+            "devices": list(self.devices.values()),
+            "active_device_id_optional": self.player_id,
+            "timestamp_ms": _ms(),
+            "rid": rid or str(uuid.uuid4()),
+        })
+
+    def apply(self, data: dict, device_id: str) -> bool:
+        """Применяет команду клиента к стейту. Возвращает True, если стейт поменялся."""
+        if "update_full_state" in data:
+            full = data["update_full_state"]
+            device = dict(full.get("device") or {})
+            volume = (device.get("volume_info") or {}).get("volume", 0)
+            device.update(volume=volume, is_offline=False, session={"id": str(uuid.uuid4())})
+            self.devices[device.get("info", {}).get("device_id", device_id)] = device
+            # теневые и неактивные устройства не перетирают то, что играет
+            if full.get("is_currently_active") and not device.get("is_shadow"):
+                self.player_state = full["player_state"]
+            return True
+        if "update_player_state" in data:
+            state = data["update_player_state"]["player_state"]
+            state["player_queue"]["version"] = self.next_version(device_id)
+            state["status"]["version"] = self.next_version(device_id)
+            self.player_state = state
+            return True
+        if "update_playing_status" in data:
+            status = data["update_playing_status"]["playing_status"]
+            status["version"] = self.next_version(device_id)
+            self.player_state["status"] = status
+            return True
+        if "update_volume_info" in data:
+            update = data["update_volume_info"]
+            device = self.devices.get(update.get("device_id"))
+            if device is None:
+                return False
+            volume = update["volume_info"]["volume"]
+            device["volume_info"] = {"volume": volume, "version": self.next_version(device_id)}
+            device["volume"] = volume
+            return True
+        return False
+
+    def tick(self, seconds: float):
+        """Как настоящий плеер: двигает прогресс, а в конце трека переходит к следующему."""
+        status = self.player_state["status"]
+        if status.get("paused"):
+            return False
+        queue = self.player_state["player_queue"]
+        status["progress_ms"] = int(status.get("progress_ms", 0) + seconds * 1000 * status.get("playback_speed", 1))
+        if status["progress_ms"] >= status.get("duration_ms", 0) > 0:
+            index = (queue.get("current_playable_index", 0) + 1) % max(1, len(queue.get("playable_list") or ()))
+            queue["current_playable_index"] = index
+            queue["version"] = self.next_version(self.player_id)
+            status.update(progress_ms=0, duration_ms=duration_ms(index))
+        status["version"] = self.next_version(self.player_id)
+        return True
+
+
+class FakeYnison:
+    """Фейковый Ynison в текущем event loop: `base_url = await fake.start()`, затем `await fake.stop()`."""
+
+    def __init__(self, config: Optional[FakeYnisonConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeYnisonConfig()
+        self.host = host
+        self.port = port
+        self.rooms: Dict[str, Room] = {}
+        self.tickets: Set[str] = set()
+        self.stats: Counter = Counter()
+        self._requests: Dict[web.WebSocketResponse, web.Request] = {}
+        self.on_broadcast: Optional[Callable[[str, str], None]] = None  # (token, rid) — нагрузочный тест меряет задержку по rid
+        self._random = random.Random(self.config.seed)
+        self._runner: Optional[web.AppRunner] = None
+        self.app = web.Application()
+        self.app.router.add_get(REDIRECT_PATH, self.redirector)
+        self.app.router.add_get(STATE_PATH, self.state)
+
+    @property
+    def base_url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        self._runner = web.AppRunner(self.app, handle_signals=False)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Fake Ynison listening on {self.base_url}")
+        return self.base_url
+
+    async def stop(self):
+        for room in self.rooms.values():
+            if room.ticker:
+                room.ticker.cancel()
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _delay(self):
+        delay = self.config.latency + self._random.uniform(0, self.config.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _token(request: web.Request, protocol: dict) -> str:
+        auth = protocol.get("authorization") or request.headers.get("Authorization", "")
+        return auth.removeprefix("OAuth ").strip()
+
+    async def _prepare(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(protocols=("Bearer",), autoping=True)
+        await ws.prepare(request)
+        return ws
+
+    async def redirector(self, request: web.Request) -> web.WebSocketResponse:
+        ws = await self._prepare(request)
+        self.stats["redirects"] += 1
+        await self._delay()
+        if self._random.random() < self.config.redirect_error_rate:
+            self.stats["redirect_errors"] += 1
+            await ws.send_str(json.dumps(error_message(
+                "Too many requests, retry later", "TOO_MANY_REQUESTS", 429, 8, self.config.backoff_ms)))
+        else:
+            ticket = uuid.uuid4().hex
+            self.tickets.add(ticket)
+            await ws.send_str(json.dumps({
+                "host": f"{self.host}:{self.port}",
+                "redirect_ticket": ticket,
+                "session_id": str(self._random.getrandbits(63)),
+                "keep_alive_params": {"keep_alive_time_seconds": 10, "keep_alive_timeout_seconds": 5},
+            }))
+        await ws.close()
+        return ws
+
+    async def state(self, request: web.Request) -> web.WebSocketResponse:
+        protocol = parse_protocol(request)
+        ws = await self._prepare(request)
+        token = self._token(request, protocol)
+        ticket = protocol.get("Ynison-Redirect-Ticket")
+        if not token or ticket not in self.tickets:
+            self.stats["rejected"] += 1
+            await ws.send_str(json.dumps(error_message("Invalid redirect ticket", "UNAUTHENTICATED", 401, 16)))
+            await ws.close()
+            return ws
+        self.tickets.discard(ticket)
+
+        device_id = protocol.get("Ynison-Device-Id") or str(uuid.uuid4())
+        room = self.rooms.get(token)
+        if room is None:
+            room = self.rooms[token] = Room(token, self.config.queue_size)
+        room.sockets[ws] = None
+        self._requests[ws] = request
+        self.stats["connections"] += 1
+        if self.config.progress_interval > 0 and room.ticker is None:
+            room.ticker = asyncio.create_task(self._tick(room))
+        if self.config.drop_after > 0:
+            asyncio.get_running_loop().call_later(self.config.drop_after, self._abort, ws)
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                self.stats["messages_in"] += 1
+                try:
+                    data = json.loads(msg.data)
+                except json.JSONDecodeError:
+                    continue
+                if "update_full_state" in data:
+                    room.sockets[ws] = data["update_full_state"].get("device", {}).get("info", {}).get("device_id")
+                changed = room.apply(data, device_id)
+                await self._delay()
+                if changed:
+                    await self.broadcast(room, data.get("rid"))
+                elif not ws.closed:
+                    await ws.send_str(room.message(data.get("rid")))
+                    self.stats["messages_out"] += 1
+                if self._random.random() < self.config.drop_rate:
+                    self._abort(ws)
+        finally:
+            self._requests.pop(ws, None)
+            registered = room.sockets.pop(ws, None)
+            if registered and registered != room.player_id:
+                room.devices.pop(registered, None)
+            if not room.sockets and room.ticker:
+                room.ticker.cancel()
+                room.ticker = None
+        return ws
+
+    def _abort(self, ws: web.WebSocketResponse):
+        """Рвёт TCP без close-фрейма: клиент получает 1006, как при падении балансировщика Ynison."""
+        request = self._requests.get(ws)
+        if not ws.closed and request is not None and request.transport is not None:
+            self.stats["drops"] += 1
+            request.transport.abort()
+
+    async def broadcast(self, room: Room, rid: Optional[str] = None):
+        rid = rid or str(uuid.uuid4())
+        data = room.message(rid)
+        if self.on_broadcast:
+            self.on_broadcast(room.token, rid)
+        for ws in list(room.sockets):
+            if ws.closed:
+                continue
+            try:
+                await ws.send_str(data)
+                self.stats["messages_out"] += 1
+            except ConnectionError:
+                pass
+
+    def drop(self, token: Optional[str] = None):
+        """Обрывает (1006) все сокеты стейта токена или вообще все."""
+        rooms = [self.rooms[token]] if token else list(self.rooms.values())
+        for room in rooms:
+            for ws in list(room.sockets):
+                self._abort(ws)
+
+    async def _tick(self, room: Room):
+        interval = self.config.progress_interval
+        while True:
+            await asyncio.sleep(interval)
+            if room.tick(interval):
+                await self.broadcast(room)
+
+
+async def _serve(config: FakeYnisonConfig, host: str, port: int):
+    fake = FakeYnison(config, host, port)
+    await fake.start()
+    print(f"YM_API_YNISON_URL={fake.base_url}")
+    try:
+        while True:
+            await asyncio.sleep(60)
+            logger.info(f"rooms={len(fake.rooms)} {dict(fake.stats)}")
+    finally:
+        await fake.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    for f in FakeYnisonConfig.__dataclass_fields__.values():
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=int if f.name in ("queue_size", "backoff_ms", "seed") else float,
+                            default=f.default)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] [FakeYnison] %(message)s', datefmt='%H:%M:%S')
+    config = FakeYnisonConfig(**{name: getattr(args, name) for name in FakeYnisonConfig.__dataclass_fields__})
+    try:
+        asyncio.run(_serve(config, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
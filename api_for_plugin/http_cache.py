@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from metrics import Counter
+from utils.private_files import open_private, private_dir
+
+
+logger = logging.getLogger("HttpCache")
+
+CACHE_REQUESTS = Counter(
+    "ym_api_http_cache_requests_total",
+    "Cacheable Yandex Music API requests by outcome (hit, revalidated, miss)",
+    labelnames=("endpoint", "outcome"),
+)
+
+
+@dataclass(frozen=True)
+class CacheRule:
+    ttl: float
+    per_user: bool = True
+
+
+@dataclass
+class CacheEntry:
+    status: int
+    stored_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_type: Optional[str] = None
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.stored_at < ttl
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """
+    Дисковый кэш ответов REST API.
+
+    Ключ — метод + URL + тело запроса (и токен, если ответ зависит от пользователя).
+    Свежие записи отдаются без сети, устаревшие перепроверяются условным запросом
+    (If-None-Match / If-Modified-Since), если апстрим прислал ETag или Last-Modified.
+    TTL настраивается по суффиксу пути эндпоинта.
+
+    Каталог закрыт от других пользователей (0700, файлы 0600): в нём лайки пользователей.
+    /account/status не кэшируется: закэшированный 200 скрывал бы отозванный токен на весь TTL.
+    Методы синхронные и ходят на диск — из цикла их зовут через asyncio.to_thread.
+    """
+    DEFAULT_RULES: Dict[str, CacheRule] = {
+        "/likes/tracks": CacheRule(ttl=30),
+        "/dislikes/tracks": CacheRule(ttl=30),
+        "/tracks": CacheRule(ttl=24 * 3600, per_user=False),
+        "/with-tracks": CacheRule(ttl=3600, per_user=False),
+    }
+    MAX_AGE = 7 * 24 * 3600
+
+    def __init__(self, directory: Optional[str] = None, rules: Optional[Dict[str, CacheRule]] = None):
+        self.directory = private_dir(directory or os.getenv("YM_API_CACHE_DIR"), "ym_api_cache")
+        self.rules = dict(self.DEFAULT_RULES if rules is None else rules)
+        self._patterns = sorted(self.rules, key=len, reverse=True)
+
+    def rule_for(self, url: str) -> Optional[str]:
+        path = urlsplit(url).path.rstrip("/")
+        for pattern in self._patterns:
+            if path.endswith(pattern):
+                return pattern
+        return None
+
+    def key(self, pattern: str, token: str, method: str, url: str, data=None) -> str:
+        h = hashlib.sha256()
+        if self.rules[pattern].per_user:
+            h.update(token.encode())
+        h.update(b"\0" + method.upper().encode() + b"\0" + url.encode() + b"\0")
+        if data is not None:
+            h.update(json.dumps(data, sort_keys=True).encode() if isinstance(data, dict) else str(data).encode())
+        return h.hexdigest()
+
+    def _paths(self, key: str):
+        base = self.directory / key[:2]
+        return base / f"{key}.json", base / f"{key}.body"
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                entry = CacheEntry(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+        return entry if body_path.exists() else None
+
+    def body_path(self, key: str) -> Path:
+        return self._paths(key)[1]
+
+    def touch(self, key: str, entry: CacheEntry):
+        entry.stored_at = time.time()
+        self._write_meta(key, entry)
+
+    def _write_meta(self, key: str, entry: CacheEntry):
+        meta_path, _ = self._paths(key)
+        tmp = meta_path.with_suffix(".json.tmp")
+        with open_private(tmp, "w", encoding="utf-8") as f:
+            json.dump(asdict(entry), f)
+        os.replace(tmp, meta_path)
+
+    def writer(self, key: str, resp) -> "CacheWriter":
+        return CacheWriter(self, key, CacheEntry(
+            status=resp.status,
+            stored_at=time.time(),
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+            content_type=resp.headers.get("Content-Type"),
+        ))
+
+    def invalidate(self, key: str):
+        for path in self._paths(key):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def prune(self):
+        """Удаляет записи старше MAX_AGE."""
+        deadline = time.time() - self.MAX_AGE
+        removed = 0
+        for path in self.directory.glob("*/*"):
+            try:
+                if path.stat().st_mtime < deadline:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        if removed:
+            logger.info(f"Pruned {removed} stale cache files")
+
+
+class CacheWriter:
+    """Пишет тело ответа во временный файл по мере чтения и публикует запись только после полного тела."""
+
+    def __init__(self, cache: HttpCache, key: str, entry: CacheEntry):
+        self.cache = cache
+        self.key = key
+        self.entry = entry
+        self.committed = False
+        _, body_path = cache._paths(key)
+        body_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self._tmp = body_path.with_suffix(f".body.{os.getpid()}.{id(self)}.tmp")
+        self._file = open_private(self._tmp, "wb")
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+
+    def commit(self):
+        if self.committed:
+            return
+        self._file.close()
+        os.replace(self._tmp, self.cache.body_path(self.key))
+        self.cache._write_meta(self.key, self.entry)
+        self.committed = True
+
+    def abort(self):
+        if self.committed:
+            return
+        self._file.close()
+        try:
+            self._tmp.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class _CachedContent:
+    def __init__(self, path: Path):
+        self._path = path
+
+    async def iter_chunked(self, size: int):
+        f = await asyncio.to_thread(open, self._path, "rb")
+        try:
+            while chunk := await asyncio.to_thread(f.read, size):
+                yield chunk
+        finally:
+            f.close()
+
+
+class CachedResponse:
+    """Ответ из дискового кэша с тем же минимальным интерфейсом, что и aiohttp.ClientResponse."""
+
+    def __init__(self, entry: CacheEntry, path: Path):
+        self.status = entry.status
+        self.headers = {"Content-Type": entry.content_type or "application/json"}
+        self.from_cache = True
+        self._path = path
+        self.content = _CachedContent(path)
+
+    async def read(self) -> bytes:
+        return await asyncio.to_thread(self._path.read_bytes)
+
+    async def text(self) -> str:
+        return (await self.read()).decode("utf-8")
+
+    async def json(self, **kwargs):
+        return json.loads(await self.read())
+
+
+class _RecordingContent:
+    def __init__(self, resp, writer: CacheWriter):
+        self._resp = resp
+        self._writer = writer
+
+    async def iter_chunked(self, size: int):
+        async for chunk in self._resp.content.iter_chunked(size):
+            await asyncio.to_thread(self._writer.write, chunk)
+            yield chunk
+        await asyncio.to_thread(self._writer.commit)
+
+
+class RecordingResponse:
+    """Обёртка над aiohttp-ответом, которая параллельно с чтением складывает тело в кэш."""
+
+    def __init__(self, resp, writer: CacheWriter):
+        self._resp = resp
+        self._writer = writer
+        self.status = resp.status
+        self.headers = resp.headers
+        self.from_cache = False
+        self.content = _RecordingContent(resp, writer)
+
+    async def read(self) -> bytes:
+        body = await self._resp.read()
+        await asyncio.to_thread(self._writer.write, body)
+        await asyncio.to_thread(self._writer.commit)
+        return body
+
+    async def text(self) -> str:
+        return (await self.read()).decode(self._resp.get_encoding())
+
+    async def json(self, **kwargs):
+        return json.loads(await self.read())
+
+    async def finish(self):
+        """Публикует запись, если тело дочитано до конца (потребитель мог остановиться сразу после нужных данных)."""
+        await asyncio.to_thread(self._writer.commit if self._resp.content.at_eof() else self._writer.abort)
+
+
+_cache: Optional[HttpCache] = None
+
+
+def get_http_cache() -> HttpCache:
+    global _cache
+    if _cache is None:
+        _cache = HttpCache()
+    return _cache
+
+
+def init_http_cache() -> HttpCache:
+    """Создаёт кэш и чистит устаревшие записи. Обходит весь каталог — при старте сервиса, через asyncio.to_thread."""
+    cache = get_http_cache()
+    cache.prune()
+    return cache
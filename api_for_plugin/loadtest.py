@@ -0,0 +1,368 @@
+"""
+Нагрузочный тест сервиса против локальных стендов Ynison и REST (fakes/).
+
+Поднимает fakes.ynison и fakes.rest в этом процессе, сервис — отдельным процессом uvicorn
+(или берёт уже запущенный через --target), подключает N токенов по M /ws клиентов, как плагин,
+и жмёт кнопки с заданной частотой (пуассоновский поток на токен, команды по /ws).
+
+Отчёт: сообщений и МБ в секунду до клиентов; p50/p99 задержки от рассылки стейта фейковым Ynison
+до клиента (сырой стейт и обогащённый), ack команды и её результата; память на сессию
+(RSS процесса сервиса и оценка из /debug/sessions); CPU сервиса; лаг event loop из /metrics.
+
+    python loadtest.py --tokens 50 --clients 2 --press-rate 0.5 --seconds 60
+    python -m api_for_plugin.loadtest --tokens 200 --queue-size 300   # из корня репозитория
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))  # импорты сервиса плоские, как в cluster._serve_worker
+
+import aiohttp
+from fakes.rest import FakeRest, FakeRestConfig
+from fakes.ynison import FakeYnison, FakeYnisonConfig
+
+
+logger = logging.getLogger("LoadTest")
+
+RID_RE = re.compile(r'"rid":\s*"([^"]+)"')
+BUCKET_RE = re.compile(r'^ym_api_event_loop_lag_seconds_bucket\{le="([^"]+)"\} (\S+)$', re.M)
+ACTIONS = ("next", "prev", "play_pause", "volume_up", "volume_down", "like")
+
+
+@dataclass
+class LoadConfig:
+    tokens: int = 20
+    clients: int = 2
+    press_rate: float = 0.2       # нажатий в секунду на токен
+    seconds: float = 30.0         # длительность замера после прогрева
+    warmup_timeout: float = 120.0
+    queue_size: int = 100
+    progress_interval: float = 1.0
+    ynison_latency: float = 0.0
+    rest_latency: float = 0.0
+    library_min: int = 1_000
+    library_max: int = 100_000
+    target: Optional[str] = None  # уже запущенный сервис, например http://127.0.0.1:8000
+    seed: int = 1
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass
+class LoadStats:
+    messages: int = 0
+    bytes: int = 0
+    state_ms: List[float] = field(default_factory=list)
+    enriched_ms: List[float] = field(default_factory=list)
+    ack_ms: List[float] = field(default_factory=list)
+    command_ms: List[float] = field(default_factory=list)
+    commands_sent: int = 0
+    commands_failed: int = 0
+    disconnects: int = 0
+
+
+class SentClock:
+    """Когда фейковый Ynison разослал стейт с данным rid; старые записи вытесняются."""
+
+    def __init__(self, horizon: float = 60.0):
+        self.horizon = horizon
+        self._sent: "OrderedDict[str, float]" = OrderedDict()
+
+    def mark(self, token: str, rid: str):
+        now = time.monotonic()
+        self._sent[rid] = now
+        while self._sent and now - next(iter(self._sent.values())) > self.horizon:
+            self._sent.popitem(last=False)
+
+    def get(self, rid: str) -> Optional[float]:
+        return self._sent.get(rid)
+
+
+class PluginClient:
+    """Один /ws клиент, как экземпляр кнопки плагина: читает стейты и шлёт команды."""
+
+    def __init__(self, url: str, token: str, clock: SentClock, pending: Dict[str, float], load: "LoadRun"):
+        self.url = url
+        self.token = token
+        self.clock = clock
+        self.pending = pending  # общий на токен: id команды -> время отправки
+        self.load = load
+        self.ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self.connected_at = 0.0
+        self.got_state = asyncio.Event()
+        self._last_rid: Optional[str] = None
+        self._enriched_seen = False
+        self._sent_by_request: Dict[str, float] = {}
+
+    async def run(self, http: aiohttp.ClientSession):
+        try:
+            self.ws = await http.ws_connect(self.url, headers={"Authorization": self.token}, max_msg_size=0)
+            self.connected_at = time.monotonic()
+            async for msg in self.ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    self.on_message(msg.data)
+        except (aiohttp.ClientError, ConnectionError) as e:
+            logger.warning(f"Client {self.token}: {e}")
+        finally:
+            if not self.load.stopping:
+                self.load.stats.disconnects += 1
+
+    def on_message(self, data: str):
+        now = time.monotonic()
+        stats = self.load.stats
+        stats.messages += 1
+        stats.bytes += len(data)
+        if data.startswith('{"event"'):
+            self.on_event(json.loads(data), now)
+            return
+        self.got_state.set()
+        match = RID_RE.search(data)
+        sent = self.clock.get(match.group(1)) if match else None
+        if sent is None or sent < self.connected_at:
+            return
+        if match.group(1) != self._last_rid:
+            self._last_rid, self._enriched_seen = match.group(1), False
+            stats.state_ms.append((now - sent) * 1000)
+        elif not self._enriched_seen:
+            self._enriched_seen = True
+            stats.enriched_ms.append((now - sent) * 1000)
+
+    def on_event(self, event: dict, now: float):
+        stats = self.load.stats
+        if event.get("event") == "command_ack":
+            sent = self._sent_by_request.pop(event.get("request_id"), None)
+            if sent is not None:
+                stats.ack_ms.append((now - sent) * 1000)
+                if event.get("status") == "accepted":
+                    self.pending[event["command_id"]] = sent
+                else:
+                    stats.commands_failed += 1
+        elif event.get("event") == "command_result":
+            sent = self.pending.pop(event.get("id"), None)  # результат приходит всем клиентам токена
+            if sent is not None:
+                stats.command_ms.append((now - sent) * 1000)
+                if event.get("status") != "done":
+                    stats.commands_failed += 1
+
+    async def press(self, action: str):
+        if self.ws is None or self.ws.closed:
+            return
+        request_id = uuid.uuid4().hex
+        self._sent_by_request[request_id] = time.monotonic()
+        self.load.stats.commands_sent += 1
+        await self.ws.send_str(json.dumps({"type": "command", "id": request_id, "action": action, "params": {}}))
+
+
+class LoadRun:
+    def __init__(self, config: LoadConfig):
+        self.config = config
+        self.stats = LoadStats()
+        self.stopping = False
+        self.random = random.Random(config.seed)
+        self.clock = SentClock()
+        self.clients: Dict[str, List[PluginClient]] = {}
+
+    async def presses(self, token: str):
+        clients = self.clients[token]
+        while True:
+            await asyncio.sleep(self.random.expovariate(self.config.press_rate))
+            await self.random.choice(clients).press(self.random.choice(ACTIONS))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_service(port: int, env: dict, log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "wb")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=Path(__file__).parent, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+def process_rss(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def process_cpu(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def lag_quantiles(metrics_text: str, since: Dict[float, float]) -> Dict[str, float]:
+    """p50/p99 лага event loop (верхняя граница корзины) по приросту гистограммы с начала замера."""
+    buckets = {float(le): float(count) - since.get(float(le), 0.0) for le, count in BUCKET_RE.findall(metrics_text)}
+    total = buckets.get(float("inf"), 0.0)
+    result = {}
+    for name, q in (("loop_lag_p50_ms", 0.5), ("loop_lag_p99_ms", 0.99)):
+        bound = next((le for le, count in sorted(buckets.items()) if total and count >= q * total), 0.0)
+        result[name] = bound * 1000
+    return result
+
+
+def lag_buckets(metrics_text: str) -> Dict[float, float]:
+    return {float(le): float(count) for le, count in BUCKET_RE.findall(metrics_text)}
+
+
+async def run_load(config: LoadConfig) -> dict:
+    fake_ynison = FakeYnison(FakeYnisonConfig(queue_size=config.queue_size, progress_interval=config.progress_interval,
+                                              latency=config.ynison_latency, seed=config.seed))
+    fake_rest = FakeRest(FakeRestConfig(library_min=config.library_min, library_max=config.library_max,
+                                        latency=config.rest_latency, seed=config.seed))
+    load = LoadRun(config)
+    fake_ynison.on_broadcast = load.clock.mark
+    await fake_ynison.start()
+    await fake_rest.start()
+
+    workdir = tempfile.TemporaryDirectory(prefix="ym_loadtest_")
+    service = None
+    base = config.target
+    if base is None:
+        port = free_port()
+        base = f"http://127.0.0.1:{port}"
+        service = spawn_service(port, {
+            "YM_API_YNISON_URL": fake_ynison.base_url,
+            "YM_API_REST_URL": fake_rest.base_url,
+            "YM_API_DEBUG": "1",
+            "YM_API_CACHE_DIR": str(Path(workdir.name) / "cache"),
+            "YM_API_SNAPSHOT_PATH": str(Path(workdir.name) / "snapshots.db"),
+        }, Path(workdir.name) / "service.log")
+    else:
+        logger.warning(f"Using {base}: it must be started with YM_API_YNISON_URL={fake_ynison.base_url} "
+                       f"YM_API_REST_URL={fake_rest.base_url}")
+
+    tasks: List[asyncio.Task] = []
+    http = aiohttp.ClientSession()
+    try:
+        for _ in range(100):
+            try:
+                async with http.get(f"{base}/metrics") as resp:
+                    if resp.status == 200:
+                        break
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+        idle_rss = process_rss(service.pid) if service else 0
+
+        ws_url = base.replace("http", "ws", 1) + "/ws"
+        for i in range(config.tokens):
+            token = f"loadtest-{i:05d}"
+            pending: Dict[str, float] = {}
+            load.clients[token] = [PluginClient(ws_url, token, load.clock, pending, load) for _ in range(config.clients)]
+            tasks += [asyncio.create_task(client.run(http)) for client in load.clients[token]]
+
+        warmup_started = time.monotonic()
+        everyone = [c.got_state.wait() for clients in load.clients.values() for c in clients]
+        try:
+            await asyncio.wait_for(asyncio.gather(*everyone), config.warmup_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Not every client got a state before the warmup timeout")
+        warmup = time.monotonic() - warmup_started
+
+        async with http.get(f"{base}/metrics") as resp:
+            lag_before = lag_buckets(await resp.text())
+        cpu_before = process_cpu(service.pid) if service else 0.0
+        load.stats = LoadStats()
+        tasks += [asyncio.create_task(load.presses(token)) for token in load.clients]
+        started = time.monotonic()
+        await asyncio.sleep(config.seconds)
+        elapsed = time.monotonic() - started
+        stats = load.stats
+
+        async with http.get(f"{base}/metrics") as resp:
+            lag = lag_quantiles(await resp.text(), lag_before)
+        estimated = 0
+        async with http.get(f"{base}/debug/sessions") as resp:
+            if resp.status == 200:
+                sessions = (await resp.json())["sessions"]
+                estimated = sum(s["memory_bytes"]["total"] for s in sessions) / max(1, len(sessions))
+        result = {
+            "tokens": config.tokens,
+            "clients": config.tokens * config.clients,
+            "warmup_s": warmup,
+            "messages_per_s": stats.messages / elapsed,
+            "client_mb_per_s": stats.bytes / elapsed / 1e6,
+            "state_p50_ms": percentile(stats.state_ms, 0.5),
+            "state_p99_ms": percentile(stats.state_ms, 0.99),
+            "enriched_p50_ms": percentile(stats.enriched_ms, 0.5),
+            "enriched_p99_ms": percentile(stats.enriched_ms, 0.99),
+            "commands_sent": stats.commands_sent,
+            "commands_failed": stats.commands_failed,
+            "ack_p50_ms": percentile(stats.ack_ms, 0.5),
+            "ack_p99_ms": percentile(stats.ack_ms, 0.99),
+            "command_p50_ms": percentile(stats.command_ms, 0.5),
+            "command_p99_ms": percentile(stats.command_ms, 0.99),
+            "disconnects": stats.disconnects,
+            "session_estimate_kb": estimated / 1024,
+            **lag,
+        }
+        if service:
+            result["rss_per_session_kb"] = (process_rss(service.pid) - idle_rss) / max(1, config.tokens) / 1024
+            result["service_cpu_pct"] = (process_cpu(service.pid) - cpu_before) / elapsed * 100
+        return result
+    finally:
+        load.stopping = True
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await http.close()
+        if service:
+            service.terminate()
+            try:
+                service.wait(10)
+            except subprocess.TimeoutExpired:
+                service.kill()
+        await fake_ynison.stop()
+        await fake_rest.stop()
+        workdir.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = LoadConfig()
+    for name, value in asdict(defaults).items():
+        kind = type(value) if value is not None else str
+        parser.add_argument(f"--{name.replace('_', '-')}", type=kind, default=value)
+    parser.add_argument("--json", action="store_true", help="print the result as one JSON line")
+    args = vars(parser.parse_args())
+    as_json = args.pop("json")
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s [%(levelname)s] [LoadTest] %(message)s', datefmt='%H:%M:%S')
+
+    result = asyncio.run(run_load(LoadConfig(**args)))
+    if as_json:
+        print(json.dumps(result))
+        return
+    for key, value in result.items():
+        print(f"{key:>20}: {value:.1f}" if isinstance(value, float) else f"{key:>20}: {value}")
+
+
+if __name__ == "__main__":
+    main()
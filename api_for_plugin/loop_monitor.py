@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Deque, Optional
+from metrics import Counter as MetricCounter, Histogram
+from profiler import collapse
+
+
+logger = logging.getLogger("LoopMonitor")
+
+LOOP_LAG_SECONDS = Histogram(
+    "ym_api_event_loop_lag_seconds",
+    "How late the event loop woke up a periodic probe (blocking code delays every session)",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+LOOP_BLOCKED_SECONDS = Histogram(
+    "ym_api_event_loop_blocked_seconds",
+    "How long the event loop stayed blocked once the watchdog caught it over the threshold",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+LOOP_BLOCKED_TOTAL = MetricCounter(
+    "ym_api_event_loop_blocked_total",
+    "Event loop blocks over the threshold, by the coroutine that was running (callback: no task)",
+    labelnames=("task",),
+)
+
+
+async def monitor_loop_lag(interval: float = 0.5, warn_after: float = 0.25):
+    """Каждые `interval` секунд засыпает и меряет, насколько позже запланированного цикл нас разбудил."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        LOOP_LAG_SECONDS.observe(lag)
+        if lag > warn_after:
+            logger.warning(f"Event loop lagged {lag * 1000:.0f} ms")
+
+
+@dataclass
+class LoopBlock:
+    at: float            # time.time() начала блокировки
+    seconds: float
+    task: str            # корутина задачи, чаще всего стоявшей в сэмплах; "callback" — вне задачи
+    stack: str           # самый частый свёрнутый стек, снаружи внутрь
+    samples: int
+
+
+def task_name(task: Optional[asyncio.Task]) -> str:
+    if task is None:
+        return "callback"
+    return getattr(task.get_coro(), "__qualname__", task.get_name())
+
+
+class LoopWatchdog(threading.Thread):
+    """
+    Сторож цикла в отдельном потоке. Каждые `interval` секунд кладёт в цикл пустой колбэк
+    (call_soon_threadsafe) и ждёт его `threshold` секунд. Не дождался — цикл чем-то занят:
+    пока колбэк не выполнится, раз в `sample_every` снимаются стек потока цикла и текущая задача.
+    Итог пишется в лог, в метрики и в `recent` (/debug/loop).
+
+    В отличие от monitor_loop_lag, видно не только что цикл стоял, но и кто его держал.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, threshold: float = 0.1, interval: float = 0.1,
+                 sample_every: float = 0.01, keep: int = 50):
+        super().__init__(name="loop-watchdog", daemon=True)
+        self.loop = loop
+        self.threshold = threshold
+        self.interval = interval
+        self.sample_every = sample_every
+        self.recent: Deque[LoopBlock] = deque(maxlen=keep)
+        self._thread_id: Optional[int] = None
+        self._done = threading.Event()
+
+    @classmethod
+    def from_env(cls, loop: asyncio.AbstractEventLoop) -> "LoopWatchdog":
+        return cls(loop, threshold=float(os.getenv("YM_API_LOOP_BLOCK_MS", "100")) / 1000)
+
+    def start(self):
+        self._thread_id = threading.get_ident()  # запускается из потока цикла
+        super().start()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            pong = threading.Event()
+            sent = time.monotonic()
+            try:
+                self.loop.call_soon_threadsafe(pong.set)
+            except RuntimeError:  # цикл закрыт
+                return
+            if pong.wait(self.threshold):
+                continue
+            block = self._sample_until(pong, sent)
+            if block is not None:
+                self._record(block)
+
+    def _sample_until(self, pong: threading.Event, sent: float) -> Optional[LoopBlock]:
+        stacks, tasks = Counter(), Counter()
+        started_at = time.time() - (time.monotonic() - sent)
+        while not pong.is_set() and not self._done.is_set():
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                stacks[collapse(frame)] += 1
+                tasks[task_name(asyncio.current_task(self.loop))] += 1
+            del frame
+            pong.wait(self.sample_every)
+        if not stacks:
+            return None
+        return LoopBlock(at=started_at, seconds=time.monotonic() - sent, task=tasks.most_common(1)[0][0],
+                         stack=stacks.most_common(1)[0][0], samples=sum(stacks.values()))
+
+    def _record(self, block: LoopBlock):
+        self.recent.append(block)
+        LOOP_BLOCKED_SECONDS.observe(block.seconds)
+        LOOP_BLOCKED_TOTAL.inc(task=block.task)
+        frames = block.stack.split(";")
+        logger.warning(f"Event loop blocked {block.seconds * 1000:.0f} ms in {block.task}: "
+                       f"{' <- '.join(reversed(frames[-6:]))}")
@@ -1,10 +1,22 @@
+import os
 import json
+import time
 import asyncio
 import logging
-from typing import Dict, Set
+from typing import Dict, Optional, Set, Tuple
+from dataclasses import asdict
 from manager import SessionManager
+from cluster import get_cluster
+from loop_monitor import LoopWatchdog, monitor_loop_lag
+from profiler import ProfilerBusy, run_profile
+from supervisor import TaskGroup
+from metrics import COLLECTORS, Gauge, Histogram, render_text
+from commands import parse_macro_steps
+from http_cache import init_http_cache
+from presets import PRESET_KINDS
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Header, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Header, HTTPException, Body
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 
 logging.basicConfig(
@@ -15,42 +27,274 @@ logging.basicConfig(
 logger = logging.getLogger("API")
 manager = SessionManager()
 connected_websockets: Dict[str, Set[WebSocket]] = {}
+cluster = get_cluster()  # None в обычном однопроцессном режиме
+background = TaskGroup("api")  # рассылки для токенов без своей сессии
 
+BROADCAST_SECONDS = Histogram(
+    "ym_api_broadcast_seconds",
+    "Time to fan one state/event message out to all /ws clients of a token",
+)
+BROADCAST_BYTES = Histogram(
+    "ym_api_broadcast_bytes",
+    "Size (in characters) of messages broadcast to /ws clients",
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+WS_CLIENTS = Gauge(
+    "ym_api_ws_clients",
+    "Connected /ws clients and the tokens they belong to",
+    labelnames=("kind",),
+)
 
-async def on_state_update(token, state):
-    async def broadcast():
-        if token in connected_websockets:
-            sockets = connected_websockets[token]
-            logger.info(f"Broadcasting update to {len(sockets)} clients for token {token[:5]}...")
+
+def collect_ws_clients():
+    WS_CLIENTS.set(sum(len(sockets) for sockets in connected_websockets.values()), kind="sockets")
+    WS_CLIENTS.set(len(connected_websockets), kind="tokens")
+
+
+COLLECTORS.append(collect_ws_clients)
+
+
+def client_count(token: str) -> int:
+    """/ws клиенты токена: свои и в кластере — воркеры с его клиентами (каждый считается за одного)."""
+    local = len(connected_websockets.get(token, ()))
+    return local + (cluster.remote_watchers(token) if cluster else 0)
+
+
+async def broadcast(token: str, msg: str):
+    if token in connected_websockets:
+        sockets = connected_websockets[token]
+        logger.info(f"Broadcasting update to {len(sockets)} clients for token {token[:5]}...")
+        started = time.monotonic()
+        dead_sockets = set()
+        for ws in list(sockets):
             try:
-                msg = json.dumps(state) if isinstance(state, dict) else str(state)
+                await asyncio.wait_for(ws.send_text(msg), timeout=1.5)
+                logger.debug(f"Successfully sent update to WS {id(ws)}")
             except Exception as e:
-                logger.error(f"Failed to JSON serialize state: {e}")
-                msg = str(state)
-                
-            dead_sockets = set()
-            for ws in list(sockets):
-                try:
-                    await asyncio.wait_for(ws.send_text(msg), timeout=1.5)
-                    logger.debug(f"Successfully sent update to WS {id(ws)}")
-                except Exception as e:
-                    logger.warning(f"Failed to send to WS for {token[:5]}: {e}")
-                    dead_sockets.add(ws)
-            
-            for ws in dead_sockets:
-                connected_websockets[token].discard(ws)
+                logger.warning(f"Failed to send to WS for {token[:5]}: {e}")
+                dead_sockets.add(ws)
+        BROADCAST_SECONDS.observe(time.monotonic() - started)
+        BROADCAST_BYTES.observe(len(msg))
+        
+        # пока шла рассылка, последний клиент мог уйти и запись токена — пропасть
+        sockets.difference_update(dead_sockets)
+    else:
+        logger.debug(f"No clients connected for token {token[:5]}.. skipping broadcast.")
+
+
+async def on_state_update(token, state):
+    """
+    Рассылает стейт или событие в фоне, в группе задач сессии токена. Стейты (kind=broadcast) идут
+    по одному на сессию, и из накопившихся рассылается только последний; события команд — все.
+    """
+    async def fan_out():
+        try:
+            msg = json.dumps(state) if isinstance(state, dict) else str(state)
+        except Exception as e:
+            logger.error(f"Failed to JSON serialize state: {e}")
+            msg = str(state)
+        if cluster:
+            await asyncio.gather(broadcast(token, msg), cluster.publish(token, msg))
         else:
-            logger.debug(f"No clients connected for token {token[:5]}.. skipping broadcast.")
-    asyncio.create_task(broadcast())
+            await broadcast(token, msg)
+    session = manager.sessions.get(token)
+    kind = "broadcast" if isinstance(state, dict) and "player_state" in state else "event"
+    # закрывающаяся сессия ещё шлёт command_result для невыполненных команд — их группа уже закрыта
+    group = session.tasks if session and not session.tasks.closed else background
+    group.spawn(kind, fan_out())
+
+
+def params_error(action: str, params: dict) -> Optional[str]:
+    """Проверяет параметры команды до постановки в очередь; возвращает текст ошибки или None."""
+    if action == "seek" and params.get("position_ms") is None and params.get("offset_ms") is None:
+        return "position_ms or offset_ms required"
+    if action == "play_preset" and (params.get("kind") not in PRESET_KINDS or not params.get("entity_id")):
+        return f"kind ({', '.join(PRESET_KINDS)}) and entity_id required"
+    if action == "macro":
+        try:
+            parse_macro_steps(params.get("steps"))
+        except ValueError as e:
+            return str(e)
+    return None
+
+
+def ws_command_ack(session, raw: str) -> Optional[dict]:
+    """
+    Командный канал поверх /ws.
+
+    Клиент шлёт {"type": "command", "id": "<request id>", "action": "next", "params": {}},
+    в ответ сразу приходит {"event": "command_ack", "request_id": ..., "status": "accepted", "command_id": ...}.
+    Результат выполнения, как и для /control, приходит позже событием command_result.
+    Прочие сообщения (в т.ч. не-JSON) игнорируются — старые клиенты в сокет ничего не пишут.
+    """
+    try:
+        message = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or message.get("type") != "command":
+        return None
+
+    ack = {"event": "command_ack", "request_id": message.get("id")}
+    action = message.get("action")
+    params = message.get("params") or {}
+    if not isinstance(action, str) or not session.supports(action) or not isinstance(params, dict):
+        ack.update(status="rejected", error="unknown action")
+    elif error := params_error(action, params):
+        ack.update(status="rejected", error=error)
+    else:
+        command = session.commands.submit(action, params)
+        ack.update(status="accepted", command_id=command.id)
+    return ack
+
+
+async def send_ws_ack(websocket: WebSocket, ack: Optional[dict]):
+    if ack is None:
+        return
+    try:
+        await asyncio.wait_for(websocket.send_text(json.dumps(ack)), timeout=1.5)
+    except Exception as e:
+        logger.warning(f"Failed to ack WS command: {e}")
+
+
+async def handle_ws_message(session, websocket: WebSocket, raw: str):
+    await send_ws_ack(websocket, ws_command_ack(session, raw))
+
+
+def snapshot_message(snapshot: Optional[dict]) -> Optional[str]:
+    """Снимок с прошлого запуска, явно помеченный как устаревший (сессия в это время ещё поднимается)."""
+    if not snapshot or not snapshot.get("state"):
+        return None
+    return json.dumps({"event": "snapshot", "stale": True, "saved_at": snapshot.get("saved_at"), "state": snapshot["state"]})
+
+
+def initial_message(session) -> Optional[str]:
+    if session.ynison and session.ynison.state:
+        return session.ynison.state.model_dump_json(by_alias=True)
+    return None
+
+
+def request_token(authorization: Optional[str], token: Optional[str] = None) -> Optional[str]:
+    """Токен HTTP-запроса: из ?token= или заголовка Authorization ("Bearer <token>" или просто токен)."""
+    if token:
+        return token
+    if authorization and authorization.startswith("Bearer "):
+        return authorization[len("Bearer "):]
+    return authorization or None
+
+
+async def submit_control(token: str, action: str, params: dict) -> Tuple[int, dict]:
+    session = await manager.get_session(token)
+    if not session.supports(action):
+        return 200, {"error": "unknown action"}
+    if error := params_error(action, params):
+        return 200, {"error": error}
+    command = session.commands.submit(action, params)
+    return 202, {"status": "accepted", "command_id": command.id}
+
+
+async def prepare_preset(token: str, kind: str, entity_id: str) -> Tuple[int, dict]:
+    session = await manager.get_session(token)
+    if not session.presets:
+        return 503, {"detail": "Session is not ready"}
+    try:
+        preset = await session.presets.resolve(kind, entity_id)
+    except LookupError as e:
+        return 404, {"detail": str(e)}
+    return 200, {"kind": preset.kind, "id": preset.entity_id, "title": preset.title, "tracks": preset.track_count}
+
+
+# --- операции шины: воркер-владелец токена обслуживает запросы остальных воркеров ---
+
+async def bus_watch(header: dict, body: bytes) -> dict:
+    """Другой воркер принял /ws клиента нашего токена: сразу шлём снимок, затем поднимаем сессию."""
+    token, peer = header["token"], header["from"]
+    if snapshot := snapshot_message(await manager.load_snapshot(token)):
+        await cluster.send_state(peer, token, snapshot)
+    try:
+        session = await manager.get_session(token)
+    except Exception as e:
+        return {"error": str(e)}
+    return {"initial": initial_message(session)}
+
+
+async def bus_state(header: dict, body: bytes) -> None:
+    await broadcast(header["token"], body.decode())
+
+
+async def bus_ws_command(header: dict, body: bytes) -> dict:
+    session = await manager.get_session(header["token"])
+    return {"ack": ws_command_ack(session, body.decode())}
+
+
+async def bus_control(header: dict, body: bytes) -> dict:
+    status, content = await submit_control(header["token"], header["action"], header.get("params") or {})
+    return {"status": status, "body": content}
+
+
+async def bus_preset(header: dict, body: bytes) -> dict:
+    status, content = await prepare_preset(header["token"], header["kind"], header["id"])
+    return {"status": status, "body": content}
+
+
+async def forward(token: str, op: str, timeout: float = 10.0, **payload) -> Tuple[int, dict]:
+    """HTTP-запрос к чужому токену: выполняет воркер-владелец, ответ возвращается как есть."""
+    try:
+        reply = await cluster.call(token, op, timeout=timeout, **payload)
+    except (OSError, asyncio.TimeoutError) as e:
+        logger.error(f"Worker {cluster.owner(token)} unavailable for {op}: {e!r}")
+        return 503, {"detail": "Session owner is unavailable"}
+    if "error" in reply:
+        return 500, {"detail": reply["error"]}
+    return reply["status"], reply["body"]
+
+
+async def serve_remote_ws(websocket: WebSocket, token: str):
+    """/ws клиент токена, которым владеет другой воркер: стейт приходит по шине, команды уходят владельцу."""
+    try:
+        reply = await cluster.call(token, "watch", timeout=30.0)
+    except (OSError, asyncio.TimeoutError) as e:
+        reply = {"error": repr(e)}
+    if reply.get("error"):
+        logger.error(f"Session init failed for {token[:5]} on worker {cluster.owner(token)}: {reply['error']}")
+        await websocket.close(code=4001)
+        return
+    if reply.get("initial"):
+        try:
+            await asyncio.wait_for(websocket.send_text(reply["initial"]), timeout=2.0)
+        except Exception as e:
+            logger.warning(f"Failed to send initial state to WS: {e}")
+
+    while True:
+        raw = await websocket.receive_text()
+        try:
+            reply = await cluster.call(token, "ws_command", raw.encode())
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"WS command for {token[:5]} not forwarded: {e!r}")  # клиент не дождётся ack и вернёт ошибку
+            continue
+        await send_ws_ack(websocket, reply.get("ack"))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting Multi-User API Service...")
     manager.on_global_update = on_state_update
+    manager.client_count = client_count
+    await asyncio.to_thread(init_http_cache)  # до первой сессии: mkdir/chmod и обход каталога не в цикле
+    if cluster:
+        for op, handler in (("watch", bus_watch), ("state", bus_state), ("ws_command", bus_ws_command),
+                            ("control", bus_control), ("preset", bus_preset)):
+            cluster.on(op, handler)
+        await cluster.start()
+    lag_monitor = asyncio.create_task(monitor_loop_lag())
+    app.state.watchdog = LoopWatchdog.from_env(asyncio.get_running_loop())
+    app.state.watchdog.start()
     yield
     logger.info("Shutting down API Service...")
+    lag_monitor.cancel()
+    app.state.watchdog.stop()
     await manager.shutdown()
+    if cluster:
+        await cluster.stop()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -73,6 +317,16 @@ async def websocket_endpoint(websocket: WebSocket):
     logger.info(f"WS Client connected: {token[:5]}..")
     
     try:
+        if cluster and not cluster.owns(token):
+            await serve_remote_ws(websocket, token)
+            return
+
+        if snapshot := snapshot_message(await manager.load_snapshot(token)):
+            try:
+                await asyncio.wait_for(websocket.send_text(snapshot), timeout=2.0)
+            except Exception as e:
+                logger.warning(f"Failed to send snapshot to WS: {e}")
+
         try:
              session = await manager.get_session(token)
         except Exception as e:
@@ -80,52 +334,113 @@ async def websocket_endpoint(websocket: WebSocket):
              await websocket.close(code=4001)
              return
 
-        if session.ynison and session.ynison.state:
+        if initial_msg := initial_message(session):
              try:
-                 initial_msg = session.ynison.state.model_dump_json(by_alias=True)
                  await asyncio.wait_for(websocket.send_text(initial_msg), timeout=2.0)
              except Exception as e:
                  logger.warning(f"Failed to send initial state to WS: {e}")
              
         while True:
-            await websocket.receive_text()
+            await handle_ws_message(session, websocket, await websocket.receive_text())
             
     except WebSocketDisconnect:
         logger.info(f"WS Client disconnected: {token[:5]}..")
-        if token in connected_websockets:
-            connected_websockets[token].discard(websocket)
-            if not connected_websockets[token]:
+    finally:
+        # и при 4001, и после serve_remote_ws, и на любом исключении — иначе запись о сокете остаётся навсегда
+        sockets = connected_websockets.get(token)
+        if sockets is not None:
+            sockets.discard(websocket)
+            if not sockets:
                 del connected_websockets[token]
+                if cluster and not cluster.owns(token):
+                    await cluster.unwatch(token)
 
 
 @app.post("/control/{action}")
-async def control(action: str, authorization: str = Header(None), token: str = None):
-    user_token = token
-    if not user_token and authorization:
-         if authorization.startswith("Bearer "):
-             user_token = authorization.split(" ")[1]
-         else:
-             user_token = authorization
-             
+async def control(action: str, authorization: str = Header(None), token: str = None,
+                  position_ms: Optional[int] = None, offset_ms: Optional[int] = None,
+                  body: Optional[dict] = Body(None)):
+    user_token = request_token(authorization, token)
     if not user_token:
         raise HTTPException(status_code=401, detail="Token required")
-        
-    session = await manager.get_session(user_token)
-    
-    match action:
-        case "play_pause":
-            await session.play_pause()
-        case "next":
-            await session.next()
-        case "prev":
-            await session.prev()
-        case "like":
-            await session.like()
-        case "dislike":
-            await session.dislike()
-        case _:
-            return {"error": "unknown action"}
-    return {"status": "ok"}
+
+    # параметры приходят JSON-телом (macro: {"steps": [...]}), у seek — ещё и query-строкой
+    params = dict(body or {})
+    if position_ms is not None:
+        params["position_ms"] = position_ms
+    if offset_ms is not None:
+        params["offset_ms"] = offset_ms
+
+    if cluster and not cluster.owns(user_token):
+        status, content = await forward(user_token, "control", action=action, params=params)
+    else:
+        status, content = await submit_control(user_token, action, params)
+    return JSONResponse(status_code=status, content=content)
+
+
+@app.post("/presets/{kind}/{entity_id}")
+async def resolve_preset(kind: str, entity_id: str, authorization: str = Header(None), token: str = None):
+    """
+    Заранее разрешает пресет быстрого запуска (трек, альбом или плейлист "owner:kind"),
+    чтобы нажатие play_preset сводилось к одной отправке в Ynison.
+    """
+    user_token = request_token(authorization, token)
+    if not user_token:
+        raise HTTPException(status_code=401, detail="Token required")
+    if kind not in PRESET_KINDS:
+        raise HTTPException(status_code=400, detail="Unknown preset kind")
+
+    if cluster and not cluster.owns(user_token):
+        status, content = await forward(user_token, "preset", timeout=30.0, kind=kind, id=entity_id)
+    else:
+        status, content = await prepare_preset(user_token, kind, entity_id)
+    return JSONResponse(status_code=status, content=content)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Метрики процесса в формате Prometheus. В режиме нескольких воркеров — только этого воркера."""
+    return PlainTextResponse(render_text(), media_type="text/plain; version=0.0.4")
+
+
+def debug_enabled() -> bool:
+    return os.getenv("YM_API_DEBUG", "").lower() in ("1", "true", "yes")
+
+
+@app.get("/debug/sessions")
+async def debug_sessions():
+    """
+    Стоимость каждой сессии: очередь, память лайков и кэша метаданных, сокеты, фоновые задачи,
+    сообщения и запросы в минуту, превышенные мягкие квоты. Доступно только при YM_API_DEBUG=1.
+    """
+    if not debug_enabled():
+        raise HTTPException(status_code=404)
+    return {"quotas": asdict(manager.quotas), "sessions": manager.accounting()}
+
+
+@app.get("/debug/loop")
+async def debug_loop():
+    """Последние блокировки цикла дольше YM_API_LOOP_BLOCK_MS: задача, стек, длительность. Только при YM_API_DEBUG=1."""
+    if not debug_enabled():
+        raise HTTPException(status_code=404)
+    watchdog = app.state.watchdog
+    return {"threshold_ms": watchdog.threshold * 1000, "blocks": [asdict(block) for block in reversed(watchdog.recent)]}
+
+
+@app.get("/debug/profile")
+async def debug_profile(seconds: float = 10, mode: str = "cpu", format: str = "collapsed", limit: int = 40):
+    """
+    Профиль процесса за `seconds` секунд (см. profiler.py): mode=cpu — свёрнутые стеки сэмплера
+    или format=pstats, mode=alloc — рост аллокаций по tracemalloc. Доступно только при YM_API_DEBUG=1.
+    """
+    if not debug_enabled():
+        raise HTTPException(status_code=404)
+    try:
+        return PlainTextResponse(await run_profile(mode, seconds, format, limit))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 
 @app.get("/check_token")
@@ -135,13 +450,17 @@ async def check_token(request: Request):
         return {"valid": False}
     
     try:
-        await manager.get_session(token)
-        return {"valid": True}
+        return {"valid": await manager.validate_token(token)}
     except Exception as e:
         logger.error(f"Token validation failed: {e}")
         return {"valid": False}
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("YM_API_WORKERS", "1"))
+    if workers > 1:
+        from cluster import run_cluster
+        run_cluster(workers, host="0.0.0.0", port=8000)
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,42 +1,88 @@
+import time
 import uuid
 import asyncio
 import logging
 from utils.auth import AuthStorage
 from ynison.player import YnisonPlayer
 from yandex_api import YandexMusicAPI
+from scheduler import get_scheduler
+from admission import get_admission
+from metrics import COLLECTORS, Counter, Gauge, Histogram
+from supervisor import TaskGroup
+from write_behind import LibraryWriteBehind
+from token_validator import TokenValidator
+from presets import PresetCache
+from accounting import LRUCache, RateWindow, SessionQuotas, estimate_bytes, window_queue
+from snapshot import HOT_METADATA_LIMIT, compact_state, get_snapshot_store
+from commands import Command, CommandQueue, FOLDED_ACTIONS, TRANSPORT_OFFSETS, VOLUME_STEPS, parse_macro_steps
 from typing import Optional, Set, Dict
 
 
 logger = logging.getLogger("SessionManager")
 
+SESSION_RECOVER_SECONDS = Histogram(
+    "ym_api_session_recover_seconds",
+    "Time from losing the Ynison connection to being connected again",
+    buckets=(1, 2, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+ENRICH_CACHE = Counter(
+    "ym_api_enrich_cache_total",
+    "Track metadata lookups during state enrichment by outcome (hit, miss)",
+    labelnames=("outcome",),
+)
+# расхождение прогресса с ожидаемым (прошлый + прошедшее время), после которого апдейт считается перемоткой
+SEEK_TOLERANCE_MS = 3000
+
+SESSIONS = Gauge(
+    "ym_api_sessions",
+    "Running sessions by Ynison connection state",
+    labelnames=("state",),
+)
+
 
 class YnisonSession:
-    def __init__(self, token: str, on_update_callback):
+    def __init__(self, token: str, on_update_callback, quotas: Optional[SessionQuotas] = None):
         self.token = token
         self.on_update_callback = on_update_callback
+        self.quotas = quotas or SessionQuotas()
         self.ynison: Optional[YnisonPlayer] = None
         self.api_client: Optional[YandexMusicAPI] = None
+        self.library_writer: Optional[LibraryWriteBehind] = None
+        self.presets: Optional[PresetCache] = None
         self.liked_tracks: Set[str] = set()
         self.disliked_tracks: Set[str] = set()
-        self.track_cache: Dict[str, dict] = {}
+        self.track_cache: Dict[str, dict] = LRUCache(self.quotas.track_cache_entries)
+        self.last_state: Optional[dict] = None
+        self.volume_before_mute: Dict[str, float] = {}  # живёт дольше плеера: переподключение mute не сбрасывает
         self.is_connected = False
         self.running = False
+        self.tasks = TaskGroup(f"{token[:4]}..", limits={
+            "enrich": self.quotas.enrich_tasks,
+            "broadcast": self.quotas.broadcast_tasks,
+        })
+        self._state_seq = 0  # номер последнего стейта: обогащение устаревшего стейта не рассылается
+        self.messages = RateWindow()   # апдейты от Ynison
+        self.commands_sent = RateWindow()  # выполненные команды (каждая — отдельное подключение к Ynison)
+        self.degraded: Set[str] = set()
+        self._last_progress_key = None
+        self._last_progress_at = 0.0
+        self._last_progress_ms = 0
+        self.commands = CommandQueue(self.execute_command, self.emit_event, spawn=self.tasks.spawn)
         
-    async def start(self):
+    async def start(self, connect: bool = True):
+        """connect=False — только REST и библиотека, без подключения к Ynison (кадры подаёт replay.py)."""
         if self.running: return
         self.running = True
         try:
             self.api_client = YandexMusicAPI(self.token)
+            self.library_writer = LibraryWriteBehind(self.api_client, self.rollback_library_change, spawn=self.tasks.spawn)
+            self.presets = PresetCache(self.api_client)
             await self.api_client.init()
-            likes = await self.api_client.get_liked_tracks()
-            self.liked_tracks = set(likes)
-            
-            try:
-                dislikes = await self.api_client.get_disliked_tracks()
-                if dislikes:
-                    self.disliked_tracks = set(dislikes)
-            except: pass
-            
+            if (liked := await self._load_library("likes")) is not None:
+                self.liked_tracks = liked
+            if (disliked := await self._load_library("dislikes")) is not None:
+                self.disliked_tracks = disliked
+
         except PermissionError as e:
              logger.error(f"[{self.token[:4]}..] Auth Error: {e}")
              self.running = False
@@ -46,10 +92,32 @@ class YnisonSession:
         except Exception as e:
             logger.error(f"[{self.token[:4]}..] API Init failed (metadata might be partial): {e}")
             
-        asyncio.create_task(self.run_loop())
+        if connect:
+            self.tasks.spawn("run_loop", self.run_loop())
         
+    async def _load_library(self, type_: str) -> Optional[Set[str]]:
+        """
+        Скачивает likes/dislikes во временное множество. None — загрузка оборвалась:
+        сессия остаётся с прежним множеством, а не с его обрывком.
+        """
+        tracks: Set[str] = set()
+        try:
+            async for tid in self.api_client.iter_library_track_ids(type_):
+                tracks.add(tid)
+        except ConnectionError as e:
+            logger.warning(f"[{self.token[:4]}..] Library {e}, keeping the previous set")
+            return None
+        return tracks
+
     async def run_loop(self):
+        first, lost_at = True, None
         while self.running:
+            # каждое (пере)подключение проходит через общий контроль, чтобы рестарт не превращался в шторм
+            await get_admission().admit(self.token, urgent=first)
+            first = False
+            if not self.running:
+                break
+            await self._close_player()
             try:
                 storage = AuthStorage(token=self.token, device_id=str(uuid.uuid4()))
                 caps = {
@@ -58,13 +126,17 @@ class YnisonSession:
                     "volume_granularity": 16
                 }
                 
-                self.ynison = YnisonPlayer(storage, capabilities=caps, is_shadow=True)
-                self.ynison.on_receive = self.handle_ynison_state
+                self.ynison = YnisonPlayer(storage, capabilities=caps, is_shadow=True,
+                                           volume_before_mute=self.volume_before_mute)
+                self.ynison.on_receive = self.on_ynison_message
                 self.ynison.on_close = self.handle_close
                 
                 logger.info(f"[{self.token[:4]}..] Connecting to Ynison...")
                 await self.ynison.connect()
                 self.is_connected = True
+                if lost_at is not None:
+                    SESSION_RECOVER_SECONDS.observe(time.monotonic() - lost_at)
+                    lost_at = None
                 
                 if self.ynison.state:
                     await self.handle_ynison_state(self.ynison.state)
@@ -76,23 +148,86 @@ class YnisonSession:
                 logger.error(f"[{self.token[:4]}..] Ynison connection error: {e}")
                 self.is_connected = False
             
+            lost_at = lost_at or time.monotonic()
             if self.running:
                 await asyncio.sleep(5)
             
+    async def _close_player(self):
+        """Закрывает плеер прошлого подключения: иначе его сессии aiohttp живут до конца процесса."""
+        if not self.ynison:
+            return
+        try:
+            await self.ynison.close()
+        except Exception as e:
+            logger.debug(f"[{self.token[:4]}..] Error closing previous Ynison player: {e}")
+
+    def _set_degraded(self, name: str, active: bool):
+        if active and name not in self.degraded:
+            logger.warning(f"[{self.token[:4]}..] Soft quota exceeded, degrading: {name}")
+        (self.degraded.add if active else self.degraded.discard)(name)
+
+    def _progress_only(self, state) -> bool:
+        """
+        True, если с прошлой рассылки поменялся только прогресс (тот же трек, очередь, повтор и
+        перемешивание, пауза, громкость), а рассылали его меньше progress_interval назад.
+        Перемотка — прогресс ушёл от ожидаемого больше чем на SEEK_TOLERANCE_MS — проходит всегда.
+        """
+        player_state = state.player_state
+        status = player_state.status if player_state else None
+        pq = player_state.player_queue if player_state else None
+        track = self.ynison.current_track if self.ynison else None
+        key = (
+            track.playable_id if track else None,
+            status.paused if status else None,
+            tuple(getattr(d.volume_info, "volume", None) for d in state.devices or []),
+            pq.current_playable_index if pq else None,
+            len(pq.playable_list) if pq else None,
+            pq.entity_id if pq else None,
+            pq.version.version if pq and pq.version else None,
+            pq.options.repeat_mode if pq else None,
+            (pq.model_extra or {}).get("shuffle_optional") is not None if pq else None,
+        )
+        progress_ms = status.progress_ms if status else 0
+        now = time.monotonic()
+        if key == self._last_progress_key and now - self._last_progress_at < self.quotas.progress_interval:
+            speed = 0 if not status or status.paused else status.playback_speed
+            expected = self._last_progress_ms + (now - self._last_progress_at) * 1000 * speed
+            if abs(progress_ms - expected) <= SEEK_TOLERANCE_MS:
+                return True
+        self._last_progress_key, self._last_progress_at, self._last_progress_ms = key, now, progress_ms
+        return False
+
+    async def on_ynison_message(self, state):
+        """Апдейт от Ynison. При превышении messages_per_min апдейты только с прогрессом прореживаются."""
+        self.messages.hit()
+        self._set_degraded("progress_rate", self.messages.total() > self.quotas.messages_per_min)
+        if "progress_rate" in self.degraded and self._progress_only(state):
+            return
+        await self.handle_ynison_state(state)
+
     async def handle_ynison_state(self, state):
         try:
             state_dict = state.model_dump(by_alias=True)
+            queue = (state_dict.get("player_state") or {}).get("player_queue") or {}
+            over = len(queue.get("playable_list") or []) > self.quotas.queue_items
+            self._set_degraded("queue_window", over)
+            if over:
+                window_queue(state_dict, self.quotas.queue_window)
             
+            self._state_seq += 1
             if self.on_update_callback:
                 await self.on_update_callback(self.token, state_dict)
             
-            asyncio.create_task(self.enrich_and_broadcast(state_dict))
+            self.tasks.spawn("enrich", self.enrich_and_broadcast(state_dict, self._state_seq))
             
         except Exception as e:
             logger.error(f"[{self.token[:4]}..] State handle error: {e}")
 
-    async def enrich_and_broadcast(self, state_dict):
-        """Обогащает стейт метаданными и транслирует его повторно, когда данные готовы."""
+    async def enrich_and_broadcast(self, state_dict, seq: Optional[int] = None):
+        """
+        Обогащает стейт метаданными и транслирует его повторно, когда данные готовы.
+        Если за время обогащения пришёл стейт новее `seq`, рассылать нечего: клиенты уже получили более новый.
+        """
         try:
             player_state = state_dict.get("player_state", {})
             queue = player_state.get("player_queue", {})
@@ -103,6 +238,9 @@ class YnisonSession:
                 return
             
             await self.enrich_state_dict(state_dict)
+            if seq is not None and seq != self._state_seq:
+                return
+            self.last_state = state_dict
             
             if self.on_update_callback:
                 tid = "unknown"
@@ -117,6 +255,25 @@ class YnisonSession:
         except Exception as e:
             logger.error(f"Background enrichment failed: {e}")
 
+    def snapshot(self) -> Optional[dict]:
+        """
+        Компактный снимок для тёплого рестарта: последний обогащённый стейт и горячие метаданные.
+        Ревизии библиотеки не сохраняются: сама библиотека в снимок не входит, а при старте её
+        свежесть и так проверяет HTTP-кэш (ETag), так что ревизии не на что было бы опереться.
+        """
+        if not self.last_state:
+            return None
+        hot = list(self.track_cache.items())[-HOT_METADATA_LIMIT:]
+        return {
+            "state": compact_state(self.last_state),
+            "track_cache": dict(hot),
+        }
+
+    def restore(self, snapshot: dict):
+        """Подхватывает снимок до start(): метаданные не придётся запрашивать заново."""
+        self.track_cache.update(snapshot.get("track_cache") or {})
+        self.last_state = snapshot.get("state")
+
     async def handle_close(self, *args):
         self.is_connected = False
 
@@ -138,6 +295,7 @@ class YnisonSession:
                     track["is_liked"] = tid in self.liked_tracks
                     track["is_disliked"] = tid in self.disliked_tracks
                     
+                    ENRICH_CACHE.inc(outcome="hit" if tid in self.track_cache else "miss")
                     if tid not in self.track_cache and self.api_client:
                         try:
                             logger.info(f"Enriching metadata for track {tid}...")
@@ -165,55 +323,230 @@ class YnisonSession:
         except Exception as e:
             logger.error(f"Enrich state error: {e}")
 
+    @property
+    def command_handlers(self):
+        return {
+            "play_pause": self.play_pause,
+            "next": self.next,
+            "prev": self.prev,
+            "like": self.like,
+            "dislike": self.dislike,
+            "transport": self.transport,
+            "volume_up": self.volume_up,
+            "volume_down": self.volume_down,
+            "mute": self.mute,
+            "volume": self.volume,
+            "seek": self.seek,
+            "macro": self.macro,
+            "play_preset": self.play_preset,
+        }
+
+    def supports(self, action: str) -> bool:
+        return action in self.command_handlers and action not in FOLDED_ACTIONS
+
+    async def execute_command(self, command: Command) -> bool:
+        self.commands_sent.hit()
+        handler = self.command_handlers.get(command.action)
+        if handler is None:
+            raise ValueError(f"Unknown action: {command.action}")
+        return await handler(**command.params)
+
+    async def emit_event(self, event: dict):
+        """Отправляет служебное событие (не стейт) подписчикам /ws этого токена."""
+        if self.on_update_callback:
+            await self.on_update_callback(self.token, event)
+
     async def play_pause(self):
-        if self.ynison: await self.ynison.toggle_play_pause()
+        if not self.ynison: return False
+        return await self.ynison.toggle_play_pause()
         
     async def next(self):
-        if self.ynison: await self.ynison.next()
+        if not self.ynison: return False
+        return await self.ynison.next()
         
     async def prev(self):
-        if self.ynison: await self.ynison.prev()
+        if not self.ynison: return False
+        return await self.ynison.prev()
+
+    async def transport(self, offset: int = 0, skip: bool = False, toggle: bool = False):
+        """Склеенная пачка next/prev/play_pause (см. commands.fold_transport)."""
+        if not self.ynison: return False
+        return await self.ynison.transport(offset=offset, skip=skip, toggle=toggle)
+
+    async def volume_up(self):
+        return await self.volume(steps=1)
+
+    async def volume_down(self):
+        return await self.volume(steps=-1)
+
+    async def mute(self):
+        return await self.volume(toggle_mute=True)
+
+    async def volume(self, steps: int = 0, toggle_mute: bool = False):
+        """Склеенная пачка volume_up/volume_down/mute (см. commands.fold_volume); итог уходит в /ws стейтом."""
+        if not self.ynison: return False
+        if not await self.ynison.change_volume(steps=steps, toggle_mute=toggle_mute):
+            return False
+        if self.ynison.state:
+            await self.handle_ynison_state(self.ynison.state)
+        return True
         
+    async def seek(self, position_ms: Optional[int] = None, offset_ms: Optional[int] = None):
+        """Перемотка на абсолютную позицию и/или относительно неё (или текущей позиции), в мс."""
+        if not self.ynison: return False
+        if position_ms is None and offset_ms is None:
+            raise ValueError("position_ms or offset_ms required")
+        base = self.ynison.calculate_current_progress() if position_ms is None else int(position_ms)
+        if not await self.ynison.seek(base + int(offset_ms or 0)):
+            return False
+        if self.ynison.state:
+            await self.handle_ynison_state(self.ynison.state)
+        return True
+
+    async def macro(self, steps: list):
+        """
+        Выполняет последовательность шагов за один проход и с одним command_result в конце.
+
+        Лайки/дизлайки применяются локально (к треку, который будет текущим на этом шаге)
+        и уходят через write-behind; next/prev/play_pause/seek сворачиваются в один
+        update_player_state; громкость — в один update_volume_info.
+        """
+        steps = parse_macro_steps(steps)
+        if not self.ynison or not self.ynison.state or not self.ynison.state.player_state: return False
+        pq = self.ynison.state.player_state.player_queue
+
+        offset, skip, toggle, position_ms = 0, False, False, None
+        volume_steps, toggle_mute = 0, False
+        library = []
+        for action, params in steps:
+            if action == "play_pause":
+                toggle = not toggle
+            elif action in TRANSPORT_OFFSETS:
+                offset += TRANSPORT_OFFSETS[action]
+                skip, toggle, position_ms = True, False, None
+            elif action == "seek":
+                if params.get("position_ms") is not None:
+                    position_ms = int(params["position_ms"])
+                elif position_ms is None:
+                    position_ms = 0 if skip else self.ynison.calculate_current_progress()
+                position_ms += int(params.get("offset_ms") or 0)
+            elif action == "mute":
+                toggle_mute = not toggle_mute
+            elif action in VOLUME_STEPS:
+                volume_steps += VOLUME_STEPS[action]
+                toggle_mute = False
+            else:
+                # как и transport: переход за край очереди остаётся на крайнем треке
+                idx = min(max(pq.current_playable_index + offset, 0), len(pq.playable_list) - 1)
+                if idx >= 0 and self.library_writer:
+                    library.append(("likes" if action == "like" else "dislikes", pq.playable_list[idx].playable_id))
+
+        for type_, tid in library:
+            self._toggle_library(type_, tid)
+
+        ok = True
+        if skip or toggle or position_ms is not None:
+            ok = await self.ynison.transport(offset=offset, skip=skip, toggle=toggle, position_ms=position_ms)
+        if ok and (volume_steps or toggle_mute):
+            ok = await self.ynison.change_volume(steps=volume_steps, toggle_mute=toggle_mute)
+
+        if self.ynison.state:
+            await self.handle_ynison_state(self.ynison.state)
+        return ok
+
+    async def play_preset(self, kind: str, entity_id: str):
+        """Запуск пресета; если он ещё не разрешён заранее (POST /presets), разрешается здесь."""
+        if not self.ynison or not self.presets: return False
+        preset = self.presets.get(kind, entity_id) or await self.presets.resolve(kind, entity_id)
+        return await self.ynison.play_preset(preset)
+
+    def _toggle_library(self, type_: str, tid: str):
+        """Переключает трек в локальном множестве и ставит изменение в очередь отложенной записи."""
+        tracks = self.liked_tracks if type_ == "likes" else self.disliked_tracks
+        was_set = tid in tracks
+        if was_set:
+            tracks.discard(tid)
+        else:
+            tracks.add(tid)
+        self.library_writer.toggle(type_, tid, not was_set, was_set)
+
+    async def rollback_library_change(self, type_: str, tid: str, state: bool):
+        """Возвращает локальное множество к состоянию апстрима после неудачной записи и рассылает поправку."""
+        tracks = self.liked_tracks if type_ == "likes" else self.disliked_tracks
+        if state:
+            tracks.add(tid)
+        else:
+            tracks.discard(tid)
+        if self.ynison and self.ynison.state:
+            await self.handle_ynison_state(self.ynison.state)
+
     async def like(self):
-        if not self.ynison or not self.ynison.current_track: return
+        if not self.ynison or not self.ynison.current_track: return False
         tid = self.ynison.current_track.playable_id
-        if not tid or not self.api_client: return
+        if not tid or not self.library_writer: return False
         
         try:
-            if tid in self.liked_tracks:
-                await self.api_client.unlike_track(tid)
-                self.liked_tracks.discard(tid)
-            else:
-                await self.api_client.like_track(tid)
-                self.liked_tracks.add(tid)
-            
+            self._toggle_library("likes", tid)
             if self.ynison.state:
                 await self.handle_ynison_state(self.ynison.state)
+            return True
         except Exception as e:
             logger.error(f"Like failed: {e}")
+            return False
 
     async def dislike(self):
-        if not self.ynison or not self.ynison.current_track: return
+        if not self.ynison or not self.ynison.current_track: return False
         tid = self.ynison.current_track.playable_id
-        if not tid or not self.api_client: return
+        if not tid or not self.library_writer: return False
         
         try:
-            if tid in self.disliked_tracks:
-                await self.api_client.undislike_track(tid)
-                self.disliked_tracks.discard(tid)
-            else:
-                await self.api_client.dislike_track(tid)
-                self.disliked_tracks.add(tid)
-            
+            self._toggle_library("dislikes", tid)
             if self.ynison.state:
                 await self.handle_ynison_state(self.ynison.state)
+            return True
         except Exception as e:
             logger.error(f"Dislike failed: {e}")
+            return False
+
+    def accounting(self) -> dict:
+        queue_items = 0
+        player_state = self.ynison.state.player_state if self.ynison and self.ynison.state else None
+        if player_state and player_state.player_queue:
+            queue_items = len(player_state.player_queue.playable_list or [])
+        likes = estimate_bytes(self.liked_tracks) + estimate_bytes(self.disliked_tracks)
+        cache = estimate_bytes(self.track_cache, self.track_cache.items())
+        messages = self.messages.total()
+        requests = self.api_client.request_rate.total() if self.api_client else 0
+        flags = sorted(self.degraded)
+        if len(self.liked_tracks) + len(self.disliked_tracks) > self.quotas.likes:
+            flags.append("likes")
+        if requests > self.quotas.requests_per_min:
+            flags.append("requests_rate")
+        return {
+            "token": f"{self.token[:4]}..",
+            "connected": self.is_connected,
+            "queue_items": queue_items,
+            "likes": len(self.liked_tracks),
+            "dislikes": len(self.disliked_tracks),
+            "track_cache_entries": len(self.track_cache),
+            "memory_bytes": {"likes": likes, "track_cache": cache, "total": likes + cache},
+            "pending_commands": self.commands.depth,
+            "background_tasks": self.tasks.counts(),
+            "messages_per_min": messages,
+            "commands_per_min": self.commands_sent.total(),
+            "requests_per_min": requests,
+            "over_quota": flags,
+        }
 
     async def close(self):
         self.running = False
+        await self.tasks.close()  # воркер команд и таймер лайков тоже в группе; недоотправленное уйдёт в close() ниже
+        await self.commands.close()
+        if self.library_writer:
+            await self.library_writer.close()
         if self.api_client:
             await self.api_client.close()
+        get_scheduler().forget(self.token)
         
         if self.ynison and hasattr(self.ynison, 'close'):
              try:
@@ -225,25 +558,84 @@ class YnisonSession:
 
 
 class SessionManager:
-    def __init__(self):
+    def __init__(self, quotas: Optional[SessionQuotas] = None):
         self.sessions: Dict[str, YnisonSession] = {}
+        self.quotas = quotas or SessionQuotas.from_env()
         self.on_global_update = None 
+        self.client_count = None  # token -> число живых /ws клиентов, с учётом других воркеров (ставит main)
+        self.validator = TokenValidator()
+        self._snapshots: Dict[str, Optional[dict]] = {}  # снимки, поднятые с диска, но ещё не отданные сессии
+        self._starting: Dict[str, asyncio.Future] = {}  # сессии, которые сейчас создаются: их ждут, а не создают заново
+        get_admission().is_watched = self._is_watched
+        COLLECTORS.append(self._collect)
         
     async def get_session(self, token: str) -> YnisonSession:
         if not token:
             raise ValueError("Token required")
             
-        if token not in self.sessions:
-            logger.info(f"Creating new session for token {token[:5]}...")
-            session = YnisonSession(token, self.on_session_update)
-            try:
-                await session.start()
-                self.sessions[token] = session
-            except Exception as e:
-                 logger.error(f"Failed to start session for {token[:5]}: {e}")
-                 raise e
-            
-        return self.sessions[token]
+        if token in self.sessions:
+            return self.sessions[token]
+        # несколько /ws клиентов одного токена подключаются разом: без общего ожидания каждый создал бы
+        # свою сессию, а все, кроме последней, остались бы без ссылки — со своим run_loop и сокетами Ynison
+        starting = self._starting.get(token)
+        if starting is None:
+            starting = self._starting[token] = asyncio.ensure_future(self._create_session(token))
+            starting.add_done_callback(lambda _: self._starting.pop(token, None))
+        return await asyncio.shield(starting)
+
+    async def _create_session(self, token: str) -> YnisonSession:
+        logger.info(f"Creating new session for token {token[:5]}...")
+        session = YnisonSession(token, self.on_session_update, self.quotas)
+        snapshot = await self.load_snapshot(token)
+        self._snapshots.pop(token, None)
+        if snapshot:
+            session.restore(snapshot)
+        try:
+            await session.start()
+            self.sessions[token] = session
+            self.validator.remember(token, True)
+        except PermissionError:
+             self.validator.remember(token, False)
+             raise
+        except Exception as e:
+             logger.error(f"Failed to start session for {token[:5]}: {e}")
+             raise e
+        return session
+
+    async def load_snapshot(self, token: str) -> Optional[dict]:
+        """
+        Лениво поднимает снимок токена, сохранённый при прошлой остановке.
+        Для уже запущенной сессии снимок не нужен — у неё есть живой стейт.
+        """
+        if token in self.sessions:
+            return None
+        if token not in self._snapshots:
+            self._snapshots[token] = await get_snapshot_store().load(token)
+        return self._snapshots[token]
+
+    def accounting(self) -> list:
+        """Стоимость сессий для /debug/sessions, самые дорогие по памяти — первыми."""
+        result = []
+        for token, session in self.sessions.items():
+            entry = session.accounting()
+            entry["ws_clients"] = self.client_count(token) if self.client_count else 0
+            result.append(entry)
+        return sorted(result, key=lambda a: -a["memory_bytes"]["total"])
+
+    def _collect(self):
+        connected = sum(1 for session in self.sessions.values() if session.is_connected)
+        SESSIONS.set(connected, state="connected")
+        SESSIONS.set(len(self.sessions) - connected, state="reconnecting")
+
+    def _is_watched(self, token: str) -> bool:
+        return bool(self.client_count and self.client_count(token))
+
+    async def validate_token(self, token: str) -> bool:
+        """Проверяет токен, не поднимая сессию. Живая сессия — уже достаточное доказательство."""
+        session = self.sessions.get(token)
+        if session and session.running:
+            return True
+        return await self.validator.validate(token)
 
     async def on_session_update(self, token, state):
         if self.on_global_update:
@@ -251,6 +643,8 @@ class SessionManager:
 
     async def shutdown(self):
         logger.info("Shutting down SessionManager...")
+        snapshots = {token: snap for token, session in self.sessions.items() if (snap := session.snapshot())}
+        await get_snapshot_store().save_many(snapshots)
         for token, session in self.sessions.items():
             logger.info(f"Closing session for {token[:5]}...")
             await session.close()
@@ -258,6 +652,8 @@ class SessionManager:
 
     async def shutdown(self):
         logger.info("Shutting down SessionManager...")
+        snapshots = {token: snap for token, session in self.sessions.items() if (snap := session.snapshot())}
+        await get_snapshot_store().save_many(snapshots)
         for token, session in self.sessions.items():
             logger.info(f"Closing session for {token[:5]}...")
             await session.close()
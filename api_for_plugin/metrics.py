@@ -0,0 +1,151 @@
+import math
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+
+class Counter:
+    """Монотонный счётчик с метками."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        register(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge:
+    """Текущее значение с метками (глубина очереди, число сессий и т.п.)."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        register(self)
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами в духе Prometheus.
+    Значения группируются по набору меток (labels).
+    """
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        register(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [счётчики по корзинам..., +Inf, sum, max]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-2] += value
+            series[-1] = max(series[-1], value)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], dict]:
+        with self._lock:
+            result = {}
+            for key, series in self._series.items():
+                count = series[len(self.buckets)]
+                result[key] = {
+                    "count": count,
+                    "sum": series[-2],
+                    "max": series[-1],
+                    "avg": series[-2] / count if count else 0.0,
+                    "buckets": dict(zip(self.buckets, series[:len(self.buckets)])),
+                }
+            return result
+
+
+REGISTRY: Dict[str, object] = {}
+
+
+def register(metric):
+    REGISTRY[metric.name] = metric
+    return metric
+
+
+# функции, которые обновляют gauge-метрики прямо перед выдачей (число сессий, сокетов и т.п.)
+COLLECTORS: List[Callable[[], None]] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], le: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if le:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_text() -> str:
+    """Все зарегистрированные метрики в текстовом формате Prometheus (для /metrics)."""
+    for collect in COLLECTORS:
+        collect()
+
+    lines = []
+    for name, metric in sorted(REGISTRY.items()):
+        kind = "counter" if isinstance(metric, Counter) else "gauge" if isinstance(metric, Gauge) else "histogram"
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind != "histogram":
+            for key, value in sorted(metric.snapshot().items()):
+                lines.append(f"{name}{_labels(metric.labelnames, key)} {_number(value)}")
+            continue
+        for key, series in sorted(metric.snapshot().items()):
+            for bound, count in series["buckets"].items():
+                lines.append(f"{name}_bucket{_labels(metric.labelnames, key, _number(bound))} {count}")
+            lines.append(f"{name}_bucket{_labels(metric.labelnames, key, '+Inf')} {series['count']}")
+            lines.append(f"{name}_sum{_labels(metric.labelnames, key)} {_number(series['sum'])}")
+            lines.append(f"{name}_count{_labels(metric.labelnames, key)} {series['count']}")
+    return "\n".join(lines) + "\n"
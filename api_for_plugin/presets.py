@@ -0,0 +1,163 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass
+from scheduler import Priority
+from typing import Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger("Presets")
+
+PRESET_KINDS = ("track", "album", "playlist")
+ENTITY_TYPES = {"track": "VARIOUS", "album": "ALBUM", "playlist": "PLAYLIST"}
+PRESET_FROM = "deck-preset"
+
+
+@dataclass
+class Preset:
+    kind: str
+    entity_id: str
+    title: str
+    track_count: int
+    queue_json: str  # player_queue без version: '{"entity_id": ..., "playable_list": [...], ...'
+    resolved_at: float
+
+    def build_payload(self) -> str:
+        """
+        Собирает готовый update_player_state: к заранее сериализованной очереди
+        дописываются только version и timestamp, без обращения к REST и без повторной сериализации.
+        """
+        current_ts = time.time_ns()
+        version = json.dumps({"device_id": str(uuid.uuid4()), "version": current_ts, "timestamp_ms": 0})
+        status = (
+            '{"duration_ms": 0, "paused": false, "playback_speed": 1, "progress_ms": 0, '
+            f'"version": {version}}}'
+        )
+        return (
+            f'{{"update_player_state": {{"player_state": {{"player_queue": {self.queue_json}, "version": {version}}}, '
+            f'"status": {status}}}}}, "rid": "{uuid.uuid4()}", "player_action_timestamp_ms": {current_ts}, '
+            '"activity_interception_type": "DO_NOT_INTERCEPT_BY_DEFAULT"}'
+        )
+
+
+def _playable(track: dict, album_id: Optional[str] = None) -> Optional[dict]:
+    track_id = track.get("id")
+    if track_id is None or track.get("available") is False:
+        return None
+    albums = track.get("albums") or []
+    cover = track.get("coverUri") or track.get("cover_uri")
+    return {
+        "playable_id": str(track_id),
+        "playable_type": "TRACK",
+        "album_id_optional": str(album_id or (albums[0].get("id") if albums else "") or "") or None,
+        "title": track.get("title"),
+        "cover_url_optional": cover,
+        "from": PRESET_FROM,
+    }
+
+
+class PresetCache:
+    """
+    Заранее разрешённые пресеты быстрого запуска одного токена.
+
+    При resolve() метаданные и список треков альбома/плейлиста загружаются пачкой,
+    а очередь Ynison сериализуется один раз. Нажатие берёт готовый Preset
+    и только проставляет версию (см. Preset.build_payload).
+    """
+    MAX_QUEUE = 500
+
+    def __init__(self, api_client, ttl: float = 600.0):
+        self.api_client = api_client
+        self.ttl = ttl
+        self._presets: Dict[Tuple[str, str], Preset] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def get(self, kind: str, entity_id: str) -> Optional[Preset]:
+        preset = self._presets.get((kind, entity_id))
+        if preset and time.monotonic() - preset.resolved_at < self.ttl:
+            return preset
+        return None
+
+    async def resolve(self, kind: str, entity_id: str) -> Preset:
+        if kind not in PRESET_KINDS:
+            raise ValueError(f"Unknown preset kind: {kind}")
+        if preset := self.get(kind, entity_id):
+            return preset
+
+        key = (kind, entity_id)
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            preset = await self._build(kind, entity_id)
+            self._presets[key] = preset
+            fut.set_result(preset)
+            return preset
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _build(self, kind: str, entity_id: str) -> Preset:
+        title, items, queue_entity_id = await self._fetch(kind, entity_id)
+        items = [item for item in items if item][:self.MAX_QUEUE]
+        if not items:
+            raise LookupError(f"Preset {kind}:{entity_id} has no playable tracks")
+
+        queue = {
+            "entity_id": queue_entity_id,
+            "entity_type": ENTITY_TYPES[kind],
+            "current_playable_index": 0,
+            "playable_list": items,
+            "options": {"repeat_mode": "NONE"},
+            "entity_context": "BASED_ON_ENTITY_BY_DEFAULT",
+            "from_optional": PRESET_FROM,
+        }
+        logger.info(f"Resolved preset {kind}:{entity_id} ({len(items)} tracks)")
+        return Preset(
+            kind=kind,
+            entity_id=entity_id,
+            title=title,
+            track_count=len(items),
+            queue_json=json.dumps(queue)[:-1],
+            resolved_at=time.monotonic(),
+        )
+
+    async def _fetch(self, kind: str, entity_id: str) -> Tuple[str, List[Optional[dict]], str]:
+        api = self.api_client
+        if kind == "track":
+            track = await api.get_track(entity_id, Priority.INTERACTIVE)
+            if not track:
+                raise LookupError(f"Track {entity_id} not found")
+            return track.get("title", ""), [_playable(track)], ""
+
+        if kind == "album":
+            album = await api.get_album_with_tracks(entity_id, Priority.INTERACTIVE)
+            if not album:
+                raise LookupError(f"Album {entity_id} not found")
+            tracks = [t for volume in album.get("volumes") or [] for t in volume]
+            return album.get("title", ""), [_playable(t, entity_id) for t in tracks], str(entity_id)
+
+        owner, _, playlist_kind = entity_id.partition(":")
+        if not playlist_kind:
+            owner, playlist_kind = api.uid, entity_id
+        playlist = await api.get_playlist(owner, playlist_kind, Priority.INTERACTIVE)
+        if not playlist:
+            raise LookupError(f"Playlist {entity_id} not found")
+
+        entries = playlist.get("tracks") or []
+        full = {str(e["track"]["id"]): e["track"] for e in entries if isinstance(e.get("track"), dict)}
+        missing = [str(e["id"]) for e in entries if e.get("id") is not None and str(e["id"]) not in full]
+        if missing:
+            for track in await api.get_tracks(missing[:self.MAX_QUEUE], Priority.INTERACTIVE):
+                full[str(track.get("id"))] = track
+
+        ordered = [full.get(str(e.get("id") or (e.get("track") or {}).get("id"))) for e in entries]
+        items = [_playable(t) for t in ordered if t]
+        return playlist.get("title", ""), items, f"{owner}:{playlist_kind}"
@@ -0,0 +1,138 @@
+"""
+Профилирование процесса по запросу (/debug/profile).
+
+cpu, format=collapsed — сэмплер: отдельный поток раз в `interval` снимает стек потока event loop
+    (sys._current_frames) и копит свёрнутые стеки "a;b;c 42" — вход для flamegraph.pl/speedscope.
+    Стоит почти ничего и видит всё, что блокирует цикл.
+cpu, format=pstats — cProfile на потоке цикла за то же окно: точные счётчики вызовов,
+    но сервис на это время заметно замедляется.
+alloc — разница снимков tracemalloc в начале и в конце окна: что выросло и где аллоцировано.
+
+Одновременно идёт только один профиль: второй запрос получит ProfilerBusy.
+"""
+import io
+import sys
+import asyncio
+import cProfile
+import pstats
+import threading
+import tracemalloc
+from pathlib import Path
+from collections import Counter
+
+
+MODES = ("cpu", "alloc")
+FORMATS = ("collapsed", "pstats")
+MAX_SECONDS = 60.0
+
+_running = False
+
+
+class ProfilerBusy(RuntimeError):
+    """Профиль уже снимается."""
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{Path(code.co_filename).name}:{getattr(code, 'co_qualname', code.co_name)}"  # co_qualname — с 3.11
+
+
+def collapse(frame) -> str:
+    """Стек от внешнего вызова к внутреннему: "main.py:<module>;base_events.py:run_forever;..."."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Снимает стек потока `thread_id` каждые `interval` секунд, пока не вызван stop()."""
+
+    def __init__(self, thread_id: int, interval: float = 0.01):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+            del frame
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def format_collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+async def sample_cpu(seconds: float, interval: float = 0.01) -> Counter:
+    sampler = StackSampler(threading.get_ident(), interval)
+    sampler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+    return sampler.stacks
+
+
+async def profile_pstats(seconds: float, limit: int = 40) -> str:
+    profile = cProfile.Profile()
+    profile.enable()  # только поток цикла — а в нём и работает весь сервис
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profile.disable()
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+async def allocation_diff(seconds: float, limit: int = 30, frames: int = 5) -> str:
+    """Топ роста памяти за окно. Если tracemalloc уже включён (например, soak.py), он не выключается."""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        traced = tracemalloc.get_traced_memory()[0]
+    finally:
+        if started:
+            tracemalloc.stop()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "traceback")
+    lines = [f"# traced {traced / 1e6:.1f} MB, top {limit} by growth over {seconds:g} s"]
+    for stat in diff[:limit]:
+        lines.append(f"{stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks), now {stat.size / 1024:.1f} KiB")
+        lines.extend(f"    {line}" for line in stat.traceback.format(most_recent_first=True))
+    return "\n".join(lines) + "\n"
+
+
+async def run_profile(mode: str, seconds: float, format: str = "collapsed", limit: int = 40) -> str:
+    """Снимает профиль `mode` за `seconds` секунд и возвращает его текстом."""
+    global _running
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of: {', '.join(MODES)}")
+    if format not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    if not 0 < seconds <= MAX_SECONDS:
+        raise ValueError(f"seconds must be in (0, {MAX_SECONDS:g}]")
+    if _running:
+        raise ProfilerBusy("another profile is running")
+    _running = True
+    try:
+        if mode == "alloc":
+            return await allocation_diff(seconds, limit)
+        if format == "pstats":
+            return await profile_pstats(seconds, limit)
+        return format_collapsed(await sample_cpu(seconds))
+    finally:
+        _running = False
@@ -0,0 +1,148 @@
+"""
+Проигрывает запись Ynison (YM_API_RECORD_DIR, см. ynison/recording.py) через весь конвейер сервиса:
+YnisonPlayer._process_ws_message → YnisonSession (квоты, обогащение) → main.on_state_update → /ws клиенты.
+
+Вместо /ws клиентов подключаются заглушки, которые только засекают, когда до них дошёл стейт
+каждого кадра (по rid). REST берётся из fakes/rest.py в том же процессе, если не задан --rest-url.
+Скорость: 1 — в реальном времени, N — в N раз быстрее, 0 — так быстро, как получится.
+
+    python replay.py recordings/3f2a9c01d4e5-1718000000-5b1c2d3e.ynrec --speed 0 --clients 3
+"""
+import os
+import re
+import time
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+from utils.auth import AuthStorage
+from ynison.player import YnisonPlayer
+from ynison.recording import read_frames, recording_info
+
+
+RID_RE = re.compile(r'"rid":\s*"([^"]+)"')
+QUIET_PERIOD = 0.2
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ReplayClient:
+    """Заглушка /ws клиента: запоминает моменты получения стейта по rid кадра."""
+
+    def __init__(self, received: Dict[str, List[float]]):
+        self.received = received
+        self.messages = 0
+        self.bytes = 0
+        self.last_at = 0.0
+
+    async def send_text(self, msg: str):
+        self.last_at = time.monotonic()
+        self.messages += 1
+        self.bytes += len(msg)
+        if match := RID_RE.search(msg):
+            self.received.setdefault(match.group(1), []).append(time.monotonic())
+
+
+async def replay(path: Path, speed: float = 0.0, token: str = "replay-token", clients: int = 1,
+                 rest_url: Optional[str] = None) -> dict:
+    import main
+    from manager import YnisonSession
+    from yandex_api import YandexMusicAPI
+
+    fake_rest = None
+    if rest_url is None:
+        from fakes.rest import FakeRest
+        fake_rest = FakeRest()
+        rest_url = await fake_rest.start()
+    previous_base_url, YandexMusicAPI.BASE_URL = YandexMusicAPI.BASE_URL, rest_url
+
+    received: Dict[str, List[float]] = {}
+    sockets = [ReplayClient(received) for _ in range(clients)]
+    main.connected_websockets[token] = set(sockets)
+    session = YnisonSession(token, main.on_state_update, main.manager.quotas)
+    main.manager.sessions[token] = session  # рассылки идут в группе задач сессии, с её лимитами, как в сервисе
+
+    fed: Dict[str, float] = {}
+    process_times: List[float] = []
+    frames = 0
+    try:
+        await session.start(connect=False)
+        session.ynison = YnisonPlayer(AuthStorage(token=token), base_url="ws://replay.invalid")
+        session.ynison.on_receive = session.on_ynison_message
+
+        started = time.monotonic()
+        for at, frame in read_frames(path):
+            if speed > 0:
+                delay = started + at / speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if match := RID_RE.search(frame):
+                fed[match.group(1)] = time.monotonic()
+            frame_started = time.monotonic()
+            await session.ynison._process_ws_message(frame)
+            process_times.append(time.monotonic() - frame_started)
+            frames += 1
+            if speed <= 0 and frames % 64 == 0:
+                await asyncio.sleep(0)  # даём обогащению и рассылке идти параллельно, как в жизни
+
+        # дожидаемся обогащения и рассылок последних кадров: задач сессии нет и клиенты 0.2 с ничего не получают
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and (
+                len(session.tasks) or time.monotonic() - max(s.last_at for s in sockets) < QUIET_PERIOD):
+            await asyncio.sleep(0.01)
+        elapsed = time.monotonic() - started - QUIET_PERIOD
+    finally:
+        await session.close()
+        main.manager.sessions.pop(token, None)
+        main.connected_websockets.pop(token, None)
+        YandexMusicAPI.BASE_URL = previous_base_url
+        if fake_rest:
+            await fake_rest.stop()
+
+    first = [times[0] - fed[rid] for rid, times in received.items() if rid in fed]
+    last = [max(times) - fed[rid] for rid, times in received.items() if rid in fed]
+    return {
+        "frames": frames,
+        "seconds": elapsed,
+        "frames_per_s": frames / elapsed if elapsed else 0.0,
+        "delivered_frames": len(first),
+        "last_frame_delivered": bool(fed) and max(fed, key=fed.get) in received,
+        "client_messages": sum(s.messages for s in sockets),
+        "client_mb": sum(s.bytes for s in sockets) / 1e6,
+        "process_p50_ms": percentile(process_times, 0.5) * 1000,
+        "process_p99_ms": percentile(process_times, 0.99) * 1000,
+        "state_p50_ms": percentile(first, 0.5) * 1000,
+        "state_p99_ms": percentile(first, 0.99) * 1000,
+        "enriched_p50_ms": percentile(last, 0.5) * 1000,
+        "enriched_p99_ms": percentile(last, 0.99) * 1000,
+        "degraded": sorted(session.degraded),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", type=Path)
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = real time, 0 = as fast as possible")
+    parser.add_argument("--clients", type=int, default=1, help="stub /ws clients for the token")
+    parser.add_argument("--token", default="replay-token", help="token for the fake REST user (likes, metadata)")
+    parser.add_argument("--rest-url", default=None, help="REST base URL; default: in-process fakes.rest")
+    parser.add_argument("--verbose", action="store_true", help="keep the service's INFO logging (slower)")
+    args = parser.parse_args()
+
+    import main  # noqa: F401 — настраивает логирование сервиса, поверх которого replay приглушает INFO
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    os.environ.pop("YM_API_RECORD_DIR", None)  # не записываем то, что проигрываем
+    info = recording_info(args.recording)
+    print(f"{args.recording}: v{info['version']}, compressed={info['compressed']}, "
+          f"recorded {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(info['started_at']))}")
+    result = asyncio.run(replay(args.recording, args.speed, args.token, args.clients, args.rest_url))
+    for key, value in result.items():
+        print(f"{key:>18}: {value:.2f}" if isinstance(value, float) else f"{key:>18}: {value}")
@@ -0,0 +1,129 @@
+import heapq
+import asyncio
+import itertools
+from enum import IntEnum
+from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+from metrics import Histogram
+from utils.token_bucket import TokenBucket
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0   # нажатия кнопок: like/dislike, проверка токена
+    ENRICHMENT = 1    # догрузка метаданных трека для стейта
+    BACKGROUND = 2    # синхронизация библиотеки, статус аккаунта при старте сессии
+
+
+REQUEST_QUEUE_SECONDS = Histogram(
+    "ym_api_request_queue_seconds",
+    "Time an outbound Yandex Music API request waited in the scheduler",
+    labelnames=("priority",),
+)
+
+
+class _SlotPool:
+    """Ограниченное число слотов; ждущие получают их по приоритету, при равном — в порядке прихода."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.active = 0
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for *_, fut in self._waiters if not fut.done())
+
+    async def acquire(self, priority: Priority):
+        if self.active < self.size and not self.queued:
+            self.active += 1
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # слот уже передан нам, но задачу отменили — отдаём его следующему
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            *_, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)  # слот переходит ожидающему, счётчик не меняется
+                return
+        self.active -= 1
+
+
+class RequestScheduler:
+    """
+    Глобальный планировщик исходящих запросов к REST API Яндекс Музыки.
+
+    - общий лимит одновременных запросов на весь процесс;
+    - очередь ожидания с приоритетами: интерактивные запросы всегда идут первыми;
+    - token bucket на каждый токен, чтобы одна сессия не забивала апстрим фоновыми запросами.
+      Интерактивные запросы в ведро не упираются — их частоту ограничивает сам пользователь;
+    - потоковые ответы (библиотека на десятки тысяч треков) держат соединение, пока тело не дочитано,
+      поэтому берут слот из своего небольшого пула, а не из общего: иначе несколько скачиваний
+      подряд заняли бы общие слоты на секунды и интерактивные запросы ждали бы их.
+    """
+
+    def __init__(self, max_concurrency: int = 8, rate_per_token: float = 5.0, burst_per_token: float = 10.0,
+                 max_streams: int = 2):
+        self.max_concurrency = max_concurrency
+        self.max_streams = max_streams
+        self.rate_per_token = rate_per_token
+        self.burst_per_token = burst_per_token
+        self._requests = _SlotPool(max_concurrency)
+        self._streams = _SlotPool(max_streams)
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    @property
+    def active(self) -> int:
+        return self._requests.active
+
+    @property
+    def queued(self) -> int:
+        return self._requests.queued
+
+    @property
+    def streams(self) -> int:
+        return self._streams.active
+
+    def _bucket(self, token: str) -> TokenBucket:
+        bucket = self._buckets.get(token)
+        if bucket is None:
+            bucket = self._buckets[token] = TokenBucket(self.rate_per_token, self.burst_per_token)
+        return bucket
+
+    def forget(self, token: str):
+        """Удаляет состояние токена (вызывается при закрытии сессии)."""
+        self._buckets.pop(token, None)
+
+    @asynccontextmanager
+    async def slot(self, token: str, priority: Priority = Priority.BACKGROUND, stream: bool = False):
+        """stream=True — тело ответа читается потоком (см. класс): слот берётся из пула потоков."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        if priority != Priority.INTERACTIVE:
+            await self._bucket(token).acquire()
+        pool = self._streams if stream else self._requests
+        await pool.acquire(priority)
+        REQUEST_QUEUE_SECONDS.observe(loop.time() - started, priority=priority.name.lower())
+        try:
+            yield
+        finally:
+            pool.release()
+
+
+_scheduler: Optional[RequestScheduler] = None
+
+
+def get_scheduler() -> RequestScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RequestScheduler()
+    return _scheduler
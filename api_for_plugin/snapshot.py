@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Optional
+from utils.private_files import open_private, private_dir
+
+
+logger = logging.getLogger("Snapshots")
+
+HOT_METADATA_LIMIT = 256
+
+
+def compact_state(state: dict) -> dict:
+    """
+    Оставляет в очереди только текущий трек: клиенту для отрисовки нужен он один,
+    а очередь плейлиста может занимать сотни килобайт.
+    """
+    player_state = dict(state.get("player_state") or {})
+    queue = dict(player_state.get("player_queue") or {})
+    items = queue.get("playable_list") or []
+    idx = queue.get("current_playable_index", 0)
+    if items and 0 <= idx < len(items):
+        queue["playable_list"] = [items[idx]]
+        queue["current_playable_index"] = 0
+    player_state["player_queue"] = queue
+    return {**state, "player_state": player_state}
+
+
+class SnapshotStore:
+    """
+    Снимки сессий на диске (SQLite) для тёплого рестарта API.
+
+    При остановке сервиса сохраняется последний обогащённый стейт и горячие метаданные
+    треков каждого токена. При старте ничего не читается заранее:
+    снимок токена поднимается только когда к нему приходит первый клиент.
+    Ключ — хэш токена, сам токен на диск не попадает. Снимки старше `max_age` игнорируются.
+    Файл доступен только владельцу (0600); по умолчанию он лежит в личном каталоге пользователя
+    во временной папке (см. private_dir), а не в общем /tmp.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_age: float = 6 * 3600):
+        path = path or os.getenv("YM_API_SNAPSHOT_PATH")
+        if path:
+            self.path = Path(path)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        else:
+            self.path = private_dir(None, "ym_api_snapshots") / "snapshots.sqlite"
+        if not self.path.exists():
+            open_private(self.path).close()  # sqlite создал бы файл по umask, а журнал наследует его права
+        os.chmod(self.path, 0o600)
+        self.max_age = max_age
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS snapshots (key TEXT PRIMARY KEY, saved_at REAL NOT NULL, data BLOB NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        """Транзакция на отдельном соединении: вызывается из рабочих потоков asyncio.to_thread."""
+        db = sqlite3.connect(self.path, timeout=5)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _save_many(self, snapshots: Dict[str, dict]):
+        now = time.time()
+        rows = [
+            (self._key(token), now, zlib.compress(json.dumps(snapshot, separators=(",", ":")).encode()))
+            for token, snapshot in snapshots.items()
+        ]
+        with self._connect() as db:
+            db.executemany("INSERT OR REPLACE INTO snapshots (key, saved_at, data) VALUES (?, ?, ?)", rows)
+            db.execute("DELETE FROM snapshots WHERE saved_at < ?", (now - self.max_age,))
+
+    def _load(self, token: str) -> Optional[dict]:
+        with self._connect() as db:
+            row = db.execute("SELECT saved_at, data FROM snapshots WHERE key = ?", (self._key(token),)).fetchone()
+        if not row or time.time() - row[0] > self.max_age:
+            return None
+        try:
+            snapshot = json.loads(zlib.decompress(row[1]))
+        except (zlib.error, ValueError) as e:
+            logger.warning(f"Corrupted snapshot for {token[:4]}..: {e}")
+            return None
+        snapshot["saved_at"] = row[0]
+        return snapshot
+
+    async def save_many(self, snapshots: Dict[str, dict]):
+        if not snapshots:
+            return
+        try:
+            await asyncio.to_thread(self._save_many, snapshots)
+            logger.info(f"Saved {len(snapshots)} session snapshots to {self.path}")
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Failed to save snapshots: {e}")
+
+    async def load(self, token: str) -> Optional[dict]:
+        try:
+            return await asyncio.to_thread(self._load, token)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Failed to load snapshot: {e}")
+            return None
+
+
+_store: Optional[SnapshotStore] = None
+
+
+def get_snapshot_store() -> SnapshotStore:
+    global _store
+    if _store is None:
+        _store = SnapshotStore()
+    return _store
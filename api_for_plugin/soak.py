@@ -0,0 +1,299 @@
+"""
+Soak-тест: часы виртуального времени против fakes/ в одном процессе, с контролем роста памяти и задач.
+
+Время ускорено в --speed раз: time.monotonic/time.time подменяются виртуальными часами, а селектор
+event loop спит во столько же раз меньше, так что asyncio.sleep, таймауты aiohttp, TTL кэшей,
+окна квот и backoff переподключений идут с той же скоростью. Сервис (main.app через uvicorn),
+фейки и клиенты плагина живут в одном процессе, поэтому tracemalloc и asyncio.all_tasks видят всё.
+
+Трафик: N токенов по M /ws клиентов, нажатия кнопок, клиенты периодически уходят — поровну
+штатно и обрывом сокета без close-фрейма — и возвращаются; фейковый Ynison рвёт сокеты стейта
+(1006) через --ynison-drop-after, REST отвечает 503 с долей --rest-error-rate.
+
+Каждые --snapshot-every виртуальных секунд снимается память (tracemalloc) и число живых задач.
+После прогрева (--warmup) снимок считается базовым; тест падает (код 1), если минимум последних
+трёх снимков превышает базу больше чем на --max-memory-growth-mb или --max-task-growth.
+При провале печатаются самые выросшие места аллокаций и задачи по корутинам.
+
+Ускоряется только ожидание: CPU-работа в виртуальном времени длится в --speed раз дольше.
+Пока процесс в основном простаивает, это незаметно; если монитор цикла пишет о лагах в секунды,
+--speed слишком велик для машины — таймауты aiohttp начнут срабатывать на ровном месте.
+
+    python soak.py --hours 2 --speed 20 --tokens 5
+"""
+import os
+import gc
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+import selectors
+import tempfile
+import tracemalloc
+from pathlib import Path
+from collections import Counter
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import aiohttp
+from loadtest import LoadConfig, LoadRun, PluginClient, free_port
+from fakes.rest import FakeRest, FakeRestConfig
+from fakes.ynison import FakeYnison, FakeYnisonConfig
+
+
+logger = logging.getLogger("Soak")
+
+
+class ScaledSelector(selectors.DefaultSelector):
+    """Селектор, который ждёт в `speed` раз меньше: таймаут считается циклом в виртуальных секундах."""
+
+    def __init__(self, speed: float):
+        super().__init__()
+        self.speed = speed
+
+    def select(self, timeout=None):
+        return super().select(None if timeout is None else timeout / self.speed)
+
+
+class VirtualClock:
+    """Ускоренные time.monotonic и time.time (asyncio берёт время цикла из time.monotonic)."""
+
+    def __init__(self, speed: float):
+        self.speed = speed
+        self._real_monotonic, self._real_time = time.monotonic, time.time
+        self._origin = self._real_monotonic()
+        self._wall_origin = self._real_time()
+
+    def elapsed(self) -> float:
+        return (self._real_monotonic() - self._origin) * self.speed
+
+    def monotonic(self) -> float:
+        return self._origin + self.elapsed()
+
+    def wall(self) -> float:
+        return self._wall_origin + self.elapsed()
+
+    def install(self):
+        time.monotonic, time.time = self.monotonic, self.wall
+
+    def uninstall(self):
+        time.monotonic, time.time = self._real_monotonic, self._real_time
+
+    def new_loop(self) -> asyncio.AbstractEventLoop:
+        return asyncio.SelectorEventLoop(ScaledSelector(self.speed))
+
+
+@dataclass
+class SoakConfig:
+    hours: float = 1.0                # виртуальных часов
+    speed: float = 20.0
+    tokens: int = 5
+    clients: int = 2
+    press_rate: float = 0.05          # нажатий в виртуальную секунду на токен
+    client_lifetime: float = 600.0    # средняя жизнь /ws клиента, виртуальные секунды
+    queue_size: int = 100
+    progress_interval: float = 5.0
+    ynison_drop_after: float = 1800.0
+    rest_error_rate: float = 0.01
+    library_min: int = 1_000
+    library_max: int = 5_000
+    snapshot_every: float = 300.0
+    warmup: float = 900.0
+    max_memory_growth_mb: float = 8.0
+    max_task_growth: int = 10
+    seed: int = 1
+
+
+@dataclass
+class Sample:
+    at: float                         # виртуальные секунды от старта
+    traced_mb: float
+    tasks: int
+    sessions: int
+    ws_tokens: int
+    ws_sockets: int
+    track_cache: int
+    session_tasks: int
+
+
+@dataclass
+class SoakReport:
+    samples: List[Sample] = field(default_factory=list)
+    failures: List[str] = field(default_factory=list)
+    top_growth: List[str] = field(default_factory=list)
+    task_kinds: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+
+class ChurningClient(PluginClient):
+    """Клиент плагина, который время от времени уходит (штатно или обрывом) и подключается снова."""
+
+    def __init__(self, *args, lifetime: float, rnd: random.Random, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lifetime = lifetime
+        self.rnd = rnd
+
+    async def run(self, http: aiohttp.ClientSession):
+        while True:
+            session = asyncio.create_task(super().run(http))
+            await asyncio.sleep(self.rnd.expovariate(1 / self.lifetime))
+            if self.ws is not None and not self.ws.closed:
+                sock = self.ws.get_extra_info("socket") if self.rnd.random() < 0.5 else None
+                if sock is not None:
+                    sock.shutdown(2)  # обрыв без close-фрейма, как при убитом процессе Stream Deck
+                else:
+                    await self.ws.close()
+            session.cancel()
+            await asyncio.gather(session, return_exceptions=True)
+            self.ws = None
+            await asyncio.sleep(self.rnd.uniform(1, 10))
+
+
+def task_kinds(limit: int = 10) -> List[str]:
+    kinds = Counter(getattr(task.get_coro(), "__qualname__", "?") for task in asyncio.all_tasks())
+    return [f"{count:>5} {name}" for name, count in kinds.most_common(limit)]
+
+
+def sample(clock: VirtualClock, main) -> Sample:
+    gc.collect()
+    sessions = list(main.manager.sessions.values())
+    return Sample(
+        at=clock.elapsed(),
+        traced_mb=tracemalloc.get_traced_memory()[0] / 1e6,
+        tasks=len(asyncio.all_tasks()),
+        sessions=len(sessions),
+        ws_tokens=len(main.connected_websockets),
+        ws_sockets=sum(len(s) for s in main.connected_websockets.values()),
+        track_cache=sum(len(s.track_cache) for s in sessions),
+        session_tasks=sum(len(s.tasks) for s in sessions),
+    )
+
+
+def check(config: SoakConfig, report: SoakReport, baseline: Sample):
+    tail = report.samples[-3:]
+    memory = min(s.traced_mb for s in tail) - baseline.traced_mb
+    tasks = min(s.tasks for s in tail) - baseline.tasks
+    if memory > config.max_memory_growth_mb:
+        report.failures.append(f"traced memory grew {memory:.1f} MB (bound {config.max_memory_growth_mb} MB)")
+    if tasks > config.max_task_growth:
+        report.failures.append(f"live tasks grew by {tasks} (bound {config.max_task_growth})")
+
+
+async def run_soak(config: SoakConfig, clock: VirtualClock) -> SoakReport:
+    workdir = tempfile.TemporaryDirectory(prefix="ym_soak_")
+    os.environ.update(YM_API_CACHE_DIR=str(Path(workdir.name) / "cache"),
+                      YM_API_SNAPSHOT_PATH=str(Path(workdir.name) / "snapshots.db"))
+    os.environ.pop("YM_API_RECORD_DIR", None)
+
+    import uvicorn
+    import main
+    import ynison.player
+    from yandex_api import YandexMusicAPI
+    logging.getLogger().setLevel(logging.WARNING)
+
+    fake_ynison = FakeYnison(FakeYnisonConfig(queue_size=config.queue_size, progress_interval=config.progress_interval,
+                                              drop_after=config.ynison_drop_after, seed=config.seed))
+    fake_rest = FakeRest(FakeRestConfig(library_min=config.library_min, library_max=config.library_max,
+                                        error_rate=config.rest_error_rate, seed=config.seed))
+    await fake_ynison.start()
+    await fake_rest.start()
+    ynison.player.YNISON_URL = fake_ynison.base_url
+    YandexMusicAPI.BASE_URL = fake_rest.base_url
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.1)
+
+    load = LoadRun(LoadConfig(tokens=config.tokens, clients=config.clients, press_rate=config.press_rate, seed=config.seed))
+    fake_ynison.on_broadcast = load.clock.mark
+    rnd = random.Random(config.seed)
+    http = aiohttp.ClientSession()
+    tasks: List[asyncio.Task] = []
+    report = SoakReport()
+    baseline: Optional[Sample] = None
+    snapshot_before = None
+    try:
+        for i in range(config.tokens):
+            token = f"soak-{i:04d}"
+            load.clients[token] = [
+                ChurningClient(f"ws://127.0.0.1:{port}/ws", token, load.clock, {}, load,
+                               lifetime=config.client_lifetime, rnd=rnd)
+                for _ in range(config.clients)
+            ]
+            tasks += [asyncio.create_task(c.run(http)) for c in load.clients[token]]
+            tasks.append(asyncio.create_task(load.presses(token)))
+
+        duration = config.hours * 3600
+        while clock.elapsed() < duration:
+            await asyncio.sleep(config.snapshot_every)
+            current = sample(clock, main)
+            report.samples.append(current)
+            print(f"{current.at / 3600:6.2f}h  mem {current.traced_mb:7.1f} MB  tasks {current.tasks:4}  "
+                  f"sessions {current.sessions:3}  ws {current.ws_tokens:3}/{current.ws_sockets:<3}  "
+                  f"track_cache {current.track_cache:5}  session_tasks {current.session_tasks:3}", flush=True)
+            if baseline is None and current.at >= config.warmup:
+                baseline = current
+                snapshot_before = tracemalloc.take_snapshot()
+
+        if baseline is None or len(report.samples) < 3:
+            report.failures.append("run too short: no samples after warmup")
+        else:
+            check(config, report, baseline)
+        if report.failures and snapshot_before is not None:
+            diff = tracemalloc.take_snapshot().compare_to(snapshot_before, "lineno")
+            report.top_growth = [str(stat) for stat in diff[:15]]
+            report.task_kinds = task_kinds()
+        return report
+    finally:
+        load.stopping = True
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await http.close()
+        server.should_exit = True
+        await server_task
+        await fake_ynison.stop()
+        await fake_rest.stop()
+        workdir.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for name, value in asdict(SoakConfig()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    parser.add_argument("--frames", type=int, default=1, help="tracemalloc stack depth")
+    args = vars(parser.parse_args())
+    frames = args.pop("frames")
+    config = SoakConfig(**args)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s [%(levelname)s] [Soak] %(message)s', datefmt='%H:%M:%S')
+
+    clock = VirtualClock(config.speed)
+    clock.install()
+    tracemalloc.start(frames)
+    try:
+        with asyncio.Runner(loop_factory=clock.new_loop) as runner:
+            report = runner.run(run_soak(config, clock))
+    finally:
+        tracemalloc.stop()
+        clock.uninstall()
+
+    for line in report.top_growth:
+        print(line)
+    if report.task_kinds:
+        print("Live tasks by coroutine:")
+        print("\n".join(report.task_kinds))
+    print("FAILED: " + "; ".join(report.failures) if report.failures else "OK")
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Фоновые задачи под присмотром: группа на сессию, лимит одновременных задач по виду, отмена при закрытии.
+
+Задача вида с лимитом, который уже исчерпан, не запускается сразу, а ждёт свободного места. Ждать может
+только одна задача вида: следующая заменяет её, и заменённая корутина закрывается, не начавшись.
+Для стейта и его обогащения это ровно то, что нужно: когда upstream тормозит, клиенту важен последний
+стейт, а не очередь устаревших. Виды без лимита (события команд, run_loop, воркер
+очереди команд, таймер лайков) никогда не отбрасываются.
+"""
+import asyncio
+import logging
+import weakref
+from collections import Counter as Counts, defaultdict
+from typing import Callable, Coroutine, Dict, Optional, Set
+from metrics import COLLECTORS, Counter, Gauge
+
+
+logger = logging.getLogger("Supervisor")
+
+TASKS = Gauge(
+    "ym_api_tasks",
+    "Running supervised background tasks by kind, summed over sessions",
+    labelnames=("kind",),
+)
+TASKS_SUPERSEDED = Counter(
+    "ym_api_tasks_superseded_total",
+    "Background tasks dropped before starting because a newer task of the same kind replaced them",
+    labelnames=("kind",),
+)
+TASK_FAILURES = Counter(
+    "ym_api_task_failures_total",
+    "Background tasks that ended with an exception",
+    labelnames=("kind",),
+)
+
+# как запускать фоновую задачу: TaskGroup.spawn сессии или create_task вне сессии
+Spawn = Callable[[str, Coroutine], Optional[asyncio.Task]]
+
+_groups: "weakref.WeakSet[TaskGroup]" = weakref.WeakSet()
+_seen_kinds: Set[str] = set()
+
+
+class TaskGroup:
+    """Фоновые задачи одного владельца (сессии). `limits` — сколько задач вида может идти одновременно."""
+
+    def __init__(self, name: str, limits: Optional[Dict[str, int]] = None):
+        self.name = name
+        self.limits = dict(limits or {})
+        self.closed = False
+        self._running: Dict[str, Set[asyncio.Task]] = defaultdict(set)
+        self._waiting: Dict[str, Coroutine] = {}
+        _groups.add(self)
+
+    def spawn(self, kind: str, coro: Coroutine) -> Optional[asyncio.Task]:
+        """Запускает задачу; None — группа закрыта или задача ждёт места (см. модуль)."""
+        if self.closed:
+            coro.close()
+            return None
+        _seen_kinds.add(kind)
+        limit = self.limits.get(kind)
+        if limit is not None and len(self._running[kind]) >= limit:
+            superseded = self._waiting.pop(kind, None)
+            if superseded is not None:
+                superseded.close()
+                TASKS_SUPERSEDED.inc(kind=kind)
+            self._waiting[kind] = coro
+            return None
+        return self._start(kind, coro)
+
+    def _start(self, kind: str, coro: Coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coro, name=f"{self.name}:{kind}")
+        self._running[kind].add(task)
+        task.add_done_callback(lambda t: self._finished(kind, t))
+        return task
+
+    def _finished(self, kind: str, task: asyncio.Task):
+        self._running[kind].discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            TASK_FAILURES.inc(kind=kind)
+            logger.error(f"[{self.name}] {kind} task failed: {task.exception()!r}")
+        waiting = self._waiting.pop(kind, None)
+        if waiting is not None:
+            if self.closed:
+                waiting.close()
+            else:
+                self._start(kind, waiting)
+
+    def counts(self) -> Dict[str, int]:
+        """Идущие задачи по видам (ждущие места не считаются)."""
+        return {kind: len(tasks) for kind, tasks in self._running.items() if tasks}
+
+    def __len__(self) -> int:
+        return sum(len(tasks) for tasks in self._running.values()) + len(self._waiting)
+
+    async def close(self, timeout: float = 5.0):
+        """Отменяет все задачи группы и ждёт их (кроме вызывающей, если close пришёл из задачи группы)."""
+        self.closed = True
+        for coro in self._waiting.values():
+            coro.close()
+        self._waiting.clear()
+        current = asyncio.current_task()
+        tasks = [task for tasks in self._running.values() for task in tasks if task is not current]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+
+def spawn_unsupervised(kind: str, coro: Coroutine) -> asyncio.Task:
+    """Spawn по умолчанию для компонентов, живущих вне сессии (тесты, утилиты)."""
+    return asyncio.create_task(coro, name=kind)
+
+
+def collect_tasks():
+    totals = Counts()
+    for group in list(_groups):
+        totals.update(group.counts())
+    for kind in _seen_kinds:
+        TASKS.set(totals[kind], kind=kind)
+
+
+COLLECTORS.append(collect_tasks)
@@ -0,0 +1,10 @@
+import os
+import atexit
+import shutil
+import tempfile
+
+# кэш ответов и снимки сессий из тестов не должны попадать в общий каталог пользователя
+_scratch = tempfile.mkdtemp(prefix="ym_api_tests_")
+atexit.register(shutil.rmtree, _scratch, True)
+os.environ.setdefault("YM_API_CACHE_DIR", os.path.join(_scratch, "cache"))
+os.environ.setdefault("YM_API_SNAPSHOT_PATH", os.path.join(_scratch, "snapshots.sqlite"))
@@ -0,0 +1,127 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from accounting import LRUCache, RateWindow, SessionQuotas, window_queue
+from manager import YnisonSession
+
+
+def state_dict(n, idx):
+    return {"player_state": {"player_queue": {
+        "current_playable_index": idx,
+        "playable_list": [{"playable_id": str(i)} for i in range(n)],
+    }}}
+
+
+def ynison_state(track="1", paused=False, volume=0.5, progress_ms=0, index=0, repeat_mode="NONE", shuffle=None):
+    queue = SimpleNamespace(
+        current_playable_index=index, playable_list=[track], entity_id="album", version=None,
+        options=SimpleNamespace(repeat_mode=repeat_mode), model_extra={"shuffle_optional": shuffle},
+    )
+    return SimpleNamespace(
+        player_state=SimpleNamespace(
+            status=SimpleNamespace(paused=paused, progress_ms=progress_ms, playback_speed=1),
+            player_queue=queue,
+        ),
+        devices=[SimpleNamespace(volume_info=SimpleNamespace(volume=volume))],
+        track=track,
+    )
+
+
+class TestHelpers(unittest.TestCase):
+    def test_rate_window(self):
+        rate = RateWindow()
+        for _ in range(5):
+            rate.hit()
+        rate.hit(3)
+        self.assertEqual(rate.total(), 8)
+
+    def test_lru_cache_is_bounded(self):
+        cache = LRUCache(2)
+        cache["a"], cache["b"] = 1, 2
+        cache["a"]
+        cache["c"] = 3
+        self.assertEqual(list(cache), ["a", "c"])
+
+    def test_window_queue(self):
+        state = state_dict(500, 10)
+        self.assertTrue(window_queue(state, 5))
+        queue = state["player_state"]["player_queue"]
+        self.assertEqual([p["playable_id"] for p in queue["playable_list"]], [str(i) for i in range(5, 16)])
+        self.assertEqual(queue["current_playable_index"], 5)
+        self.assertEqual(queue["windowed_from"], 500)
+        self.assertFalse(window_queue(state_dict(11, 3), 5))
+
+    def test_quotas_from_env(self):
+        with patch.dict("os.environ", {"YM_API_QUOTA_QUEUE_ITEMS": "200", "YM_API_QUOTA_PROGRESS_INTERVAL": "2.5"}):
+            quotas = SessionQuotas.from_env()
+        self.assertEqual((quotas.queue_items, quotas.progress_interval), (200, 2.5))
+
+    def test_malformed_quota_falls_back_to_default(self):
+        with patch.dict("os.environ", {"YM_API_QUOTA_QUEUE_ITEMS": "lots", "YM_API_QUOTA_LIKES": "5000"}), \
+             self.assertLogs("Accounting", "WARNING") as logs:
+            quotas = SessionQuotas.from_env()
+        self.assertEqual((quotas.queue_items, quotas.likes), (SessionQuotas.queue_items, 5000))
+        self.assertIn("YM_API_QUOTA_QUEUE_ITEMS", logs.output[0])
+
+
+class TestSessionDegradation(unittest.IsolatedAsyncioTestCase):
+    def make_session(self, **quotas):
+        session = YnisonSession("token", None, SessionQuotas(**quotas))
+        session.handle_ynison_state = AsyncMock()
+        session.ynison = SimpleNamespace(current_track=None, state=None)
+        return session
+
+    async def test_progress_updates_thinned_when_over_rate(self):
+        session = self.make_session(messages_per_min=3, progress_interval=60)
+        for _ in range(10):
+            await session.on_ynison_message(ynison_state())
+        self.assertIn("progress_rate", session.degraded)
+        # 3 до превышения квоты + первый апдейт после включения деградации
+        self.assertEqual(session.handle_ynison_state.await_count, 4)
+
+        await session.on_ynison_message(ynison_state(paused=True))
+        self.assertEqual(session.handle_ynison_state.await_count, 5)
+
+    async def test_queue_and_option_changes_pass_when_over_rate(self):
+        session = self.make_session(messages_per_min=1, progress_interval=60)
+        await session.on_ynison_message(ynison_state())
+        await session.on_ynison_message(ynison_state())
+        self.assertEqual(session.handle_ynison_state.await_count, 2)  # первый после включения деградации
+
+        for changed in (ynison_state(index=1), ynison_state(index=1, repeat_mode="ONE"),
+                        ynison_state(index=1, repeat_mode="ONE", shuffle={"playable_shuffle": []})):
+            await session.on_ynison_message(changed)
+        self.assertEqual(session.handle_ynison_state.await_count, 5)
+
+    async def test_seek_passes_when_over_rate(self):
+        session = self.make_session(messages_per_min=1, progress_interval=60)
+        await session.on_ynison_message(ynison_state(progress_ms=10_000))
+        await session.on_ynison_message(ynison_state(progress_ms=10_000))
+        await session.on_ynison_message(ynison_state(progress_ms=11_000))  # обычный ход воспроизведения
+        self.assertEqual(session.handle_ynison_state.await_count, 2)
+
+        await session.on_ynison_message(ynison_state(progress_ms=90_000))  # перемотка вперёд
+        await session.on_ynison_message(ynison_state(progress_ms=0))       # и назад
+        self.assertEqual(session.handle_ynison_state.await_count, 4)
+
+    async def test_all_updates_pass_under_quota(self):
+        session = self.make_session(messages_per_min=100)
+        for _ in range(10):
+            await session.on_ynison_message(ynison_state())
+        self.assertEqual(session.handle_ynison_state.await_count, 10)
+        self.assertEqual(session.accounting()["messages_per_min"], 10)
+
+    async def test_queue_windowed_over_quota(self):
+        session = YnisonSession("token", AsyncMock(), SessionQuotas(queue_items=100, queue_window=10))
+        session.enrich_and_broadcast = AsyncMock()
+        state = SimpleNamespace(model_dump=lambda by_alias: state_dict(300, 150))
+        await session.handle_ynison_state(state)
+        sent = session.on_update_callback.await_args.args[1]
+        self.assertEqual(len(sent["player_state"]["player_queue"]["playable_list"]), 21)
+        self.assertIn("queue_window", session.degraded)
+        await asyncio.sleep(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
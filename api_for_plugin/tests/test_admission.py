@@ -0,0 +1,84 @@
+import time
+import asyncio
+import unittest
+from admission import ConnectAdmission, CONNECT_STORM_SIZE
+
+
+class TestConnectAdmission(unittest.IsolatedAsyncioTestCase):
+    async def test_rate_limits_a_storm(self):
+        admission = ConnectAdmission(rate=50, burst=2)
+        granted = []
+
+        async def connect(i):
+            await admission.admit(f"t{i}", urgent=True)
+            granted.append(time.monotonic())
+
+        started = time.monotonic()
+        await asyncio.gather(*(connect(i) for i in range(7)))
+        # 2 из запаса, остальные 5 по 1/50 с
+        self.assertGreaterEqual(granted[-1] - started, 0.09)
+        self.assertEqual(admission.queued, 0)
+
+    async def test_live_tokens_go_before_idle(self):
+        admission = ConnectAdmission(rate=100, burst=1, idle_delay=0, idle_jitter=0)
+        admission.is_watched = lambda token: token.startswith("live")
+        await admission.admit("warmup", urgent=True)  # опустошаем ведро
+        order = []
+
+        async def connect(token):
+            await admission.admit(token)
+            order.append(token)
+
+        await asyncio.gather(connect("idle1"), connect("idle2"), connect("live1"), connect("live2"))
+        self.assertEqual(order[:2], ["live1", "live2"])
+
+    async def test_idle_reconnect_is_deferred_while_saturated(self):
+        admission = ConnectAdmission(rate=1, burst=1, idle_delay=0.2, idle_jitter=0)
+        await admission.admit("warmup", urgent=True)  # опустошаем ведро
+        started = time.monotonic()
+        await admission.admit("idle")
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+    async def test_idle_reconnect_not_deferred_when_rate_is_free(self):
+        admission = ConnectAdmission(rate=1, burst=5, idle_delay=60, idle_jitter=0)
+        for i in range(3):
+            await asyncio.wait_for(admission.admit(f"idle{i}"), 0.1)
+
+    async def test_deferral_ends_when_bucket_recovers(self):
+        admission = ConnectAdmission(rate=20, burst=2, idle_delay=60, idle_jitter=0)
+        for _ in range(2):
+            await admission.admit("warmup", urgent=True)
+        started = time.monotonic()
+        await asyncio.wait_for(admission.admit("idle"), 1)  # ведро полное через 0.1 с, а не через минуту
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    async def test_idle_promoted_when_client_appears(self):
+        watched = set()
+        admission = ConnectAdmission(rate=2, burst=2, idle_delay=60, idle_jitter=0)
+        admission.is_watched = lambda token: token in watched
+        admission.RECHECK_INTERVAL = 0.05
+        for _ in range(2):
+            await admission.admit("warmup", urgent=True)
+        task = asyncio.create_task(admission.admit("tok"))
+        await asyncio.sleep(0.05)
+        self.assertFalse(task.done())
+
+        watched.add("tok")
+        # первый токен — через 0.5 с, а ведро целиком восстановится только через 1 с
+        await asyncio.wait_for(task, timeout=0.8)
+
+    async def test_cancelled_waiter_leaves_queue(self):
+        admission = ConnectAdmission(rate=0.01, burst=1, idle_delay=60, idle_jitter=0)
+        await admission.admit("warmup", urgent=True)
+        before = sum(s["count"] for s in CONNECT_STORM_SIZE.snapshot().values())
+        task = asyncio.create_task(admission.admit("tok"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(admission.queued, 0)
+        self.assertEqual(sum(s["count"] for s in CONNECT_STORM_SIZE.snapshot().values()), before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import stat
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import main
+from cluster import Cluster, HashRing, LocalBus
+
+
+class TestHashRing(unittest.TestCase):
+    def test_spreads_and_moves_few_tokens(self):
+        tokens = [f"token-{i}" for i in range(2000)]
+        four, five = HashRing(range(4)), HashRing(range(5))
+
+        owners = [four.owner(t) for t in tokens]
+        for node in range(4):
+            self.assertGreater(owners.count(node), 300)
+
+        moved = sum(four.owner(t) != five.owner(t) for t in tokens)
+        self.assertLess(moved, len(tokens) * 0.35)  # в идеале 1/5
+
+
+class TestClusterBus(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.nodes = [Cluster(i, 2, Path(self.tmp.name)) for i in range(2)]
+        for node in self.nodes:
+            await node.start()
+        self.token = next(f"t{i}" for i in range(100) if self.nodes[0].owner(f"t{i}") == 0)
+
+    async def asyncTearDown(self):
+        for node in self.nodes:
+            await node.stop()
+        self.tmp.cleanup()
+
+    async def test_call_reaches_owner(self):
+        owner, other = self.nodes
+
+        async def control(header, body):
+            return {"status": 202, "body": {"action": header["action"], "from": header["from"], "raw": body.decode()}}
+
+        owner.on("control", control)
+        reply = await other.call(self.token, "control", b"payload", action="next")
+        self.assertEqual(reply, {"status": 202, "body": {"action": "next", "from": 1, "raw": "payload"}})
+
+    async def test_state_goes_only_to_watchers(self):
+        owner, other = self.nodes
+        received = asyncio.Queue()
+
+        async def watch(header, body):
+            return {"initial": None}
+
+        async def state(header, body):
+            await received.put((header["token"], body.decode()))
+
+        owner.on("watch", watch)
+        other.on("state", state)
+
+        await owner.publish(self.token, "before")  # подписчиков ещё нет
+        await other.call(self.token, "watch")
+        await owner.publish(self.token, '{"player_state": {}}')
+        self.assertEqual(await asyncio.wait_for(received.get(), 1), (self.token, '{"player_state": {}}'))
+
+        await other.unwatch(self.token)
+        await asyncio.sleep(0.05)
+        self.assertNotIn(self.token, owner.watchers)
+        self.assertTrue(received.empty())
+
+    async def test_handler_error_is_replied(self):
+        async def boom(header, body):
+            raise RuntimeError("nope")
+
+        self.nodes[0].on("control", boom)
+        reply = await self.nodes[1].call(self.token, "control")
+        self.assertEqual(reply, {"error": "nope"})
+
+    async def test_sockets_are_private(self):
+        for node in self.nodes:
+            mode = os.stat(node.bus.path(node.index)).st_mode
+            self.assertEqual(stat.S_IMODE(mode), 0o600)
+
+
+class TestRemoteWatchers(unittest.TestCase):
+    def test_remote_watcher_keeps_token_live_for_admission(self):
+        """Клиенты токена только на другом воркере: владелец не должен откладывать переподключение."""
+        with tempfile.TemporaryDirectory() as tmp:
+            owner = Cluster(0, 2, Path(tmp))
+            with patch.object(main, "cluster", owner), patch.object(main.manager, "client_count", main.client_count):
+                self.assertFalse(main.manager._is_watched("tok"))
+                owner.watchers["tok"] = {1}
+                self.assertTrue(main.manager._is_watched("tok"))
+                self.assertEqual(main.client_count("tok"), 1)
+
+
+class TestBusDirectory(unittest.IsolatedAsyncioTestCase):
+    async def test_refuses_directory_open_to_others(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chmod(tmp, 0o755)
+            bus = LocalBus(0, Path(tmp), None)
+            with self.assertRaises(PermissionError):
+                await bus.start()
+            self.assertFalse(bus.path(0).exists())
+
+    async def test_refuses_symlinked_directory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            target, link = Path(tmp) / "target", Path(tmp) / "link"
+            target.mkdir(mode=0o700)
+            link.symlink_to(target)
+            with self.assertRaises(PermissionError):
+                await LocalBus(0, link, None).start()
+
+    async def test_creates_missing_directory_as_private(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            bus = LocalBus(0, Path(tmp) / "bus", None)
+            await bus.start()
+            try:
+                self.assertEqual(stat.S_IMODE(os.stat(Path(tmp) / "bus").st_mode), 0o700)
+            finally:
+                await bus.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import asyncio
+import unittest
+from supervisor import TaskGroup
+from commands import CommandQueue, fold_transport, fold_volume, fold_seek, Command
+
+
+class TestFoldTransport(unittest.TestCase):
+    def test_next_prev_sum(self):
+        cmd = fold_transport([Command("next"), Command("next"), Command("prev"), Command("next")])
+        self.assertEqual(cmd.action, "transport")
+        self.assertEqual(cmd.params, {"offset": 2, "skip": True, "toggle": False})
+        self.assertEqual(len(cmd.originals), 4)
+
+    def test_play_pause_pairs_cancel(self):
+        cmd = fold_transport([Command("play_pause")] * 4)
+        self.assertEqual(cmd.params, {"offset": 0, "skip": False, "toggle": False})
+
+    def test_toggle_after_skip(self):
+        cmd = fold_transport([Command("play_pause"), Command("next"), Command("play_pause")])
+        self.assertEqual(cmd.params, {"offset": 1, "skip": True, "toggle": True})
+
+
+
+class TestFoldVolume(unittest.TestCase):
+    def test_steps_sum(self):
+        cmd = fold_volume([Command("volume_up")] * 4 + [Command("volume_down")])
+        self.assertEqual(cmd.action, "volume")
+        self.assertEqual(cmd.params, {"steps": 3, "toggle_mute": False})
+
+    def test_mute_after_steps(self):
+        cmd = fold_volume([Command("mute"), Command("volume_up"), Command("mute")])
+        self.assertEqual(cmd.params, {"steps": 1, "toggle_mute": True})
+
+
+
+class TestFoldSeek(unittest.TestCase):
+    def test_relative_offsets_sum(self):
+        cmd = fold_seek([Command("seek", {"offset_ms": 5000})] * 3)
+        self.assertEqual(cmd.params, {"position_ms": None, "offset_ms": 15000})
+
+    def test_absolute_resets_offsets(self):
+        cmd = fold_seek([
+            Command("seek", {"offset_ms": 5000}),
+            Command("seek", {"position_ms": 60000}),
+            Command("seek", {"offset_ms": -2000}),
+        ])
+        self.assertEqual(cmd.params, {"position_ms": 60000, "offset_ms": -2000})
+
+
+class TestCommandQueue(unittest.IsolatedAsyncioTestCase):
+    def make_queue(self, delay: float = 0.0, window: float = 0.05):
+        executed, events = [], []
+
+        async def execute(command):
+            executed.append(command)
+            await asyncio.sleep(delay)
+            return True
+
+        async def on_event(event):
+            events.append(event)
+
+        queue = CommandQueue(execute, on_event, coalesce_window=window)
+        self.addAsyncCleanup(queue.close)
+        return queue, executed, events
+
+    async def wait_events(self, events, count, timeout=1.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while len(events) < count:
+            if asyncio.get_running_loop().time() > deadline:
+                self.fail(f"got {len(events)} of {count} events")
+            await asyncio.sleep(0.01)
+
+    async def test_burst_of_next_is_one_upstream_command(self):
+        queue, executed, events = self.make_queue()
+        ids = [queue.submit("next").id for _ in range(5)]
+
+        await self.wait_events(events, 5)
+        self.assertEqual(len(executed), 1)
+        self.assertEqual(executed[0].params["offset"], 5)
+        self.assertEqual([e["id"] for e in events], ids)
+        self.assertTrue(all(e["status"] == "done" and e["coalesced"] == 5 for e in events))
+
+    async def test_presses_during_execution_are_folded(self):
+        queue, executed, events = self.make_queue(delay=0.1)
+        queue.submit("next")
+        await asyncio.sleep(0.08)  # первая команда уже выполняется
+        for _ in range(10):
+            queue.submit("next")
+
+        await self.wait_events(events, 11)
+        self.assertEqual([c.params.get("offset", 1) for c in executed], [1, 10])
+
+    async def test_other_commands_keep_order(self):
+        queue, executed, events = self.make_queue()
+        queue.submit("next")
+        queue.submit("next")
+        queue.submit("like")
+        queue.submit("prev")
+
+        await self.wait_events(events, 4)
+        self.assertEqual([c.action for c in executed], ["transport", "like", "prev"])
+        self.assertEqual(executed[0].params["offset"], 2)
+
+    async def test_groups_do_not_mix(self):
+        queue, executed, events = self.make_queue()
+        for action in ("volume_up", "volume_up", "next", "volume_down"):
+            queue.submit(action)
+
+        await self.wait_events(events, 4)
+        self.assertEqual([c.action for c in executed], ["volume", "next", "volume_down"])
+        self.assertEqual(executed[0].params["steps"], 2)
+
+    async def test_failure_is_reported_for_every_press(self):
+        async def execute(command):
+            raise RuntimeError("boom")
+
+        events = []
+
+        async def on_event(event):
+            events.append(event)
+
+        queue = CommandQueue(execute, on_event, coalesce_window=0.02)
+        self.addAsyncCleanup(queue.close)
+        queue.submit("next")
+        queue.submit("next")
+
+        await self.wait_events(events, 2)
+        self.assertTrue(all(e["status"] == "failed" and e["error"] == "boom" for e in events))
+
+    async def test_close_fails_pending_commands(self):
+        queue, executed, events = self.make_queue(delay=10)
+        running = queue.submit("like")
+        await asyncio.sleep(0.01)  # like выполняется
+        queued = [queue.submit("dislike"), queue.submit("next"), queue.submit("next")]
+
+        await queue.close()
+        self.assertEqual([c.action for c in executed], ["like"])
+        self.assertEqual([e["id"] for e in events], [running.id] + [c.id for c in queued])
+        self.assertTrue(all(e["status"] == "failed" and e["error"] == "session closed" for e in events))
+        self.assertEqual(queue.depth, 0)
+
+    async def test_close_fails_batch_being_collected(self):
+        queue, executed, events = self.make_queue(window=10)
+        ids = [queue.submit("next").id for _ in range(3)]
+        await asyncio.sleep(0.01)  # пачка next собирается и ждёт окна склейки
+
+        await queue.close()
+        self.assertEqual(executed, [])
+        self.assertEqual([e["id"] for e in events], ids)
+        self.assertTrue(all(e["status"] == "failed" for e in events))
+
+    async def test_close_after_results_emits_nothing(self):
+        queue, executed, events = self.make_queue()
+        queue.submit("like")
+        await self.wait_events(events, 1)
+        await queue.close()
+        self.assertEqual(len(events), 1)
+
+    async def test_worker_runs_in_the_session_group(self):
+        tasks = TaskGroup("test")
+        started = asyncio.Event()
+        events = []
+
+        async def execute(command):
+            started.set()
+            await asyncio.sleep(10)
+            return True
+
+        async def on_event(event):
+            events.append(event)
+
+        queue = CommandQueue(execute, on_event, coalesce_window=0, spawn=tasks.spawn)
+        command = queue.submit("like")
+        await asyncio.wait_for(started.wait(), 1)
+        self.assertEqual(tasks.counts(), {"commands": 1})
+
+        await tasks.close()
+        await queue.close()
+        self.assertEqual([(e["id"], e["status"]) for e in events], [(command.id, "failed")])
+
+        queue.submit("next")  # группа закрыта: воркер не стартует, команда ждёт close()
+        self.assertEqual(tasks.counts(), {})
+        await queue.close()
+        self.assertEqual(len(events), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import tempfile
+import unittest
+from http_cache import HttpCache
+from manager import YnisonSession
+from scheduler import RequestScheduler
+from yandex_api import YandexMusicAPI
+from fakes.rest import FakeRest, FakeRestConfig
+from fakes.ynison import TRACK_BASE
+
+
+class TestFakeRest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+    async def start(self, **config) -> str:
+        self.fake = FakeRest(FakeRestConfig(seed=1, **config))
+        self.addAsyncCleanup(self.fake.stop)
+        return await self.fake.start()
+
+    async def client(self, base_url: str, token: str = "token-a") -> YandexMusicAPI:
+        api = YandexMusicAPI(token, scheduler=RequestScheduler(rate_per_token=1000, burst_per_token=1000),
+                             cache=HttpCache(self.cache_dir.name), base_url=base_url)
+        self.addAsyncCleanup(api.close)
+        await api.init()
+        return api
+
+    async def test_synthetic_library_is_deterministic(self):
+        api = await self.client(await self.start(library_min=1000, library_max=5000))
+        user = self.fake.users["token-a"]
+        self.assertEqual(api.uid, user.uid)
+
+        likes = await api.get_liked_tracks()
+        self.assertTrue(1000 <= len(likes) <= 5000)
+        self.assertEqual(likes, [str(tid) for tid in user.library("likes")])
+        self.assertFalse(set(likes) & set(await api.get_disliked_tracks()))
+        # очередь фейкового Ynison начинается с TRACK_BASE: в первых сотнях треков есть лайки
+        self.assertTrue(any(TRACK_BASE <= int(tid) < TRACK_BASE + 200 for tid in likes))
+
+    async def test_like_mutation_changes_library(self):
+        api = await self.client(await self.start(library_min=1000, library_max=1000))
+        self.assertTrue(await api.like_track("42"))
+        self.assertTrue(await api.unlike_track(str(TRACK_BASE + 1)))
+
+        likes = await api.get_liked_tracks()
+        self.assertEqual(likes[-1], "42")
+        self.assertNotIn(str(TRACK_BASE + 1), likes)
+
+    async def test_tracks_batch(self):
+        api = await self.client(await self.start())
+        tracks = await api.get_tracks([str(TRACK_BASE + 5), str(TRACK_BASE + 30)])
+        self.assertEqual([t["id"] for t in tracks], [str(TRACK_BASE + 5), str(TRACK_BASE + 30)])
+        self.assertTrue(tracks[0]["artists"][0]["name"])
+        self.assertIn("%%", tracks[0]["coverUri"])
+
+    async def test_fault_injection(self):
+        base_url = await self.start(error_rate=1.0)
+        with self.assertRaises(PermissionError):
+            await self.client(base_url, token="invalid")
+        api = await self.client(base_url)
+        self.assertIsNone(api.uid)
+        self.assertEqual(await api.get_tracks(["1"]), [])
+        self.assertGreaterEqual(self.fake.stats["errors"], 2)
+
+    async def test_failed_library_download_keeps_previous_set(self):
+        api = await self.client(await self.start(library_min=1000, library_max=1000))
+        session = YnisonSession("token-a", None)
+        session.api_client = api
+        session.liked_tracks = {"old"}
+
+        self.fake.config.error_rate = 1.0
+        with self.assertRaises(ConnectionError):
+            await api.get_liked_tracks()
+        self.assertIsNone(await session._load_library("likes"))
+        self.assertEqual(session.liked_tracks, {"old"})
+
+        self.fake.config.error_rate = 0.0
+        self.assertEqual(await session._load_library("likes"), {str(tid) for tid in self.fake.users["token-a"].library("likes")})
+
+
+if __name__ == '__main__':
+    unittest.main()
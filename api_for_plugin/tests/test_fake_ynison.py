@@ -0,0 +1,140 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+from utils.auth import AuthStorage
+from ynison.player import YnisonPlayer
+from fakes.ynison import FakeYnison, FakeYnisonConfig, TRACK_BASE
+
+
+async def wait_for(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not reached")
+        await asyncio.sleep(0.01)
+
+
+class TestFakeYnison(unittest.IsolatedAsyncioTestCase):
+    async def start(self, **config) -> str:
+        self.fake = FakeYnison(FakeYnisonConfig(seed=1, **config))
+        self.addAsyncCleanup(self.fake.stop)
+        return await self.fake.start()
+
+    async def connect(self, base_url: str, **kwargs) -> YnisonPlayer:
+        player = YnisonPlayer(AuthStorage(token="token-a", device_id="deck"), base_url=base_url, **kwargs)
+        self.addAsyncCleanup(player.close)
+        await player.connect()
+        return player
+
+    async def test_player_receives_full_state(self):
+        player = await self.connect(await self.start(queue_size=300))
+        await wait_for(lambda: player.state is not None)
+
+        queue = player.state.player_state.player_queue
+        self.assertEqual(len(queue.playable_list), 300)
+        self.assertEqual(player.current_track.playable_id, str(TRACK_BASE))
+        self.assertIn("deck", [d.info.device_id for d in player.state.devices])
+        self.assertIsNotNone(player.active_device())
+
+    async def test_one_off_command_is_applied_and_broadcast(self):
+        player = await self.connect(await self.start())
+        await wait_for(lambda: player.state is not None)
+
+        room = self.fake.rooms["token-a"]
+        self.assertTrue(await player.transport(offset=2, skip=True))
+        # стейт пришёл рассылкой: версию статуса фейк выдал от имени временного устройства команды
+        await wait_for(lambda: player.state.player_state.status.version.device_id != room.player_id)
+        self.assertEqual(room.player_state["player_queue"]["current_playable_index"], 2)
+        self.assertEqual(player.state.player_state.player_queue.current_playable_index, 2)
+        self.assertFalse(player.state.player_state.status.paused)
+
+    async def test_burst_of_next_stops_at_last_track(self):
+        player = await self.connect(await self.start(queue_size=5))
+        await wait_for(lambda: player.state is not None)
+
+        room = self.fake.rooms["token-a"]
+        self.assertTrue(await player.transport(offset=12, skip=True))
+        self.assertTrue(await player.transport(offset=3, skip=True))
+        self.assertEqual(player.state.player_state.player_queue.current_playable_index, 4)
+        await wait_for(lambda: room.player_state["player_queue"]["current_playable_index"] == 4)
+        self.assertEqual(player.current_track.playable_id, str(TRACK_BASE + 4))
+
+        self.assertTrue(await player.transport(offset=-9, skip=True))
+        self.assertEqual(player.state.player_state.player_queue.current_playable_index, 0)
+
+    def room_volume(self) -> float:
+        room = self.fake.rooms["token-a"]
+        return room.devices[room.player_id]["volume"]
+
+    async def test_set_volume_is_quantized_and_clamped(self):
+        player = await self.connect(await self.start())
+        await wait_for(lambda: player.state is not None)
+
+        self.assertTrue(await player.set_volume(0.33))
+        self.assertEqual(player.active_device().volume, 5 / 16)
+        await wait_for(lambda: self.room_volume() == 5 / 16)
+        self.assertTrue(await player.set_volume(1.7))
+        await wait_for(lambda: self.room_volume() == 1.0)
+
+    async def test_change_volume_steps_and_mute(self):
+        player = await self.connect(await self.start())
+        await wait_for(lambda: player.state is not None)
+        device = player.active_device  # стейт с устройствами заменяется каждой рассылкой
+
+        self.assertTrue(await player.change_volume(steps=2))
+        self.assertEqual(device().volume, 0.625)
+        self.assertTrue(await player.change_volume(toggle_mute=True))
+        self.assertEqual(device().volume, 0.0)
+        self.assertTrue(device().volume_info.is_muted)
+        # шаг из mute считается от громкости до mute и снимает его
+        self.assertTrue(await player.change_volume(steps=-1))
+        self.assertEqual(device().volume, 0.5625)
+        self.assertFalse(device().volume_info.is_muted)
+        await wait_for(lambda: self.room_volume() == 0.5625)
+
+    async def test_failed_mute_keeps_memory(self):
+        player = await self.connect(await self.start())
+        await wait_for(lambda: player.state is not None)
+        self.assertTrue(await player.change_volume(toggle_mute=True))
+        memory = dict(player._volume_before_mute)
+
+        player._send_one_off_command = AsyncMock(return_value=False)
+        self.assertFalse(await player.change_volume(steps=1))
+        self.assertEqual(player._volume_before_mute, memory)
+
+    async def test_mute_survives_reconnect(self):
+        base_url = await self.start()
+        memory = {}
+        first = await self.connect(base_url, volume_before_mute=memory)
+        await wait_for(lambda: first.state is not None)
+        self.assertTrue(await first.change_volume(toggle_mute=True))
+        await first.close()
+
+        second = await self.connect(base_url, volume_before_mute=memory)
+        await wait_for(lambda: second.state is not None and second.active_device().volume == 0.0)
+        self.assertTrue(await second.change_volume(toggle_mute=True))
+        self.assertEqual(second.active_device().volume, 0.5)
+        self.assertEqual(memory, {})
+
+    async def test_redirect_backoff_error(self):
+        base_url = await self.start(redirect_error_rate=1.0, backoff_ms=1500)
+        player = YnisonPlayer(AuthStorage(token="token-a"), base_url=base_url)
+        self.addAsyncCleanup(player.close)
+        with self.assertRaisesRegex(Exception, "Code: 8"):
+            await player.connect()
+
+    async def test_drop_closes_with_1006(self):
+        player = await self.connect(await self.start())
+        closed = asyncio.get_running_loop().create_future()
+
+        async def on_close(code, reason):
+            closed.set_result(code)
+
+        player.on_close = on_close
+        await wait_for(lambda: player.state is not None)
+        self.fake.drop("token-a")
+        self.assertEqual(await asyncio.wait_for(closed, 2), 1006)
+
+
+if __name__ == '__main__':
+    unittest.main()
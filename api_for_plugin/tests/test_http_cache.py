@@ -0,0 +1,84 @@
+import os
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+import http_cache
+from unittest.mock import patch
+from http_cache import CACHE_REQUESTS, HttpCache, init_http_cache
+from scheduler import RequestScheduler
+from yandex_api import YandexMusicAPI
+from fakes.rest import FakeRest, FakeRestConfig
+
+
+LIBRARY = "GET /users/{uid}/{type}/tracks"
+
+
+def mode(path: Path) -> int:
+    return stat.S_IMODE(path.stat().st_mode)
+
+
+class TestHttpCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.cache_dir = Path(self.dir.name) / "cache"
+        self.fake = FakeRest(FakeRestConfig(seed=1, library_min=100, library_max=100))
+        self.addAsyncCleanup(self.fake.stop)
+        self.base_url = await self.fake.start()
+
+    async def client(self, token: str = "token-a") -> YandexMusicAPI:
+        api = YandexMusicAPI(token, scheduler=RequestScheduler(rate_per_token=1000, burst_per_token=1000),
+                             cache=HttpCache(str(self.cache_dir)), base_url=self.base_url)
+        self.addAsyncCleanup(api.close)
+        await api.init()
+        return api
+
+    async def test_files_private_to_the_owner(self):
+        api = await self.client()
+        await api.get_liked_tracks()
+        files = [p for p in self.cache_dir.rglob("*") if p.is_file()]
+        self.assertTrue(files)
+        self.assertEqual(mode(self.cache_dir), 0o700)
+        for path in files:
+            self.assertEqual(mode(path), 0o600, path)
+            self.assertEqual(mode(path.parent), 0o700, path.parent)
+
+    async def test_existing_directory_is_tightened(self):
+        self.cache_dir.mkdir(mode=0o755)
+        os.chmod(self.cache_dir, 0o755)
+        HttpCache(str(self.cache_dir))
+        self.assertEqual(mode(self.cache_dir), 0o700)
+
+    async def test_init_prunes_stale_entries(self):
+        stale, fresh = self.cache_dir / "ab" / "stale.body", self.cache_dir / "ab" / "fresh.body"
+        stale.parent.mkdir(parents=True)
+        stale.write_bytes(b"old")
+        fresh.write_bytes(b"new")
+        old = os.stat(stale).st_mtime - HttpCache.MAX_AGE - 60
+        os.utime(stale, (old, old))
+        with patch.dict(os.environ, {"YM_API_CACHE_DIR": str(self.cache_dir)}), patch.object(http_cache, "_cache", None):
+            cache = init_http_cache()
+            self.assertIs(http_cache.get_http_cache(), cache)
+        self.assertFalse(stale.exists())
+        self.assertTrue(fresh.exists())
+
+    async def test_library_hit_served_from_disk(self):
+        api = await self.client()
+        hits = CACHE_REQUESTS.snapshot().get(("/likes/tracks", "hit"), 0)
+        first = await api.get_liked_tracks()
+        requests = self.fake.stats[LIBRARY]
+        self.assertEqual(requests, 1)
+        self.assertEqual(await api.get_liked_tracks(), first)
+        self.assertEqual(self.fake.stats[LIBRARY], requests)
+        self.assertEqual(CACHE_REQUESTS.snapshot()[("/likes/tracks", "hit")], hits + 1)
+
+    async def test_account_status_not_cached(self):
+        await self.client("token-b")
+        self.fake.config.reject_tokens = ("token-b",)  # токен отозван
+        with self.assertRaises(PermissionError):
+            await self.client("token-b")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import json
+import asyncio
+import unittest
+from utils.json_stream import JSONArrayStream, iter_array_items
+
+
+PATH = ("library", "tracks")
+
+
+def parse(body: bytes, size: int, path=PATH):
+    stream = JSONArrayStream(path)
+    items = []
+    for start in range(0, len(body), size):
+        items.extend(stream.feed(body[start:start + size]))
+    items.extend(stream.feed(b"", final=True))
+    return items, stream
+
+
+def library(tracks, **extra) -> dict:
+    return {"invocationInfo": {"req-id": "x"}, "result": {"library": {"uid": 7, "revision": 12, **extra, "tracks": tracks}}}
+
+
+class TestJSONArrayStream(unittest.TestCase):
+    def assertParsed(self, doc, expected=None, path=PATH):
+        body = json.dumps(doc, ensure_ascii=False).encode()
+        expected = expected if expected is not None else doc["result"]["library"]["tracks"]
+        for size in range(1, 65):
+            with self.subTest(chunk=size):
+                items, stream = parse(body, size, path)
+                self.assertEqual(items, expected)
+                self.assertTrue(stream.done)
+
+    def test_every_chunk_size(self):
+        tracks = [{"id": str(1000 + i), "albumId": str(i), "timestamp": "2024-01-01T00:00:00+00:00"} for i in range(40)]
+        self.assertParsed(library(tracks))
+
+    def test_scalars_next_to_the_array(self):
+        body = json.dumps(library([{"id": "1"}])).encode()
+        for size in (1, 7, 64):
+            _, stream = parse(body, size)
+            self.assertEqual(stream.scalars, {"uid": 7, "revision": 12})
+
+    def test_numbers_split_across_chunks(self):
+        self.assertParsed(library([123456789, -42, 3.25, 1e10, 0]))
+
+    def test_escapes_in_keys_and_values(self):
+        tracks = [
+            {"id": "1", "title": 'quote " and backslash \\ and ] } , :'},
+            {"id": "2", "title": "юникод ✓ и эмодзи 🎵", "\"tricky\\key": "[{"},
+            "\\",
+            "\"]",
+        ]
+        self.assertParsed(library(tracks, note='"tracks": [1, 2]', **{"lib\\\"rary": {"tracks": [0]}}))
+
+    def test_escaped_key_on_the_path(self):
+        body = b'{"result": {"libr\\u0061ry": {"revision": 3, "tr\\u0061cks": [{"id": "9"}]}}}'
+        for size in range(1, 65):
+            with self.subTest(chunk=size):
+                self.assertEqual(parse(body, size)[0], [{"id": "9"}])
+
+    def test_decoy_keys(self):
+        doc = {"result": {
+            "tracks": [{"id": "decoy-top"}],
+            "other": {"library": {"tracks": [{"id": "decoy-nested"}]}},
+            "list": [{"library": {"tracks": [{"id": "decoy-in-array"}]}}],
+            "library": {
+                "playlists": {"tracks": [{"id": "decoy-sibling"}]},
+                "revision": 5,
+                "tracks": [{"id": "1"}, {"id": "2"}],
+            },
+        }}
+        self.assertParsed(doc, [{"id": "1"}, {"id": "2"}])
+
+    def test_unwrapped_document(self):
+        doc = {"library": {"revision": 1, "tracks": [{"id": "1"}]}}
+        self.assertParsed(doc, [{"id": "1"}])
+
+    def test_truncated_body(self):
+        body = json.dumps(library([{"id": str(i)} for i in range(10)])).encode()
+        stream = JSONArrayStream(PATH)
+        items = list(stream.feed(body[:body.index(b'{"id": "5"}') + 4]))
+        self.assertEqual(len(items), 5)
+        self.assertFalse(stream.done)
+        with self.assertRaises(ValueError):
+            list(stream.feed(b"", final=True))
+
+        stream = JSONArrayStream(PATH)
+        items = list(stream.feed(body[:body.index(b', {"id": "5"}')], final=True))
+        self.assertEqual(len(items), 5)
+        self.assertFalse(stream.done)
+
+    def test_async_iteration_stops_after_the_document(self):
+        async def chunks():
+            body = json.dumps(library([{"id": "1"}, {"id": "2"}])).encode()
+            for start in range(0, len(body), 5):
+                yield body[start:start + 5]
+            yield b"  trailing garbage"
+
+        async def collect():
+            return [item async for item in iter_array_items(chunks(), PATH)]
+
+        self.assertEqual(asyncio.run(collect()), [{"id": "1"}, {"id": "2"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from unittest.mock import patch
+from loadtest import SentClock, lag_buckets, lag_quantiles
+
+
+METRICS = """# TYPE ym_api_event_loop_lag_seconds histogram
+ym_api_event_loop_lag_seconds_bucket{le="0.001"} %d
+ym_api_event_loop_lag_seconds_bucket{le="0.01"} %d
+ym_api_event_loop_lag_seconds_bucket{le="0.1"} %d
+ym_api_event_loop_lag_seconds_bucket{le="+Inf"} %d
+"""
+
+
+class TestLoadTestHelpers(unittest.TestCase):
+    def test_lag_quantiles_use_only_the_measured_window(self):
+        before = lag_buckets(METRICS % (100, 100, 100, 100))
+        # за замер: 90 быстрых пробуждений, 9 до 10 мс, 1 до 100 мс
+        after = METRICS % (190, 199, 200, 200)
+        self.assertEqual(lag_quantiles(after, before), {"loop_lag_p50_ms": 1.0, "loop_lag_p99_ms": 10.0})
+
+    def test_sent_clock_forgets_old_rids(self):
+        clock = SentClock(horizon=10)
+        with patch("loadtest.time.monotonic", return_value=100.0):
+            clock.mark("t", "old")
+        with patch("loadtest.time.monotonic", return_value=120.0):
+            clock.mark("t", "new")
+        self.assertIsNone(clock.get("old"))
+        self.assertEqual(clock.get("new"), 120.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import time
+import asyncio
+import unittest
+from loop_monitor import LOOP_BLOCKED_TOTAL, LoopWatchdog
+
+
+def render_cover(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestLoopWatchdog(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.watchdog = LoopWatchdog(asyncio.get_running_loop(), threshold=0.05, interval=0.02)
+        self.watchdog.start()
+
+    async def asyncTearDown(self):
+        self.watchdog.stop()
+
+    async def test_block_attributed_to_task_and_stack(self):
+        async def enrich():
+            await asyncio.sleep(0.05)
+            render_cover(0.3)
+
+        before = LOOP_BLOCKED_TOTAL.snapshot().get((enrich.__qualname__,), 0)
+        await asyncio.create_task(enrich())
+        await asyncio.sleep(0.05)
+
+        block, = self.watchdog.recent
+        self.assertEqual(block.task, enrich.__qualname__)
+        self.assertTrue(block.stack.endswith("test_loop_monitor.py:render_cover"))
+        self.assertGreater(block.seconds, 0.2)
+        self.assertEqual(LOOP_BLOCKED_TOTAL.snapshot()[(enrich.__qualname__,)], before + 1)
+
+    async def test_idle_loop_is_quiet(self):
+        await asyncio.sleep(0.3)
+        self.assertEqual(len(self.watchdog.recent), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from manager import YnisonSession
+
+
+def make_session(index: int = 1, progress_ms: int = 42_000):
+    session = YnisonSession("token", None)
+    queue = SimpleNamespace(
+        current_playable_index=index,
+        playable_list=[SimpleNamespace(playable_id=str(i)) for i in range(5)],
+    )
+    session.ynison = SimpleNamespace(
+        state=SimpleNamespace(player_state=SimpleNamespace(player_queue=queue)),
+        transport=AsyncMock(return_value=True),
+        change_volume=AsyncMock(return_value=True),
+        calculate_current_progress=MagicMock(return_value=progress_ms),
+    )
+    session.library_writer = MagicMock()
+    session.handle_ynison_state = AsyncMock()
+    return session
+
+
+class TestMacro(unittest.IsolatedAsyncioTestCase):
+    async def test_like_and_skip(self):
+        session = make_session()
+        self.assertTrue(await session.macro(["like", "next"]))
+
+        self.assertIn("1", session.liked_tracks)
+        session.ynison.transport.assert_awaited_once_with(offset=1, skip=True, toggle=False, position_ms=None)
+        session.ynison.change_volume.assert_not_called()
+
+    async def test_like_applies_to_track_after_skip(self):
+        session = make_session()
+        await session.macro(["next", "next", "like"])
+        self.assertEqual(session.liked_tracks, {"3"})
+
+    async def test_like_after_skip_past_end_hits_last_track(self):
+        session = make_session(index=3)
+        await session.macro(["next", "next", "next", "like"])
+        self.assertEqual(session.liked_tracks, {"4"})
+
+    async def test_restart_track(self):
+        session = make_session()
+        await session.macro([{"action": "seek", "params": {"position_ms": 0}}])
+        session.ynison.transport.assert_awaited_once_with(offset=0, skip=False, toggle=False, position_ms=0)
+
+    async def test_relative_seek_uses_current_progress(self):
+        session = make_session(progress_ms=42_000)
+        await session.macro([{"action": "seek", "params": {"offset_ms": 10_000}}])
+        self.assertEqual(session.ynison.transport.await_args.kwargs["position_ms"], 52_000)
+
+    async def test_library_only_macro_skips_player_update(self):
+        session = make_session()
+        await session.macro(["dislike"])
+        self.assertEqual(session.disliked_tracks, {"1"})
+        session.ynison.transport.assert_not_called()
+
+    async def test_invalid_step(self):
+        session = make_session()
+        with self.assertRaises(ValueError):
+            await session.macro(["next", "explode"])
+        session.ynison.transport.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from metrics import COLLECTORS, Counter, Gauge, Histogram, REGISTRY, render_text
+from yandex_api import endpoint_label
+
+
+class TestRenderText(unittest.TestCase):
+    def tearDown(self):
+        for name in ("test_requests_total", "test_depth", "test_latency_seconds"):
+            REGISTRY.pop(name, None)
+
+    def test_exposition_format(self):
+        counter = Counter("test_requests_total", "Requests", labelnames=("outcome",))
+        counter.inc(2, outcome='hit "fast"')
+        gauge = Gauge("test_depth", "Depth")
+        COLLECTORS.append(lambda: gauge.set(7))
+        histogram = Histogram("test_latency_seconds", "Latency", labelnames=("endpoint",), buckets=(0.1, 1))
+        histogram.observe(0.05, endpoint="/tracks")
+        histogram.observe(0.5, endpoint="/tracks")
+        histogram.observe(3, endpoint="/tracks")
+        try:
+            text = render_text()
+        finally:
+            COLLECTORS.pop()
+
+        self.assertIn("# TYPE test_requests_total counter", text)
+        self.assertIn('test_requests_total{outcome="hit \\"fast\\""} 2', text)
+        self.assertIn("test_depth 7", text)
+        self.assertIn('test_latency_seconds_bucket{endpoint="/tracks",le="0.1"} 1', text)
+        self.assertIn('test_latency_seconds_bucket{endpoint="/tracks",le="1"} 2', text)
+        self.assertIn('test_latency_seconds_bucket{endpoint="/tracks",le="+Inf"} 3', text)
+        self.assertIn('test_latency_seconds_sum{endpoint="/tracks"} 3.55', text)
+        self.assertIn('test_latency_seconds_count{endpoint="/tracks"} 3', text)
+
+
+class TestEndpointLabel(unittest.TestCase):
+    def test_ids_are_templated(self):
+        self.assertEqual(endpoint_label("https://api.music.yandex.net/users/123/likes/tracks"), "/users/{id}/likes/tracks")
+        self.assertEqual(endpoint_label("https://api.music.yandex.net/albums/42/with-tracks"), "/albums/{id}/with-tracks")
+        self.assertEqual(endpoint_label("https://api.music.yandex.net/tracks"), "/tracks")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import json
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+from types import SimpleNamespace
+from presets import PresetCache
+from main import params_error, request_token
+
+
+def track(tid, album=None):
+    return {"id": tid, "title": f"Track {tid}", "albums": [{"id": album}] if album else [], "coverUri": f"cover/{tid}/%%"}
+
+
+def make_api():
+    return SimpleNamespace(
+        uid="100",
+        get_track=AsyncMock(return_value=track(1, 7)),
+        get_tracks=AsyncMock(side_effect=lambda ids, priority: [track(int(i)) for i in ids]),
+        get_album_with_tracks=AsyncMock(return_value={"title": "Album", "volumes": [[track(1), track(2)], [track(3)]]}),
+        get_playlist=AsyncMock(return_value={"title": "Mix", "tracks": [
+            {"id": 5, "track": track(5)},
+            {"id": 6},
+            {"id": 7},
+        ]}),
+    )
+
+
+class TestPresetCache(unittest.IsolatedAsyncioTestCase):
+    async def test_album_payload_only_needs_version(self):
+        cache = PresetCache(make_api())
+        preset = await cache.resolve("album", "42")
+        self.assertEqual(preset.track_count, 3)
+
+        payload = json.loads(preset.build_payload())
+        queue = payload["update_player_state"]["player_state"]["player_queue"]
+        status = payload["update_player_state"]["player_state"]["status"]
+        self.assertEqual(queue["entity_type"], "ALBUM")
+        self.assertEqual(queue["entity_id"], "42")
+        self.assertEqual([p["playable_id"] for p in queue["playable_list"]], ["1", "2", "3"])
+        self.assertEqual(queue["playable_list"][0]["album_id_optional"], "42")
+        self.assertEqual(queue["version"], status["version"])
+        self.assertFalse(status["paused"])
+
+    async def test_each_press_gets_fresh_version(self):
+        cache = PresetCache(make_api())
+        preset = await cache.resolve("track", "1")
+        first, second = json.loads(preset.build_payload()), json.loads(preset.build_payload())
+        self.assertNotEqual(first["rid"], second["rid"])
+        self.assertNotEqual(
+            first["update_player_state"]["player_state"]["status"]["version"]["device_id"],
+            second["update_player_state"]["player_state"]["status"]["version"]["device_id"],
+        )
+
+    async def test_playlist_missing_tracks_fetched_in_one_batch(self):
+        api = make_api()
+        preset = await PresetCache(api).resolve("playlist", "3")
+        api.get_playlist.assert_awaited_once_with("100", "3", unittest.mock.ANY)
+        api.get_tracks.assert_awaited_once()
+        self.assertEqual(api.get_tracks.await_args.args[0], ["6", "7"])
+
+        queue = json.loads(preset.build_payload())["update_player_state"]["player_state"]["player_queue"]
+        self.assertEqual(queue["entity_id"], "100:3")
+        self.assertEqual([p["playable_id"] for p in queue["playable_list"]], ["5", "6", "7"])
+
+    async def test_concurrent_resolves_share_one_fetch(self):
+        api = make_api()
+        cache = PresetCache(api)
+        await asyncio.gather(*(cache.resolve("album", "42") for _ in range(5)))
+        api.get_album_with_tracks.assert_awaited_once()
+
+    async def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            await PresetCache(make_api()).resolve("artist", "1")
+
+
+class TestPresetEndpoints(unittest.TestCase):
+    def test_token_from_header_or_query(self):
+        # /control и /presets разбирают токен одинаково
+        self.assertEqual(request_token("Bearer abc"), "abc")
+        self.assertEqual(request_token("abc"), "abc")
+        self.assertEqual(request_token("Bearer abc", "q"), "q")
+        self.assertEqual(request_token(None, "q"), "q")
+        self.assertIsNone(request_token(None))
+
+    def test_play_preset_params(self):
+        self.assertIsNone(params_error("play_preset", {"kind": "album", "entity_id": "42"}))
+        self.assertIsNotNone(params_error("play_preset", {"kind": "album"}))
+        self.assertIsNotNone(params_error("play_preset", {"kind": "artist", "entity_id": "42"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
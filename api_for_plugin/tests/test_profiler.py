@@ -0,0 +1,67 @@
+import time
+import asyncio
+import unittest
+import profiler
+from types import SimpleNamespace
+from profiler import ProfilerBusy, run_profile
+
+
+def busy_render(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiler(unittest.IsolatedAsyncioTestCase):
+    async def test_cpu_samples_show_blocking_code(self):
+        async def blocker():
+            await asyncio.sleep(0.05)
+            busy_render(0.3)
+
+        task = asyncio.create_task(blocker())
+        collapsed = await run_profile("cpu", 0.5)
+        await task
+        blocking = [line for line in collapsed.splitlines() if "test_profiler.py:busy_render" in line]
+        self.assertTrue(blocking)
+        stack, count = blocking[0].rsplit(" ", 1)
+        self.assertIn("test_profiler.py:TestProfiler.test_cpu_samples_show_blocking_code.<locals>.blocker", stack)
+        self.assertGreater(int(count), 5)
+
+    async def test_pstats(self):
+        out = await run_profile("cpu", 0.1, format="pstats")
+        self.assertIn("function calls", out)
+
+    async def test_alloc_diff_points_at_the_allocation(self):
+        kept = []
+
+        async def grow():
+            await asyncio.sleep(0.05)
+            kept.extend(bytearray(1024) for _ in range(500))
+
+        task = asyncio.create_task(grow())
+        out = await run_profile("alloc", 0.2, limit=5)
+        await task
+        self.assertIn("test_profiler.py", out.split("\n", 2)[2])
+
+    async def test_one_profile_at_a_time(self):
+        first = asyncio.create_task(run_profile("cpu", 0.2))
+        await asyncio.sleep(0)
+        with self.assertRaises(ProfilerBusy):
+            await run_profile("alloc", 0.1)
+        await first
+        self.assertFalse(profiler._running)
+
+    async def test_bad_arguments(self):
+        for kwargs in ({"mode": "io", "seconds": 1}, {"mode": "cpu", "seconds": 600}, {"mode": "cpu", "seconds": 1, "format": "svg"}):
+            with self.assertRaises(ValueError):
+                await run_profile(**kwargs)
+
+    def test_collapse_without_qualname(self):
+        """До Python 3.11 у code нет co_qualname."""
+        outer = SimpleNamespace(f_code=SimpleNamespace(co_filename="/app/main.py", co_name="<module>"), f_back=None)
+        inner = SimpleNamespace(f_code=SimpleNamespace(co_filename="/app/player.py", co_name="render"), f_back=outer)
+        self.assertEqual(profiler.collapse(inner), "main.py:<module>;player.py:render")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import json
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+from ynison.recording import FrameRecorder, read_frames, recording_info
+from fakes.ynison import Room
+from replay import replay
+
+
+class TestRecording(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = Path(self.dir.name) / "session.ynrec"
+
+    def record(self, frames, compress=True, secrets=("secret-token",)):
+        recorder = FrameRecorder(self.path, compress=compress, secrets=secrets)
+        for frame in frames:
+            recorder.write(frame)
+        recorder.close()
+
+    def test_round_trip(self):
+        room = Room("secret-token", queue_size=200)
+        frames = [room.message() for _ in range(20)]
+        for compress in (True, False):
+            self.record(frames, compress=compress)
+            read = list(read_frames(self.path))
+            self.assertEqual([f for _, f in read], frames)
+            self.assertEqual([t for t, _ in read], sorted(t for t, _ in read))
+            self.assertEqual(recording_info(self.path)["compressed"], compress)
+
+    def test_similar_frames_compress_well(self):
+        room = Room("secret-token", queue_size=200)
+        frames = [room.message() for _ in range(20)]
+        self.record(frames)
+        self.assertLess(self.path.stat().st_size * 10, sum(len(f) for f in frames))
+
+    def test_token_redacted(self):
+        self.record([json.dumps({"note": "secret-token", "header": "OAuth other-token"})])
+        (_, frame), = read_frames(self.path)
+        self.assertNotIn("secret-token", frame)
+        self.assertNotIn("other-token", frame)
+        self.assertIn("<redacted>", frame)
+
+    def test_truncated_tail_is_skipped(self):
+        recorder = FrameRecorder(self.path, secrets=())
+        for i in range(5):
+            recorder.write(json.dumps({"i": i}))
+        recorder.flush()  # процесс "упал": последний поток не закрыт
+        data = self.path.read_bytes()
+        recorder.close()
+        self.path.write_bytes(data[:-6])  # обрезан посреди последнего кадра
+        self.assertEqual([json.loads(f)["i"] for _, f in read_frames(self.path)], [0, 1, 2, 3])
+
+    def test_file_created_on_first_frame_and_private(self):
+        recorder = FrameRecorder(self.path, secrets=())
+        recorder.close()  # подключение не удалось — кадров не было
+        self.assertFalse(self.path.exists())
+
+        self.record([json.dumps({"i": 1})])
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    def test_write_after_close_is_ignored(self):
+        recorder = FrameRecorder(self.path, secrets=())
+        recorder.write(json.dumps({"i": 1}))
+        recorder.close()
+        recorder.write(json.dumps({"i": 2}))
+        recorder.close()
+        self.assertEqual([json.loads(f)["i"] for _, f in read_frames(self.path)], [1])
+
+
+class TestReplay(unittest.IsolatedAsyncioTestCase):
+    async def test_frames_reach_clients_enriched(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "session.ynrec"
+            room = Room("token-a", queue_size=50)
+            recorder = FrameRecorder(path)
+            for _ in range(5):
+                room.tick(1.0)
+                recorder.write(room.message())
+            recorder.close()
+
+            result = await replay(path, speed=0, clients=2)
+
+        self.assertEqual(result["frames"], 5)
+        # кадры пришли пачкой: рассылки стейта сессии идут по одной, и из накопившихся уходит только последний
+        self.assertTrue(result["last_frame_delivered"])
+        self.assertLess(result["delivered_frames"], 5)
+        # оба клиента получают одно и то же
+        self.assertEqual(result["client_messages"] % 2, 0)
+        self.assertLess(result["client_messages"], 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
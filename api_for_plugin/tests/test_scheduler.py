@@ -0,0 +1,113 @@
+import asyncio
+import unittest
+from scheduler import Priority, RequestScheduler
+
+
+class TestRequestScheduler(unittest.IsolatedAsyncioTestCase):
+    def scheduler(self, **kwargs) -> RequestScheduler:
+        return RequestScheduler(**{"rate_per_token": 1000, "burst_per_token": 1000, **kwargs})
+
+    async def hold(self, scheduler: RequestScheduler, token: str = "t", priority=Priority.BACKGROUND, stream=False):
+        """Занимает слот до release.set(); возвращает (задачу, событие «слот получен», release)."""
+        acquired, release = asyncio.Event(), asyncio.Event()
+
+        async def run():
+            async with scheduler.slot(token, priority, stream):
+                acquired.set()
+                await release.wait()
+
+        task = asyncio.create_task(run())
+        await asyncio.sleep(0)
+        return task, acquired, release
+
+    async def test_priority_order(self):
+        scheduler = self.scheduler(max_concurrency=1)
+        holder, _, release = await self.hold(scheduler)
+        order = []
+
+        async def request(name, priority):
+            async with scheduler.slot("t", priority):
+                order.append(name)
+
+        tasks = [asyncio.create_task(request(name, priority)) for name, priority in (
+            ("background-1", Priority.BACKGROUND), ("enrichment", Priority.ENRICHMENT),
+            ("background-2", Priority.BACKGROUND), ("interactive", Priority.INTERACTIVE),
+        )]
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.queued, 4)
+
+        release.set()
+        await asyncio.gather(holder, *tasks)
+        self.assertEqual(order, ["interactive", "enrichment", "background-1", "background-2"])
+        self.assertEqual(scheduler.active, 0)
+
+    async def test_token_bucket_is_per_token(self):
+        scheduler = self.scheduler(rate_per_token=10, burst_per_token=1)
+        async with scheduler.slot("greedy"):
+            pass
+
+        done = []
+
+        async def request(token, priority=Priority.BACKGROUND):
+            async with scheduler.slot(token, priority):
+                done.append(token)
+
+        # ведро "greedy" пусто (следующий токен через 0.1 с), а чужой токен и интерактивный запрос не ждут
+        await asyncio.gather(request("greedy"), request("other"), request("greedy", Priority.INTERACTIVE))
+        self.assertEqual(done, ["other", "greedy", "greedy"])
+
+    async def test_cancelled_waiter_gives_up_its_place(self):
+        scheduler = self.scheduler(max_concurrency=1)
+        holder, _, release = await self.hold(scheduler)
+        waiter, waiter_acquired, _ = await self.hold(scheduler)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+        release.set()
+        await holder
+        self.assertFalse(waiter_acquired.is_set())
+        self.assertEqual((scheduler.active, scheduler.queued), (0, 0))
+
+    async def test_slot_handed_to_cancelled_waiter_passes_on(self):
+        scheduler = self.scheduler(max_concurrency=1)
+        await scheduler._requests.acquire(Priority.BACKGROUND)
+        waiter, waiter_acquired, _ = await self.hold(scheduler)
+        last, last_acquired, last_release = await self.hold(scheduler)
+
+        scheduler._requests.release()  # слот передан waiter, но тот ещё не успел проснуться
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.wait_for(last_acquired.wait(), 1)
+        self.assertFalse(waiter_acquired.is_set())
+
+        last_release.set()
+        await last
+        self.assertEqual(scheduler.active, 0)
+
+    async def test_streams_do_not_hold_request_slots(self):
+        scheduler = self.scheduler(max_concurrency=1, max_streams=1)
+        download, download_started, download_release = await self.hold(scheduler, stream=True)
+        second, second_started, second_release = await self.hold(scheduler, stream=True)
+        self.assertTrue(download_started.is_set())
+        self.assertFalse(second_started.is_set())  # потоков не больше max_streams
+        self.assertEqual(scheduler.streams, 1)
+
+        # пока идут скачивания, обычный запрос получает слот сразу
+        await asyncio.wait_for(self.request_once(scheduler, Priority.INTERACTIVE), 0.5)
+        self.assertEqual(scheduler.active, 0)
+
+        download_release.set()
+        await download
+        await asyncio.wait_for(second_started.wait(), 1)
+        second_release.set()
+        await second
+        self.assertEqual(scheduler.streams, 0)
+
+    @staticmethod
+    async def request_once(scheduler: RequestScheduler, priority: Priority):
+        async with scheduler.slot("t", priority):
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import stat
+import time
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from snapshot import SnapshotStore, compact_state
+from manager import YnisonSession
+
+
+def state(n=5, idx=3):
+    return {
+        "player_state": {
+            "player_queue": {
+                "current_playable_index": idx,
+                "playable_list": [{"playable_id": str(i), "is_liked": i == idx} for i in range(n)],
+            },
+            "status": {"paused": False},
+        }
+    }
+
+
+class TestSnapshotStore(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "snapshots.sqlite"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_roundtrip_by_token(self):
+        store = SnapshotStore(self.path)
+        await store.save_many({"tok-a": {"state": {"a": 1}}, "tok-b": {"state": {"b": 2}}})
+
+        reopened = SnapshotStore(self.path)
+        snapshot = await reopened.load("tok-a")
+        self.assertEqual(snapshot["state"], {"a": 1})
+        self.assertAlmostEqual(snapshot["saved_at"], time.time(), delta=5)
+        self.assertIsNone(await reopened.load("tok-c"))
+        self.assertNotIn(b"tok-a", self.path.read_bytes())
+
+    async def test_files_are_private(self):
+        store = SnapshotStore(self.path)
+        await store.save_many({"tok": {"state": {}}})
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+        with patch.dict(os.environ, {"YM_API_SNAPSHOT_PATH": ""}), patch.object(tempfile, "tempdir", self.tmp.name):
+            default = SnapshotStore()
+        self.assertEqual(default.path.parent.parent, Path(self.tmp.name))
+        self.assertEqual(stat.S_IMODE(os.stat(default.path.parent).st_mode), 0o700)
+        self.assertEqual(stat.S_IMODE(os.stat(default.path).st_mode), 0o600)
+
+    async def test_expired_snapshot_ignored(self):
+        await SnapshotStore(self.path).save_many({"tok": {"state": {}}})
+        self.assertIsNone(await SnapshotStore(self.path, max_age=-1).load("tok"))
+
+
+class TestSessionSnapshot(unittest.TestCase):
+    def test_compact_state_keeps_current_track(self):
+        compact = compact_state(state())
+        queue = compact["player_state"]["player_queue"]
+        self.assertEqual(queue["playable_list"], [{"playable_id": "3", "is_liked": True}])
+        self.assertEqual(queue["current_playable_index"], 0)
+        self.assertEqual(compact["player_state"]["status"], {"paused": False})
+
+    def test_restore_roundtrip(self):
+        session = YnisonSession("token", None)
+        self.assertIsNone(session.snapshot())
+        session.last_state = state()
+        session.track_cache = {"3": {"artists_enriched": "Artist"}}
+
+        restored = YnisonSession("token", None)
+        restored.restore(session.snapshot())
+        self.assertEqual(restored.track_cache, session.track_cache)
+        self.assertEqual(restored.last_state["player_state"]["player_queue"]["playable_list"][0]["playable_id"], "3")
+
+
+if __name__ == "__main__":
+    unittest.main()
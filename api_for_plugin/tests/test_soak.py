@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+import main
+from manager import SessionManager, YnisonSession
+from soak import Sample, SoakConfig, SoakReport, VirtualClock, check
+
+
+def sample(at, traced_mb, tasks):
+    return Sample(at=at, traced_mb=traced_mb, tasks=tasks, sessions=1, ws_tokens=1, ws_sockets=2,
+                  track_cache=0, session_tasks=0)
+
+
+class TestVirtualClock(unittest.TestCase):
+    def test_sleep_runs_faster(self):
+        clock = VirtualClock(speed=50)
+        clock.install()
+        try:
+            with asyncio.Runner(loop_factory=clock.new_loop) as runner:
+                started = clock._real_monotonic()
+                runner.run(asyncio.sleep(5))
+                real = clock._real_monotonic() - started
+        finally:
+            clock.uninstall()
+        self.assertLess(real, 1.0)
+        self.assertGreaterEqual(clock.elapsed(), 5)
+
+
+class TestCheck(unittest.TestCase):
+    def test_single_spike_is_not_growth(self):
+        config = SoakConfig(max_memory_growth_mb=5, max_task_growth=10)
+        report = SoakReport(samples=[sample(900, 20, 100), sample(1200, 40, 100),
+                                     sample(1500, 21, 104), sample(1800, 22, 103)])
+        check(config, report, report.samples[0])
+        self.assertTrue(report.ok)
+
+    def test_steady_growth_fails(self):
+        config = SoakConfig(max_memory_growth_mb=5, max_task_growth=10)
+        report = SoakReport(samples=[sample(900, 20, 100), sample(1200, 30, 130),
+                                     sample(1500, 35, 140), sample(1800, 40, 150)])
+        check(config, report, report.samples[0])
+        self.assertEqual(len(report.failures), 2)
+
+
+class TestConcurrentSessionStart(unittest.IsolatedAsyncioTestCase):
+    async def test_clients_of_one_token_share_a_session(self):
+        """Клиенты одного токена, подключившиеся разом, получают одну сессию, а не по своей."""
+        async def slow_start(self, connect=True):
+            await asyncio.sleep(0.01)
+
+        manager = SessionManager()
+        with patch.object(YnisonSession, "start", slow_start), \
+             patch.object(SessionManager, "load_snapshot", AsyncMock(return_value=None)):
+            sessions = await asyncio.gather(*(manager.get_session("token-a") for _ in range(3)))
+        self.assertEqual(len({id(s) for s in sessions}), 1)
+        self.assertIs(manager.sessions["token-a"], sessions[0])
+
+
+class TestWebSocketCleanup(unittest.TestCase):
+    def test_failed_session_start_does_not_leak_socket(self):
+        """Токен, сессия которого не стартовала (4001), не остаётся в connected_websockets."""
+        with patch.object(main.manager, "load_snapshot", AsyncMock(return_value=None)), \
+             patch.object(main.manager, "get_session", AsyncMock(side_effect=ConnectionError("401"))):
+            client = TestClient(main.app)
+            for _ in range(3):
+                with client.websocket_connect("/ws", headers={"Authorization": "bad-token"}) as ws:
+                    with self.assertRaises(WebSocketDisconnect) as closed:
+                        ws.receive_text()
+                self.assertEqual(closed.exception.code, 4001)
+        self.assertNotIn("bad-token", main.connected_websockets)
+
+
+if __name__ == '__main__':
+    unittest.main()
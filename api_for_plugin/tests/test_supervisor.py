@@ -0,0 +1,81 @@
+import asyncio
+import unittest
+from supervisor import TASK_FAILURES, TASKS, TASKS_SUPERSEDED, TaskGroup, collect_tasks
+
+
+class TestTaskGroup(unittest.IsolatedAsyncioTestCase):
+    async def test_limit_keeps_only_the_newest_waiting(self):
+        group = TaskGroup("t", limits={"broadcast": 1})
+        release = asyncio.Event()
+        sent = []
+
+        async def send(n):
+            await release.wait()
+            sent.append(n)
+
+        superseded = TASKS_SUPERSEDED.snapshot().get(("broadcast",), 0)
+        for n in range(5):
+            group.spawn("broadcast", send(n))
+        self.assertEqual(group.counts(), {"broadcast": 1})
+        self.assertEqual(len(group), 2)
+
+        release.set()
+        while len(group):
+            await asyncio.sleep(0.01)
+        self.assertEqual(sent, [0, 4])
+        self.assertEqual(TASKS_SUPERSEDED.snapshot()[("broadcast",)], superseded + 3)
+
+    async def test_unlimited_kind_runs_everything(self):
+        group = TaskGroup("t", limits={"broadcast": 1})
+        done = []
+
+        async def event(n):
+            await asyncio.sleep(0)
+            done.append(n)
+
+        for n in range(5):
+            group.spawn("event", event(n))
+        await asyncio.sleep(0.05)
+        self.assertEqual(sorted(done), [0, 1, 2, 3, 4])
+
+    async def test_close_cancels_everything(self):
+        group = TaskGroup("t", limits={"enrich": 1})
+        started = asyncio.Event()
+
+        async def forever():
+            started.set()
+            await asyncio.sleep(3600)
+
+        running = group.spawn("run_loop", forever())
+        group.spawn("enrich", forever())
+        group.spawn("enrich", forever())  # ждёт места
+        await started.wait()
+        await group.close()
+
+        self.assertTrue(running.cancelled())
+        self.assertEqual(len(group), 0)
+        self.assertIsNone(group.spawn("enrich", forever()))
+
+    async def test_failures_counted_and_kinds_exported(self):
+        group = TaskGroup("t")
+        failures = TASK_FAILURES.snapshot().get(("enrich",), 0)
+
+        async def boom():
+            raise RuntimeError("upstream 503")
+
+        async def idle():
+            await asyncio.sleep(3600)
+
+        with self.assertLogs("Supervisor", "ERROR"):
+            await asyncio.wait([group.spawn("enrich", boom())])
+            await asyncio.sleep(0)
+        self.assertEqual(TASK_FAILURES.snapshot()[("enrich",)], failures + 1)
+
+        group.spawn("run_loop", idle())
+        collect_tasks()
+        self.assertEqual(TASKS.snapshot()[("run_loop",)], 1)
+        await group.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+from aiohttp import web
+from token_validator import TokenValidator
+from yandex_api import YandexMusicAPI
+from fakes.rest import FakeRest
+
+
+class NoAccountRest(FakeRest):
+    """Статус аккаунта без uid — так отвечает API для токена без аккаунта Музыки."""
+
+    async def account_status(self, request: web.Request) -> web.Response:
+        return web.json_response({"invocationInfo": {"req-id": "fake"}, "result": {"account": {}}})
+
+
+class TestTokenValidator(unittest.IsolatedAsyncioTestCase):
+    async def test_waiters_released_when_leader_cancelled(self):
+        validator = TokenValidator()
+        started = asyncio.Event()
+
+        async def slow_probe(token):
+            started.set()
+            await asyncio.sleep(3600)
+
+        with patch.object(validator, "_probe", slow_probe):
+            leader = asyncio.create_task(validator.validate("token-a"))
+            await started.wait()
+            waiter = asyncio.create_task(validator.validate("token-a"))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with self.assertRaises(ConnectionError):
+                await asyncio.wait_for(waiter, 1)
+        self.assertEqual(validator._inflight, {})
+
+    async def test_account_without_uid_is_not_valid(self):
+        fake = NoAccountRest()
+        self.addAsyncCleanup(fake.stop)
+        base_url = await fake.start()
+
+        with patch.object(YandexMusicAPI, "BASE_URL", base_url):
+            validator = TokenValidator()
+            with self.assertRaises(ConnectionError):
+                await validator.validate("token-a")
+        self.assertIsNone(validator.cached("token-a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
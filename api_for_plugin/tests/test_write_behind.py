@@ -0,0 +1,154 @@
+import asyncio
+import unittest
+from supervisor import TaskGroup
+from write_behind import LibraryWriteBehind
+
+
+class FakeApi:
+    """library_action, который можно задержать (gate) и заставить упасть (ok=False)."""
+
+    def __init__(self):
+        self.calls = []
+        self.ok = True
+        self.gate = None
+        self.started = asyncio.Event()
+
+    async def library_action(self, ids, action, type_):
+        self.calls.append((type_, action, sorted(ids)))
+        self.started.set()
+        if self.gate:
+            await self.gate.wait()
+        return self.ok
+
+
+class Library:
+    """Локальное множество лайков, как в YnisonSession: переключается сразу, запись — через writer."""
+
+    def __init__(self, liked=(), delay=0.02):
+        self.liked = set(liked)
+        self.api = FakeApi()
+        self.rollbacks = []
+        self.tasks = TaskGroup("test")
+        self.writer = LibraryWriteBehind(self.api, self.rollback, delay=delay, spawn=self.tasks.spawn)
+
+    def toggle(self, tid: str):
+        was_set = tid in self.liked
+        self.liked.symmetric_difference_update({tid})
+        self.writer.toggle("likes", tid, not was_set, was_set)
+
+    async def rollback(self, type_, tid, state):
+        self.rollbacks.append((tid, state))
+        if state:
+            self.liked.add(tid)
+        else:
+            self.liked.discard(tid)
+
+    async def settle(self):
+        await asyncio.sleep(0.1)
+
+
+class TestLibraryWriteBehind(unittest.IsolatedAsyncioTestCase):
+    async def test_even_toggles_send_nothing(self):
+        library = Library()
+        for _ in range(4):
+            library.toggle("1")
+        await library.settle()
+        self.assertEqual(library.api.calls, [])
+        self.assertEqual(library.writer.pending_count, 0)
+        self.assertNotIn("1", library.liked)
+
+    async def test_odd_toggles_send_the_final_state_once(self):
+        library = Library(liked={"2"})
+        for _ in range(3):
+            library.toggle("1")
+            library.toggle("2")
+        await library.settle()
+        self.assertEqual(sorted(library.api.calls), [("likes", "add-multiple", ["1"]), ("likes", "remove", ["2"])])
+        self.assertEqual(library.liked, {"1"})
+
+    async def test_ids_of_one_action_share_a_request(self):
+        library = Library()
+        for tid in ("1", "2", "3"):
+            library.toggle(tid)
+        await library.settle()
+        self.assertEqual(library.api.calls, [("likes", "add-multiple", ["1", "2", "3"])])
+
+    async def test_failed_batch_rolls_back_to_upstream(self):
+        library = Library()
+        library.api.ok = False
+        library.toggle("1")
+        await library.settle()
+        self.assertEqual(library.rollbacks, [("1", False)])
+        self.assertEqual(library.liked, set())
+
+    async def test_failed_batch_with_retoggle_in_flight(self):
+        """Пока лайк летел, трек сняли обратно; запрос упал — апстрим уже совпадает с желаемым."""
+        library = Library()
+        library.api.ok, library.api.gate = False, asyncio.Event()
+        library.toggle("1")
+        await asyncio.wait_for(library.api.started.wait(), 1)
+        library.toggle("1")
+        library.api.gate.set()
+        await library.settle()
+
+        self.assertEqual(library.api.calls, [("likes", "add-multiple", ["1"])])
+        self.assertEqual(library.rollbacks, [])
+        self.assertEqual(library.liked, set())
+        self.assertEqual(library.writer.pending_count, 0)
+
+    async def test_failed_batch_with_two_retoggles_in_flight(self):
+        """Два переключения в полёте снова хотят лайк, но запрос упал: локально — как в апстриме."""
+        library = Library()
+        library.api.ok, library.api.gate = False, asyncio.Event()
+        library.toggle("1")
+        await asyncio.wait_for(library.api.started.wait(), 1)
+        library.toggle("1")
+        library.toggle("1")
+        library.api.gate.set()
+        await library.settle()
+
+        self.assertEqual(library.rollbacks, [("1", False)])
+        self.assertEqual(library.liked, set())
+        self.assertEqual(library.writer.pending_count, 0)
+
+    async def test_successful_batch_with_retoggle_in_flight(self):
+        library = Library()
+        library.api.gate = asyncio.Event()
+        library.toggle("1")
+        await asyncio.wait_for(library.api.started.wait(), 1)
+        library.toggle("1")
+        library.api.gate.set()
+        await library.settle()
+
+        self.assertEqual(library.api.calls, [("likes", "add-multiple", ["1"]), ("likes", "remove", ["1"])])
+        self.assertEqual(library.rollbacks, [])
+        self.assertEqual(library.liked, set())
+
+    async def test_timer_runs_in_the_group_and_close_sends_at_once(self):
+        library = Library(delay=60)
+        library.toggle("1")
+        self.assertEqual(library.tasks.counts(), {"library_flush": 1})
+
+        await library.tasks.close()
+        await asyncio.wait_for(library.writer.close(), 1)
+        self.assertEqual(library.api.calls, [("likes", "add-multiple", ["1"])])
+        self.assertEqual(library.tasks.counts(), {})
+
+    async def test_flush_cancelled_in_flight_is_sent_by_close(self):
+        library = Library()
+        library.api.gate = asyncio.Event()
+        library.toggle("1")
+        library.toggle("2")
+        await asyncio.wait_for(library.api.started.wait(), 1)
+
+        await library.tasks.close()  # сессия закрывается посреди запроса
+        self.assertEqual(library.writer.pending_count, 2)
+        library.api.gate.set()
+        await library.writer.close()
+        self.assertEqual(library.api.calls[-1], ("likes", "add-multiple", ["1", "2"]))
+        self.assertEqual(library.writer.pending_count, 0)
+        self.assertEqual(library.rollbacks, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
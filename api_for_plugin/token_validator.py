@@ -0,0 +1,83 @@
+import time
+import asyncio
+import hashlib
+import logging
+from scheduler import Priority
+from yandex_api import YandexMusicAPI
+from typing import Dict, Optional, Tuple
+
+
+logger = logging.getLogger("TokenValidator")
+
+
+class TokenValidator:
+    """
+    Лёгкая проверка токена: только /account/status, без сессии, Ynison и фоновых задач.
+
+    Результаты кэшируются по хэшу токена: валидные на `valid_ttl`, невалидные (401) на `invalid_ttl`.
+    Сетевые ошибки не кэшируются. Параллельные проверки одного токена склеиваются в один запрос.
+    """
+
+    def __init__(self, valid_ttl: float = 60.0, invalid_ttl: float = 30.0, max_entries: int = 1024):
+        self.valid_ttl = valid_ttl
+        self.invalid_ttl = invalid_ttl
+        self.max_entries = max_entries
+        self._cache: Dict[str, Tuple[bool, float]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _hash(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def cached(self, token: str) -> Optional[bool]:
+        entry = self._cache.get(self._hash(token))
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def remember(self, token: str, valid: bool):
+        now = time.monotonic()
+        if len(self._cache) >= self.max_entries:
+            self._cache = {k: v for k, v in self._cache.items() if v[1] > now}
+        ttl = self.valid_ttl if valid else self.invalid_ttl
+        self._cache[self._hash(token)] = (valid, now + ttl)
+
+    async def validate(self, token: str) -> bool:
+        cached = self.cached(token)
+        if cached is not None:
+            return cached
+
+        key = self._hash(token)
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            valid = await self._probe(token)
+            fut.set_result(valid)
+            return valid
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+            if not fut.done():
+                # ведущую проверку отменили (клиент ушёл) — ждущие её не должны висеть вечно
+                fut.set_exception(ConnectionError("Token check interrupted"))
+            fut.exception()  # помечаем ошибку полученной, чтобы не было "exception was never retrieved"
+
+    async def _probe(self, token: str) -> bool:
+        api = YandexMusicAPI(token)
+        try:
+            await api.init(Priority.INTERACTIVE)
+        except PermissionError:
+            self.remember(token, False)
+            return False
+        finally:
+            await api.close()
+
+        if not api.uid:
+            raise ConnectionError("Account status unavailable")
+        self.remember(token, True)
+        return True
@@ -0,0 +1,179 @@
+import json
+import codecs
+from typing import AsyncIterator, Optional, Sequence, Tuple
+
+
+_WHITESPACE = " \t\r\n"
+_ITEM_END = _WHITESPACE + ",]"
+
+
+class JSONArrayStream:
+    """
+    Инкрементально разбирает JSON-документ и отдаёт элементы массива по заданному пути.
+
+    Всё, что лежит до массива, проходит через лёгкий сканер структуры (без построения дерева),
+    а каждый элемент массива декодируется отдельно через raw_decode и сразу отдаётся наружу.
+    Таким образом, в памяти одновременно находится только текущий чанк и один элемент.
+
+    Скалярные значения-соседи массива (например, "revision") запоминаются в `scalars`.
+    """
+
+    def __init__(self, path: Sequence[str], wrapper: str = "result"):
+        self.path = tuple(path)
+        self.wrapper = wrapper
+        self.scalars: dict = {}
+
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+
+        self._stack: list = []       # [kind, last_key] для каждого открытого контейнера
+        self._in_string = False
+        self._escape = False
+        self._string_chars: list = []
+        self._expect_key = False
+        self._scalar_chars: list = []
+        self._in_array = False
+        self._done = False
+
+    def _parent_path(self) -> Tuple[str, ...]:
+        return tuple(frame[1] for frame in self._stack if frame[0] == "{")
+
+    def _matches(self) -> bool:
+        keys = self._parent_path()
+        if keys == self.path:
+            return True
+        return bool(self.wrapper) and keys == (self.wrapper, *self.path)
+
+    def _is_sibling(self) -> bool:
+        keys = self._parent_path()[:-1]
+        parent = self.path[:-1]
+        return keys == parent or (bool(self.wrapper) and keys == (self.wrapper, *parent))
+
+    def _flush_scalar(self):
+        if not self._scalar_chars:
+            return
+        raw = "".join(self._scalar_chars).strip()
+        self._scalar_chars = []
+        if raw and self._stack and self._stack[-1][0] == "{" and self._is_sibling():
+            try:
+                self.scalars[self._stack[-1][1]] = json.loads(raw)
+            except ValueError:
+                pass
+
+    def _scan_structure(self) -> bool:
+        """Двигается по буферу до начала целевого массива. Возвращает True, если массив найден."""
+        buf = self._buf
+        n = len(buf)
+        while self._pos < n:
+            ch = buf[self._pos]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._string_chars.append(ch)
+                elif ch == "\\":
+                    self._escape = True
+                    self._string_chars.append(ch)
+                elif ch == '"':
+                    self._in_string = False
+                    raw = "".join(self._string_chars)
+                    self._string_chars = []
+                    if self._expect_key:
+                        self._stack[-1][1] = json.loads(f'"{raw}"')
+                        self._expect_key = False
+                    elif self._stack and self._stack[-1][0] == "{" and self._is_sibling():
+                        self.scalars[self._stack[-1][1]] = json.loads(f'"{raw}"')
+                else:
+                    self._string_chars.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._stack and self._stack[-1][0] == "{" and self._stack[-1][1] is None:
+                    self._expect_key = True
+            elif ch == "{":
+                self._stack.append(["{", None])
+            elif ch == "[":
+                if self._matches():
+                    self._in_array = True
+                    return True
+                self._stack.append(["[", None])
+            elif ch in "}]":
+                self._flush_scalar()
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self._done = True
+                    return False
+            elif ch == ",":
+                self._flush_scalar()
+                if self._stack and self._stack[-1][0] == "{":
+                    self._stack[-1][1] = None
+            elif ch == ":":
+                pass
+            elif ch not in _WHITESPACE:
+                self._scalar_chars.append(ch)
+        return False
+
+    def _drain_array(self, final: bool = False):
+        """Отдаёт все полностью полученные элементы массива из буфера."""
+        buf = self._buf
+        n = len(buf)
+        while True:
+            while self._pos < n and (buf[self._pos] in _WHITESPACE or buf[self._pos] == ","):
+                self._pos += 1
+            if self._pos >= n:
+                return
+            if buf[self._pos] == "]":
+                self._pos += 1
+                self._in_array = False
+                return
+            try:
+                item, end = self._decoder.raw_decode(buf, self._pos)
+            except ValueError:
+                if final:
+                    raise
+                return
+            # число на границе чанка может быть обрезано ("3." разберётся как 3): ждём разделитель после него
+            if not final and not isinstance(item, (dict, list, str)) and (end >= n or buf[end] not in _ITEM_END):
+                return
+            self._pos = end
+            yield item
+
+    def _compact(self):
+        if self._pos:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+
+    def feed(self, chunk: bytes, final: bool = False):
+        """Передаёт очередной чанк байтов и возвращает генератор готовых элементов."""
+        self._buf += self._utf8.decode(chunk, final=final)
+        while not self._done:
+            if not self._in_array:
+                if not self._scan_structure():
+                    break
+            items = list(self._drain_array(final))
+            yield from items
+            if self._in_array:
+                break
+        self._compact()
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+
+async def iter_array_items(chunks: AsyncIterator[bytes], path: Sequence[str],
+                           stream: Optional[JSONArrayStream] = None):
+    """Асинхронная обёртка над JSONArrayStream для потока чанков (например, resp.content.iter_chunked)."""
+    stream = stream or JSONArrayStream(path)
+    async for chunk in chunks:
+        for item in stream.feed(chunk):
+            yield item
+        if stream.done:
+            return
+    for item in stream.feed(b"", final=True):
+        yield item
@@ -0,0 +1,44 @@
+import os
+import stat
+import getpass
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+
+def private_dir(path: Optional[str], name: str, strict: bool = False) -> Path:
+    """
+    Каталог для данных пользователей (кэш ответов, снимки сессий): доступен только владельцу процесса.
+
+    Без явного `path` — свой для каждого пользователя ОС каталог во временной папке, а не общий
+    /tmp/<name>: там лежат uid, лайки и состояние плеера. Права 0700 выставляются и на уже
+    существующий каталог; чужой каталог (chmod не наш) даёт PermissionError, а не тихую запись в него.
+    `strict` — существующий каталог не исправляется: ссылка, чужой владелец или доступ для группы/остальных
+    дают PermissionError (каталог мог заранее подготовить другой пользователь).
+    """
+    directory = Path(path) if path else Path(tempfile.gettempdir()) / f"{name}-{getpass.getuser()}"
+    if strict:
+        _check_private(directory)
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    os.chmod(directory, 0o700)
+    return directory
+
+
+def _check_private(directory: Path):
+    try:
+        st = os.lstat(directory)
+    except FileNotFoundError:
+        return
+    getuid = getattr(os, "getuid", None)
+    if not stat.S_ISDIR(st.st_mode):
+        raise PermissionError(f"{directory} is not a directory")
+    if getuid is not None and st.st_uid != getuid():
+        raise PermissionError(f"{directory} is owned by uid {st.st_uid}, not by this user")
+    if getuid is not None and st.st_mode & 0o077:
+        raise PermissionError(f"{directory} is accessible to other users (mode {st.st_mode & 0o777:o}), expected 0700")
+
+
+def open_private(path: Path, mode: str = "wb", **kwargs):
+    """open() для новых файлов с правами 0600 (а не 0644 по umask)."""
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    return os.fdopen(os.open(path, flags, 0o600), mode, **kwargs)
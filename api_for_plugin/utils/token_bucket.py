@@ -0,0 +1,37 @@
+import time
+import asyncio
+
+
+class TokenBucket:
+    """
+    Классический token bucket: `rate` токенов в секунду, не больше `capacity` в запасе.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, amount: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def delay(self, amount: float = 1) -> float:
+        """Сколько секунд ждать, пока в ведре наберётся `amount` токенов."""
+        self._refill()
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    async def acquire(self, amount: float = 1):
+        while not self.try_acquire(amount):
+            await asyncio.sleep(self.delay(amount))
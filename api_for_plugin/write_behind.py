@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from supervisor import Spawn, spawn_unsupervised
+
+
+logger = logging.getLogger("WriteBehind")
+
+Key = Tuple[str, str]  # (type_: "likes" | "dislikes", track_id)
+
+
+class LibraryWriteBehind:
+    """
+    Очередь отложенной записи лайков и дизлайков одной сессии (одного токена).
+
+    Локальные множества обновляются сразу, а в апстрим изменения уходят пачкой через `delay` секунд:
+    - переключения одного трека схлопываются (лайк -> анлайк = ничего не отправляем);
+    - несколько ID одного типа уходят одним запросом add-multiple / remove;
+    - при ошибке вызывается `on_rollback(type_, track_id, state)` с состоянием, которое есть в апстриме.
+    Таймер отправки запускается через `spawn` (в сессии — её TaskGroup, вид "library_flush").
+    Если отправку отменили (закрытие группы), неотправленные ID возвращаются в очередь и уходят в close().
+    """
+
+    def __init__(self, api_client, on_rollback: Callable[[str, str, bool], Awaitable[None]], delay: float = 0.5,
+                 spawn: Spawn = spawn_unsupervised):
+        self.api_client = api_client
+        self.on_rollback = on_rollback
+        self.delay = delay
+        self.spawn = spawn
+        self.closed = False
+        self._pending: Dict[Key, bool] = {}     # желаемое состояние
+        self._base: Dict[Key, bool] = {}        # состояние в апстриме до первого переключения
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def toggle(self, type_: str, track_id: str, desired: bool, previous: bool):
+        key = (type_, track_id)
+        base = self._base.setdefault(key, previous)
+        if desired == base:
+            self._pending.pop(key, None)
+            self._base.pop(key, None)
+        else:
+            self._pending[key] = desired
+
+        if self._pending and not self.closed and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = self.spawn("library_flush", self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.delay)
+        await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, bases = self._pending, self._base
+            self._pending, self._base = {}, {}
+
+            groups: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+            for (type_, tid), desired in batch.items():
+                groups[(type_, "add-multiple" if desired else "remove")].append(tid)
+
+            unsent = list(groups.items())
+            try:
+                while unsent:
+                    (type_, action), ids = unsent[0]
+                    ok = await self.api_client.library_action(ids, action, type_)
+                    unsent.pop(0)
+                    if ok:
+                        continue
+                    logger.warning(f"Write-behind {type_}/{action} failed for {len(ids)} tracks, rolling back")
+                    for tid in ids:
+                        await self._rollback((type_, tid), bases[(type_, tid)])
+            except asyncio.CancelledError:
+                # запрос в полёте мог и дойти: повтор add-multiple/remove безвреден, а потерять изменение — нет
+                for (type_, _), ids in unsent:
+                    for tid in ids:
+                        self._requeue((type_, tid), batch[(type_, tid)], bases[(type_, tid)])
+                raise
+
+        # переключения, пришедшие во время запроса: таймер нужен и тогда, когда flush идёт из самого таймера
+        if self._pending and not self.closed and (self._flush_task is None or self._flush_task.done()
+                                                  or self._flush_task is asyncio.current_task()):
+            self._flush_task = self.spawn("library_flush", self._delayed_flush())
+
+    def _requeue(self, key: Key, desired: bool, upstream_state: bool):
+        if key in self._pending:
+            self._settle(key, upstream_state)
+        else:
+            self._pending[key], self._base[key] = desired, upstream_state
+
+    def _settle(self, key: Key, upstream_state: bool):
+        """Трек переключили ещё раз, пока шёл запрос: пересчитываем базу по состоянию в апстриме."""
+        if self._pending[key] == upstream_state:
+            del self._pending[key]
+            self._base.pop(key, None)
+        else:
+            self._base[key] = upstream_state
+
+    async def _rollback(self, key: Key, upstream_state: bool):
+        if key in self._pending:
+            # локальное множество уже в желаемом состоянии, откатывать его не нужно
+            self._settle(key, upstream_state)
+            return
+        try:
+            await self.on_rollback(key[0], key[1], upstream_state)
+        except Exception as e:
+            logger.error(f"Rollback callback failed: {e}")
+
+    async def close(self):
+        """Останавливает таймер и отправляет всё накопленное сразу."""
+        self.closed = True
+        task = self._flush_task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
@@ -1,24 +1,54 @@
+import os
+import time
+import asyncio
 import logging
 import aiohttp
-from typing import List, Optional
+from urllib.parse import urlsplit
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+from scheduler import Priority, RequestScheduler, get_scheduler
+from http_cache import CACHE_REQUESTS, CachedResponse, HttpCache, RecordingResponse, get_http_cache
+from utils.json_stream import JSONArrayStream, iter_array_items
+from metrics import Histogram
+from accounting import RateWindow
 
 
 logger = logging.getLogger("YandexMusicAPI")
 
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "ym_api_upstream_request_seconds",
+    "Yandex Music REST latency until response headers, by endpoint template",
+    labelnames=("method", "endpoint", "status"),
+)
+
+
+def endpoint_label(url: str) -> str:
+    """Шаблон пути для метрик: сегменты с цифрами (uid, ID) заменяются на {id}, чтобы не плодить серии."""
+    parts = urlsplit(url).path.strip("/").split("/")
+    return "/" + "/".join("{id}" if any(c.isdigit() for c in part) else part for part in parts)
+
 
 class YandexMusicAPI:
-    BASE_URL = "https://api.music.yandex.net"
+    # переопределяется для стенда (см. fakes/rest.py), например YM_API_REST_URL=http://127.0.0.1:8766
+    BASE_URL = os.getenv("YM_API_REST_URL", "https://api.music.yandex.net").rstrip("/")
     HEADERS = {
         "X-Yandex-Music-Client": "YandexMusicAndroid/24023621",
         "User-Agent": "Yandex-Music-API",
     }
+    STREAM_CHUNK_SIZE = 64 * 1024
 
-    def __init__(self, token: str):
+    def __init__(self, token: str, scheduler: Optional[RequestScheduler] = None, cache: Optional[HttpCache] = None,
+                 base_url: Optional[str] = None):
         self.token = token
+        if base_url:
+            self.BASE_URL = base_url.rstrip("/")
         self.uid: Optional[str] = None
         self._session: Optional[aiohttp.ClientSession] = None
+        self.scheduler = scheduler or get_scheduler()
+        self.cache = cache or get_http_cache()
+        self.request_rate = RateWindow()  # запросы, реально ушедшие в апстрим (без ответов из кэша)
 
-    async def init(self):
+    async def init(self, priority: Priority = Priority.BACKGROUND):
         """Инициализирует сессию клиента и получает ID пользователя."""
         timeout = aiohttp.ClientTimeout(total=10)
         self._session = aiohttp.ClientSession(
@@ -28,20 +58,78 @@ class YandexMusicAPI:
             },
             timeout=timeout
         )
-        await self._fetch_uid()
+        await self._fetch_uid(priority)
 
     async def close(self):
         if self._session:
             await self._session.close()
 
-    async def _fetch_uid(self):
+    @asynccontextmanager
+    async def _request(self, method: str, url: str, priority: Priority = Priority.BACKGROUND,
+                       stream: bool = False, **kwargs):
+        """
+        Выполняет запрос через глобальный планировщик (приоритеты, лимиты на токен).
+        Для эндпоинтов с правилом кэширования отдаёт свежий ответ с диска без сети,
+        а устаревший перепроверяет условным запросом.
+        stream=True — тело будут читать потоком: слот берётся из пула потоков планировщика.
+        """
+        pattern = self.cache.rule_for(url) if self.cache else None
+        if pattern is None:
+            async with self.scheduler.slot(self.token, priority, stream):
+                started = time.monotonic()
+                async with self._session.request(method, url, **kwargs) as resp:
+                    self._observe(method, url, resp.status, started)
+                    yield resp
+            return
+
+        key = self.cache.key(pattern, self.token, method, url, kwargs.get("data"))
+        entry = await asyncio.to_thread(self.cache.get, key)
+        if entry and entry.is_fresh(self.cache.rules[pattern].ttl):
+            CACHE_REQUESTS.inc(endpoint=pattern, outcome="hit")
+            yield CachedResponse(entry, self.cache.body_path(key))
+            return
+
+        headers = {**kwargs.pop("headers", {}), **(entry.conditional_headers() if entry else {})}
+        async with self.scheduler.slot(self.token, priority, stream):
+            started = time.monotonic()
+            async with self._session.request(method, url, headers=headers, **kwargs) as resp:
+                self._observe(method, url, resp.status, started)
+                if resp.status == 304 and entry:
+                    CACHE_REQUESTS.inc(endpoint=pattern, outcome="revalidated")
+                    await asyncio.to_thread(self.cache.touch, key, entry)
+                    yield CachedResponse(entry, self.cache.body_path(key))
+                    return
+
+                CACHE_REQUESTS.inc(endpoint=pattern, outcome="miss")
+                if resp.status != 200:
+                    yield resp
+                    return
+
+                recording = RecordingResponse(resp, await asyncio.to_thread(self.cache.writer, key, resp))
+                try:
+                    yield recording
+                finally:
+                    await recording.finish()
+
+    def _observe(self, method: str, url: str, status: int, started: float):
+        self.request_rate.hit()
+        UPSTREAM_REQUEST_SECONDS.observe(time.monotonic() - started, method=method, endpoint=endpoint_label(url), status=status)
+
+    async def _invalidate_library(self, type_: str):
+        url = f"{self.BASE_URL}/users/{self.uid}/{type_}/tracks"
+        pattern = self.cache.rule_for(url) if self.cache else None
+        if pattern:
+            await asyncio.to_thread(self.cache.invalidate, self.cache.key(pattern, self.token, "GET", url))
+
+    async def _fetch_uid(self, priority: Priority = Priority.BACKGROUND):
         """Получает ID пользователя из статуса аккаунта."""
         try:
-            async with self._session.get(f"{self.BASE_URL}/account/status") as resp:
+            async with self._request("GET", f"{self.BASE_URL}/account/status", priority) as resp:
                 logger.info(f"Account Status Check: {resp.status}")
                 if resp.status == 200:
                     data = await self._safe_json(resp)
-                    self.uid = str(data.get("account", {}).get("uid"))
+                    uid = data.get("account", {}).get("uid")
+                    self.uid = str(uid) if uid is not None else None  # не "None": иначе токен без аккаунта сойдёт за валидный
                 else:
                     logger.error(f"Failed to fetch account status: {resp.status}")
                     if resp.status == 401:
@@ -62,64 +150,67 @@ class YandexMusicAPI:
             logger.error(f"JSON Parse Error: {e}")
             return {}
 
-    async def get_liked_tracks(self) -> List[str]:
-        if not self.uid: return []
+    async def iter_library_track_ids(self, type_: str = "likes") -> AsyncIterator[str]:
+        """
+        Потоково читает библиотеку (likes/dislikes) и отдаёт ID треков по одному.
+        Полное JSON-дерево ответа не строится: тело разбирается по мере получения чанков.
+        Ошибка запроса или оборванное тело — ConnectionError: уже отданные ID тогда неполны.
+        """
+        if not self.uid: return
+        url = f"{self.BASE_URL}/users/{self.uid}/{type_}/tracks"
+        stream = JSONArrayStream(("library", "tracks"))
         try:
-            url = f"{self.BASE_URL}/users/{self.uid}/likes/tracks"
-            async with self._session.get(url) as resp:
-                if resp.status == 200:
-                    data = await self._safe_json(resp)
-                    tracks = data.get("library", {}).get("tracks", []) if isinstance(data, dict) else []
-                    return [str(track.get("id")) for track in tracks if track.get("id")]
-                return []
+            async with self._request("GET", url, Priority.BACKGROUND, stream=True) as resp:
+                if resp.status != 200:
+                    raise ConnectionError(f"HTTP {resp.status}")
+                async for track in iter_array_items(resp.content.iter_chunked(self.STREAM_CHUNK_SIZE), (), stream):
+                    if isinstance(track, dict) and track.get("id"):
+                        yield str(track["id"])
+            if not stream.done:
+                raise ConnectionError("body ended before the end of the document")
         except Exception as e:
-            logger.error(f"Error fetching liked tracks: {e}")
-            return []
+            logger.error(f"Error streaming {type_} tracks: {e}")
+            raise ConnectionError(f"{type_} not loaded: {e}") from e
+
+    async def get_liked_tracks(self) -> List[str]:
+        return [tid async for tid in self.iter_library_track_ids("likes")]
 
     async def get_disliked_tracks(self) -> List[str]:
-        if not self.uid: return []
-        try:
-            url = f"{self.BASE_URL}/users/{self.uid}/dislikes/tracks"
-            async with self._session.get(url) as resp:
-                if resp.status == 200:
-                    data = await self._safe_json(resp)
-                    tracks = data.get("library", {}).get("tracks", []) if isinstance(data, dict) else []
-                    return [str(track.get("id")) for track in tracks if track.get("id")]
-                return []
-        except Exception as e:
-            logger.error(f"Error fetching disliked tracks: {e}")
-            return []
+        return [tid async for tid in self.iter_library_track_ids("dislikes")]
 
-    async def _like_action(self, track_id: str, action: str, type_: str = "likes") -> bool:
-        if not self.uid: return False
+    async def library_action(self, track_ids: List[str], action: str, type_: str = "likes") -> bool:
+        """Добавляет (add-multiple) или удаляет (remove) пачку треков в likes/dislikes одним запросом."""
+        if not self.uid or not track_ids: return False
         try:
             url = f"{self.BASE_URL}/users/{self.uid}/{type_}/tracks/{action}"
-            data = {f"track-ids": str(track_id)}
-            async with self._session.post(url, data=data) as resp:
-                logger.info(f"Action {type_}/{action} Status: {resp.status}")
+            data = {"track-ids": ",".join(map(str, track_ids))}
+            async with self._request("POST", url, Priority.INTERACTIVE, data=data) as resp:
+                logger.info(f"Action {type_}/{action} Status: {resp.status} for {len(track_ids)} IDs")
+                if resp.status == 200:
+                    await self._invalidate_library(type_)
                 return resp.status == 200
         except Exception as e:
             logger.error(f"Error performing {type_}/{action}: {e}")
             return False
 
     async def like_track(self, track_id: str) -> bool:
-        return await self._like_action(track_id, "add-multiple", "likes")
+        return await self.library_action([track_id], "add-multiple", "likes")
 
     async def unlike_track(self, track_id: str) -> bool:
-        return await self._like_action(track_id, "remove", "likes")
+        return await self.library_action([track_id], "remove", "likes")
 
     async def dislike_track(self, track_id: str) -> bool:
-        return await self._like_action(track_id, "add-multiple", "dislikes")
+        return await self.library_action([track_id], "add-multiple", "dislikes")
 
     async def undislike_track(self, track_id: str) -> bool:
-        return await self._like_action(track_id, "remove", "dislikes")
+        return await self.library_action([track_id], "remove", "dislikes")
 
-    async def get_track(self, track_id: str) -> Optional[dict]:
+    async def get_track(self, track_id: str, priority: Priority = Priority.ENRICHMENT) -> Optional[dict]:
         """Получает подробную информацию об одном треке."""
-        tracks = await self.get_tracks([track_id])
+        tracks = await self.get_tracks([track_id], priority)
         return tracks[0] if tracks else None
 
-    async def get_tracks(self, track_ids: List[str]) -> List[dict]:
+    async def get_tracks(self, track_ids: List[str], priority: Priority = Priority.ENRICHMENT) -> List[dict]:
         """Получает подробную информацию о нескольких треках (POST-запрос, как в оригинальной библиотеке)."""
         if not track_ids: return []
         try:
@@ -127,7 +218,7 @@ class YandexMusicAPI:
             ids_str = ",".join(map(str, track_ids))
             data = {"track-ids": ids_str}
             
-            async with self._session.post(url, data=data) as resp:
+            async with self._request("POST", url, priority, data=data) as resp:
                 logger.info(f"Get Tracks API Status: {resp.status} for {len(track_ids)} IDs")
                 if resp.status == 200:
                     result = await self._safe_json(resp)
@@ -144,3 +235,29 @@ class YandexMusicAPI:
         except Exception as e:
             logger.error(f"Error fetching tracks: {e}")
             return []
+
+    async def get_album_with_tracks(self, album_id: str, priority: Priority = Priority.ENRICHMENT) -> Optional[dict]:
+        """Альбом вместе со списком треков (volumes — список дисков)."""
+        try:
+            async with self._request("GET", f"{self.BASE_URL}/albums/{album_id}/with-tracks", priority) as resp:
+                if resp.status != 200:
+                    logger.error(f"Get Album {album_id} failed with status {resp.status}")
+                    return None
+                result = await self._safe_json(resp)
+                return result if isinstance(result, dict) else None
+        except Exception as e:
+            logger.error(f"Error fetching album {album_id}: {e}")
+            return None
+
+    async def get_playlist(self, owner: str, kind: str, priority: Priority = Priority.ENRICHMENT) -> Optional[dict]:
+        """Плейлист пользователя `owner` вместе с треками."""
+        try:
+            async with self._request("GET", f"{self.BASE_URL}/users/{owner}/playlists/{kind}", priority) as resp:
+                if resp.status != 200:
+                    logger.error(f"Get Playlist {owner}:{kind} failed with status {resp.status}")
+                    return None
+                result = await self._safe_json(resp)
+                return result if isinstance(result, dict) else None
+        except Exception as e:
+            logger.error(f"Error fetching playlist {owner}:{kind}: {e}")
+            return None
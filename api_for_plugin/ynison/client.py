@@ -1,10 +1,12 @@
 import ssl
 import json
+import asyncio
 import socket
 import logging
 import aiohttp
 from aiohttp import TCPConnector
 from utils.auth import AuthStorage
+from ynison.recording import FrameRecorder
 from typing import Optional, Callable, Awaitable
 
 
@@ -12,8 +14,9 @@ logger = logging.getLogger(__name__)
 
 
 class YnisonWebSocket:
-    def __init__(self, storage: AuthStorage):
+    def __init__(self, storage: AuthStorage, recorder: Optional[FrameRecorder] = None):
         self.storage = storage
+        self.recorder = recorder  # пишет входящие кадры для replay.py (YM_API_RECORD_DIR)
         self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
         self._session: Optional[aiohttp.ClientSession] = None
         self._running = False
@@ -97,12 +100,16 @@ class YnisonWebSocket:
         try:
             async for msg in self._ws:
                 if msg.type == aiohttp.WSMsgType.TEXT:
+                    if self.recorder:
+                        self.recorder.write(msg.data)
                     if self.on_receive:
                         await self.on_receive(msg.data)
                 elif msg.type == aiohttp.WSMsgType.ERROR:
                     logger.error('ws connection closed with exception %s', self._ws.exception())
         finally:
             self._running = False
+            if self.recorder:
+                await asyncio.to_thread(self.recorder.close)
             if self.on_close:
                 close_message = getattr(self._ws, 'close_message', "")
                 await self.on_close(self._ws.close_code or 1000, close_message)
@@ -113,6 +120,8 @@ class YnisonWebSocket:
 
     async def close(self):
         self._running = False
+        if self.recorder:
+            await asyncio.to_thread(self.recorder.close)
         if self._ws:
             await self._ws.close()
         if self._session:
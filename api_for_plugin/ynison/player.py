@@ -1,26 +1,55 @@
+import os
 import json
 import time
 import uuid
 import logging
 import asyncio
+import aiohttp
+from metrics import Histogram
 from utils.auth import AuthStorage
 from ynison.client import YnisonWebSocket
+from ynison.recording import FrameRecorder
 from ynison.models.common import YnisonVersion
-from typing import Optional, Callable, Awaitable
+from typing import Dict, Optional, Callable, Awaitable, Union
 from ynison.models.redirect import YnisonRedirect
 from ynison.models.state import YnisonState
-from ynison.models.messages import YnisonFullState
+from ynison.models.messages import YnisonFullState, YnisonUpdateFullStateMessage
 from ynison.models.player_state import YnisonPlayerState
 from ynison.models.device import YnisonDeviceFull, YnisonDevice
 
 
 logger = logging.getLogger(__name__)
 
+# адрес Ynison переопределяется для стенда (см. fakes/ynison.py), например YM_API_YNISON_URL=ws://127.0.0.1:8765
+YNISON_URL = os.getenv("YM_API_YNISON_URL", "wss://ynison.music.yandex.ru")
+REDIRECT_PATH = "/redirector.YnisonRedirectService/GetRedirectToYnison"
+STATE_PATH = "/ynison_state.YnisonStateService/PutYnisonState"
+
+YNISON_MESSAGE_BYTES = Histogram(
+    "ym_api_ynison_message_bytes",
+    "Size (in characters) of messages received on the Ynison state socket",
+    labelnames=("kind",),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+YNISON_PARSE_SECONDS = Histogram(
+    "ym_api_ynison_parse_seconds",
+    "Time to parse a Ynison message into the state models",
+    labelnames=("kind",),
+)
+ONE_OFF_PHASE_SECONDS = Histogram(
+    "ym_api_one_off_phase_seconds",
+    "One-off command latency by phase: redirect, tls (state socket handshake), send, ack",
+    labelnames=("phase",),
+)
+
 
 class YnisonPlayer:
     def __init__(self, storage: AuthStorage, device_info: Optional[dict] = None, 
-                 capabilities: Optional[dict] = None, is_shadow: bool = True):
+                 capabilities: Optional[dict] = None, is_shadow: bool = True, base_url: Optional[str] = None,
+                 volume_before_mute: Optional[Dict[str, float]] = None):
+        """volume_before_mute — память mute по устройствам; сессия передаёт свою, чтобы она пережила переподключение."""
         self.storage = storage
+        self.base_url = (base_url or YNISON_URL).rstrip("/")
         self.redirector = YnisonWebSocket(storage)
         self.is_shadow = is_shadow
         self.device_info = device_info or {
@@ -34,11 +63,13 @@ class YnisonPlayer:
             "can_be_remote_controller": True,
             "volume_granularity": 16
         }
-        self.state_socket = YnisonWebSocket(storage)
+        self.state_socket = YnisonWebSocket(storage, recorder=FrameRecorder.from_env(storage.token, storage.device_id))
         self.state: Optional[YnisonState] = None
         self._last_state_data: Optional[dict] = None
         self._current_track = None
         self._last_update_time = 0
+        self._volume_before_mute: Dict[str, float] = volume_before_mute if volume_before_mute is not None else {}
+        self._receive_task: Optional[asyncio.Task] = None  # ссылка держит задачу приёма от сборщика мусора
         
 
         
@@ -74,12 +105,20 @@ class YnisonPlayer:
         )
         return full_state.model_dump_json(exclude_none=True, by_alias=True)
 
+    @property
+    def redirect_url(self) -> str:
+        return f"{self.base_url}{REDIRECT_PATH}"
+
+    def _state_url(self, redirect: YnisonRedirect) -> str:
+        """URL сокета стейта на хосте из редиректа; схема (ws/wss) берётся из base_url."""
+        scheme = "ws" if self.base_url.startswith("ws://") else "wss"
+        clean_host = redirect.host.split("://", 1)[-1].strip("/")
+        return f"{scheme}://{clean_host}{STATE_PATH}"
+
     async def connect(self):
-        REDIRECT_URL = "wss://ynison.music.yandex.ru/redirector.YnisonRedirectService/GetRedirectToYnison"
+        logger.info(f"Connecting to Redirector: {self.redirect_url}")
         
-        logger.info(f"Connecting to Redirector: {REDIRECT_URL}")
-        
-        if not await self.redirector.connect(REDIRECT_URL):
+        if not await self.redirector.connect(self.redirect_url):
             raise Exception("Failed to connect to Redirector service")
 
         try:
@@ -106,15 +145,14 @@ class YnisonPlayer:
 
         logger.info(f"Redirect received. Host: {redirect.host}")
 
-        clean_host = redirect.host.replace("wss://", "").replace("https://", "").strip("/")
-        state_url = f"wss://{clean_host}/ynison_state.YnisonStateService/PutYnisonState"
+        state_url = self._state_url(redirect)
 
         logger.info(f"Connecting to State Socket: {state_url}")
 
 
         if await self.state_socket.connect(state_url, redirect_ticket=redirect.redirect_ticket, session_id=redirect.session_id):
             logger.info("✅ State Socket Connected! Starting receiver...")
-            asyncio.create_task(self.state_socket.begin_receive())
+            self._receive_task = asyncio.create_task(self.state_socket.begin_receive())
             
             logger.info("Sending initial state...")
             payload = self._default_state()
@@ -133,9 +171,11 @@ class YnisonPlayer:
         await self.state_socket.stop_receive()
         await self.redirector.stop_receive()
 
-    async def _send_one_off_command(self, payload: dict):
+    async def _send_one_off_command(self, payload: Union[dict, str]) -> bool:
         """
         Отправляет команду через временное подключение со случайным Device ID, для избежания ошибок 1006.
+        payload может быть уже сериализованной строкой (см. presets.Preset.build_payload).
+        Возвращает True, если payload был отправлен.
         """
         temp_device_id = str(uuid.uuid4())
         temp_storage = AuthStorage(token=self.storage.token, device_id=temp_device_id)
@@ -146,32 +186,49 @@ class YnisonPlayer:
         try:
             logger.info(f"Initiating One-Off Command Connection (Device ID: {temp_device_id})")
             
-            REDIRECT_URL = "wss://ynison.music.yandex.ru/redirector.YnisonRedirectService/GetRedirectToYnison"
-            if not await temp_redirector.connect(REDIRECT_URL):
+            started = time.monotonic()
+            if not await temp_redirector.connect(self.redirect_url):
                 logger.error("One-Off: Failed to connect to redirector")
-                return
+                return False
 
             response_data = await temp_redirector._ws.receive_str()
             redirect = YnisonRedirect.model_validate_json(response_data)
+            started = self._phase("redirect", started)
             
-            clean_host = redirect.host.replace("wss://", "").replace("https://", "").strip("/")
-            state_url = f"wss://{clean_host}/ynison_state.YnisonStateService/PutYnisonState"
+            state_url = self._state_url(redirect)
             
             if await temp_state_socket.connect(state_url, redirect_ticket=redirect.redirect_ticket, session_id=redirect.session_id):
+                 started = self._phase("tls", started)
                  logger.info("One-Off: Connected to State Socket. Sending payload...")
-                 await temp_state_socket.send(json.dumps(payload))
+                 await temp_state_socket.send(payload if isinstance(payload, str) else json.dumps(payload))
+                 started = self._phase("send", started)
                  
-                 await asyncio.sleep(0.5) 
+                 # ответ сервера на наш payload означает, что команда принята; без него ждём как раньше 0.5 с
+                 try:
+                     msg = await temp_state_socket._ws.receive(timeout=0.5)
+                     if msg.type == aiohttp.WSMsgType.TEXT:
+                         self._phase("ack", started)
+                 except asyncio.TimeoutError:
+                     pass
                  logger.info("One-Off: Payload sent.")
+                 return True
             else:
                  logger.error("One-Off: Failed to connect to state socket")
+                 return False
 
         except Exception as e:
             logger.error(f"One-Off Command Failed: {e}")
+            return False
         finally:
             await temp_state_socket.close()
             await temp_redirector.close()
 
+    @staticmethod
+    def _phase(phase: str, started: float) -> float:
+        now = time.monotonic()
+        ONE_OFF_PHASE_SECONDS.observe(now - started, phase=phase)
+        return now
+
     def _update_current_track(self):
         """
         Обновляет атрибут _current_track на основе текущего состояния.
@@ -191,10 +248,12 @@ class YnisonPlayer:
 
     async def _process_ws_message(self, message: str):
         try:
+            parse_started = time.monotonic()
             data = json.loads(message)
             self._last_update_time = time.time()
 
             if 'update_full_state' in data:
+                YNISON_MESSAGE_BYTES.observe(len(message), kind="full_state")
                 try:
                     full_msg = YnisonUpdateFullStateMessage(**data)
                     full = full_msg.update_full_state
@@ -231,6 +290,8 @@ class YnisonPlayer:
                             self.state.timestamp_ms = full_msg.player_action_timestamp_ms
                             
                     self._update_current_track()
+                    self._apply_mute_flags()
+                    YNISON_PARSE_SECONDS.observe(time.monotonic() - parse_started, kind="full_state")
                     
                     if self.on_receive:
                         await self.on_receive(self.state)
@@ -239,6 +300,7 @@ class YnisonPlayer:
                     logger.error(f"Failed to process update_full_state: {e}", exc_info=True)
 
             elif 'player_state' in data:
+                 YNISON_MESSAGE_BYTES.observe(len(message), kind="player_state")
                  try:
                      try:
                          self.state = YnisonState(**data)
@@ -251,6 +313,8 @@ class YnisonPlayer:
                      
                      if self.state:
                          self._update_current_track()
+                         self._apply_mute_flags()
+                         YNISON_PARSE_SECONDS.observe(time.monotonic() - parse_started, kind="player_state")
                          if self.on_receive:
                              await self.on_receive(self.state)
                              
@@ -268,42 +332,11 @@ class YnisonPlayer:
         return self._current_track
 
 
-    async def toggle_play_pause(self):
-        if not self.state or not self.state.player_state:
-            return
-        
-        st = self.state.player_state.status
-        is_pausing = not st.paused
-        
-        new_progress = self.calculate_current_progress() if is_pausing else st.progress_ms
-        
-        
-        pq = self.state.player_state.player_queue
-        
-        current_ts = time.time_ns()
-        temp_device_id = str(uuid.uuid4())
-        
-        def build_version():
-            return {
-                "device_id": temp_device_id,
-                "version": current_ts,
-                "timestamp_ms": 0
-            }
-
-        version_obj = build_version()
-
-        status_payload = {
-            "duration_ms": st.duration_ms,
-            "progress_ms": new_progress,
-            "paused": True if is_pausing else False,
-            "playback_speed": st.playback_speed,
-            "version": version_obj
-        }
-        
-        queue_payload = {
+    def _build_queue_payload(self, pq, index: int, version: dict) -> dict:
+        return {
              "entity_id": pq.entity_id,
              "entity_type": pq.entity_type,
-             "current_playable_index": pq.current_playable_index,
+             "current_playable_index": index,
              "playable_list": [
                 {
                     "album_id_optional": item.album_id_optional,
@@ -323,13 +356,71 @@ class YnisonPlayer:
              "initial_entity_optional": None,
              "adding_options_optional": None,
              "queue": pq.queue.dict() if pq.queue else None,
-             "version": version_obj
+             "version": version
+        }
+
+    async def transport(self, offset: int = 0, skip: bool = False, toggle: bool = False,
+                        position_ms: Optional[int] = None) -> bool:
+        """
+        Одной командой update_player_state сдвигает трек на `offset` и/или переключает паузу.
+
+        skip   — был переход по очереди (next/prev): трек начинается с нуля и играет;
+        toggle — после этого (или без перехода) пауза переключается ещё раз;
+        position_ms — с какой позиции играть (для макросов вроде "restart" или "next + seek").
+        Так склеенная пачка нажатий next/prev/play_pause превращается в один запрос.
+        После успешной отправки локальный стейт обновляется оптимистично, чтобы
+        следующие команды считались от нового индекса, а не от устаревшего.
+        """
+        if not self.state or not self.state.player_state:
+            return False
+
+        st = self.state.player_state.status
+        pq = self.state.player_state.player_queue
+
+        if not pq.playable_list:
+            return False
+        # пачка next длиннее остатка очереди упирается в последний трек, а не уходит за край
+        new_index = min(max(pq.current_playable_index + offset, 0), len(pq.playable_list) - 1)
+
+        paused = False if skip else st.paused
+        if toggle:
+            paused = not paused
+        if not skip and paused == st.paused and position_ms is None:
+            return True
+
+        if skip:
+            duration_ms, progress_ms = 0, 0
+        elif paused:
+            duration_ms, progress_ms = st.duration_ms, self.calculate_current_progress()
+        else:
+            duration_ms, progress_ms = st.duration_ms, st.progress_ms
+        if position_ms is not None:
+            progress_ms = max(0, int(position_ms))
+            if duration_ms:
+                progress_ms = min(progress_ms, duration_ms)
+
+        current_ts = time.time_ns()
+        temp_device_id = str(uuid.uuid4())
+        
+        def build_version():
+            return {
+                "device_id": temp_device_id,
+                "version": current_ts,
+                "timestamp_ms": 0
+            }
+
+        status_payload = {
+            "duration_ms": duration_ms,
+            "progress_ms": progress_ms,
+            "paused": paused,
+            "playback_speed": 1 if skip else st.playback_speed,
+            "version": build_version()
         }
 
         payload_dict = {
             "update_player_state": {
                 "player_state": {
-                    "player_queue": queue_payload,
+                    "player_queue": self._build_queue_payload(pq, new_index, build_version()),
                     "status": status_payload
                 }
             },
@@ -337,7 +428,157 @@ class YnisonPlayer:
             "activity_interception_type": "DO_NOT_INTERCEPT_BY_DEFAULT" 
         }
             
-        await self._send_one_off_command(payload_dict)
+        if not await self._send_one_off_command(payload_dict):
+            return False
+
+        pq.current_playable_index = new_index
+        st.paused = paused
+        st.progress_ms = progress_ms
+        self._last_update_time = time.time()
+        self._update_current_track()
+        return True
+
+    def active_device(self) -> Optional[YnisonDeviceFull]:
+        """Устройство, на котором сейчас идёт воспроизведение (или первый живой плеер, если Ynison его не указал)."""
+        if not self.state or not self.state.devices:
+            return None
+        active_id = (self.state.model_extra or {}).get("active_device_id_optional")
+        fallback = None
+        for dev in self.state.devices:
+            if active_id and dev.info.device_id == active_id:
+                return dev
+            if fallback is None and dev.capabilities.can_be_player and not dev.is_offline \
+                    and dev.info.device_id != self.storage.device_id:
+                fallback = dev
+        return fallback
+
+    async def set_volume(self, volume: float, device: Optional[YnisonDeviceFull] = None) -> bool:
+        """
+        Выставляет абсолютную громкость (0..1) устройству, квантуя её по volume_granularity.
+        После отправки громкость в локальном стейте обновляется сразу.
+        """
+        device = device or self.active_device()
+        if device is None:
+            logger.warning("No active device to set volume on")
+            return False
+
+        granularity = device.capabilities.volume_granularity
+        volume = min(1.0, max(0.0, volume))
+        if granularity > 0:
+            volume = round(volume * granularity) / granularity
+
+        current_ts = time.time_ns()
+        payload_dict = {
+            "update_volume_info": {
+                "device_id": device.info.device_id,
+                "volume_info": {
+                    "volume": volume,
+                    "version": {
+                        "device_id": str(uuid.uuid4()),
+                        "version": current_ts,
+                        "timestamp_ms": 0
+                    }
+                }
+            },
+            "rid": str(uuid.uuid4()),
+            "player_action_timestamp_ms": current_ts,
+            "activity_interception_type": "DO_NOT_INTERCEPT_BY_DEFAULT"
+        }
+
+        if not await self._send_one_off_command(payload_dict):
+            return False
+
+        device.volume = volume
+        device.volume_info.volume = volume
+        self._apply_mute_flags()
+        return True
+
+    def _apply_mute_flags(self):
+        """
+        У Ynison нет отдельного mute, поэтому помечаем устройства флагом volume_info.is_muted.
+        Если громкость замьюченного устройства поменяли с другого клиента — mute снимаем.
+        """
+        if not self.state:
+            return
+        for dev in self.state.devices:
+            device_id = dev.info.device_id
+            if device_id in self._volume_before_mute and dev.volume > 0:
+                del self._volume_before_mute[device_id]
+            setattr(dev.volume_info, "is_muted", device_id in self._volume_before_mute)
+
+    async def change_volume(self, steps: int = 0, toggle_mute: bool = False) -> bool:
+        """
+        Применяет склеенную пачку volume_up/volume_down/mute одной абсолютной целью.
+
+        steps — сколько делений volume_granularity прибавить (отрицательное — убавить);
+        шаг громкости снимает mute и считается от громкости до mute.
+        toggle_mute — после шагов переключить mute: запоминаем громкость и ставим 0, либо возвращаем её.
+        """
+        device = self.active_device()
+        if device is None:
+            logger.warning("No active device to change volume on")
+            return False
+
+        device_id = device.info.device_id
+        granularity = device.capabilities.volume_granularity or 16
+        target = device.volume
+        muted_before = dict(self._volume_before_mute)
+
+        if steps:
+            target = self._volume_before_mute.pop(device_id, target) + steps / granularity
+        if toggle_mute:
+            if device_id in self._volume_before_mute:
+                target = self._volume_before_mute.pop(device_id)
+            else:
+                self._volume_before_mute[device_id] = target
+                target = 0.0
+
+        if not await self.set_volume(target, device):
+            # на месте, а не присваиванием: словарь принадлежит сессии
+            self._volume_before_mute.clear()
+            self._volume_before_mute.update(muted_before)
+            return False
+        return True
+
+    async def seek(self, position_ms: int) -> bool:
+        """Перематывает текущий трек на абсолютную позицию одним update_playing_status."""
+        if not self.state or not self.state.player_state:
+            return False
+
+        st = self.state.player_state.status
+        position_ms = max(0, int(position_ms))
+        if st.duration_ms:
+            position_ms = min(position_ms, st.duration_ms)
+
+        current_ts = time.time_ns()
+        payload_dict = {
+            "update_playing_status": {
+                "playing_status": {
+                    "duration_ms": st.duration_ms,
+                    "progress_ms": position_ms,
+                    "paused": st.paused,
+                    "playback_speed": st.playback_speed,
+                    "version": {
+                        "device_id": str(uuid.uuid4()),
+                        "version": current_ts,
+                        "timestamp_ms": 0
+                    }
+                }
+            },
+            "rid": str(uuid.uuid4()),
+            "player_action_timestamp_ms": current_ts,
+            "activity_interception_type": "DO_NOT_INTERCEPT_BY_DEFAULT"
+        }
+
+        if not await self._send_one_off_command(payload_dict):
+            return False
+
+        st.progress_ms = position_ms
+        self._last_update_time = time.time()
+        return True
+
+    async def toggle_play_pause(self):
+        return await self.transport(toggle=True)
 
     async def play_track(self, track_id: str):
         """
@@ -381,7 +622,11 @@ class YnisonPlayer:
             }
         }
 
-        await self._send_one_off_command(payload_dict)
+        return await self._send_one_off_command(payload_dict)
+
+    async def play_preset(self, preset) -> bool:
+        """Запускает заранее разрешённый пресет: очередь уже готова, отправляется одна команда."""
+        return await self._send_one_off_command(preset.build_payload())
 
     def calculate_current_progress(self) -> int:
         if not self.state or not self.state.player_state:
@@ -399,123 +644,10 @@ class YnisonPlayer:
         return max(0, val)
 
     async def next(self):
-        if not self.state or not self.state.player_state:
-            return
-        pq = self.state.player_state.player_queue
-        
-        new_index = pq.current_playable_index + 1
-        
-        if new_index >= len(pq.playable_list):
-            logger.warning("Next track index out of bounds")
-            
-        current_ts = time.time_ns()
-        temp_device_id = str(uuid.uuid4())
-        
-        def build_version():
-            return {
-                "device_id": temp_device_id,
-                "version": current_ts,
-                "timestamp_ms": 0
-            }
-
-        status_payload = {
-            "duration_ms": 0,
-            "paused": False,
-            "playback_speed": 1,
-            "progress_ms": 0,
-            "version": build_version()
-        }
-        
-        queue_payload = {
-             "entity_id": pq.entity_id,
-             "entity_type": pq.entity_type,
-             "current_playable_index": new_index,
-             "playable_list": [
-                {
-                    "album_id_optional": item.album_id_optional,
-                    "from": item.from_,
-                    "playable_id": item.playable_id,
-                    "playable_type": item.playable_type,
-                    "title": item.title,
-                    "cover_url_optional": item.cover_url_optional,
-                    "navigation_id_optional": item.navigation_id_optional,
-                    "playback_action_id_optional": item.playback_action_id_optional
-                } for item in pq.playable_list
-             ],
-             "options": pq.options.dict(),
-             "entity_context": pq.entity_context,
-             "version": build_version()
-        }
-
-        payload_dict = {
-            "update_player_state": {
-                "player_state": {
-                    "player_queue": queue_payload,
-                    "status": status_payload
-                }
-            }
-        }
-        
-        await self._send_one_off_command(payload_dict)
+        return await self.transport(offset=1, skip=True)
 
     async def prev(self):
-        if not self.state or not self.state.player_state:
-            return
-        pq = self.state.player_state.player_queue
-        
-        new_index = pq.current_playable_index - 1
-        if new_index < 0:
-            new_index = 0
-            
-        current_ts = time.time_ns()
-        temp_device_id = str(uuid.uuid4())
-        
-        def build_version():
-            return {
-                "device_id": temp_device_id,
-                "version": current_ts,
-                "timestamp_ms": 0
-            }
-
-        status_payload = {
-            "duration_ms": 0,
-            "paused": False,
-            "playback_speed": 1,
-            "progress_ms": 0,
-            "version": build_version()
-        }
-        
-        queue_payload = {
-             "entity_id": pq.entity_id,
-             "entity_type": pq.entity_type,
-             "current_playable_index": new_index,
-             "playable_list": [
-                {
-                    "album_id_optional": item.album_id_optional,
-                    "from": item.from_,
-                    "playable_id": item.playable_id,
-                    "playable_type": item.playable_type,
-                    "title": item.title,
-                    "cover_url_optional": item.cover_url_optional,
-                    "navigation_id_optional": item.navigation_id_optional,
-                    "playback_action_id_optional": item.playback_action_id_optional
-                } for item in pq.playable_list
-             ],
-             "options": pq.options.dict(),
-             "entity_context": pq.entity_context,
-             "version": build_version()
-        }
-
-        payload_dict = {
-            "update_player_state": {
-                "player_state": {
-                    "player_queue": queue_payload,
-                    "status": status_payload
-                }
-            }
-        }
-        
-        await self._send_one_off_command(payload_dict)
+        return await self.transport(offset=-1, skip=True)
 
     async def update_state(self):
         if not self.state or not self.state.player_state:
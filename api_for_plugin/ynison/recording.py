@@ -0,0 +1,157 @@
+import os
+import re
+import time
+import zlib
+import queue
+import struct
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Tuple
+from utils.private_files import open_private
+
+
+logger = logging.getLogger(__name__)
+
+# заголовок файла: магия, версия формата, флаги, unix-время начала записи
+HEADER = struct.Struct(">5sBBd")
+MAGIC = b"YNREC"
+VERSION = 1
+FLAG_ZLIB = 1
+# запись: секунды от начала записи и длина кадра в байтах UTF-8
+RECORD = struct.Struct(">dI")
+
+REDACTED = "<redacted>"
+OAUTH_RE = re.compile(r"(OAuth\s+)[\w.\-]+")
+
+
+class FrameRecorder:
+    """
+    Пишет входящие кадры Ynison в компактный файл: заголовок, затем записи "время, длина, кадр".
+
+    При compress=True поток записей сжимается одним zlib-потоком с Z_SYNC_FLUSH после каждого кадра:
+    соседние стейты почти одинаковы и жмутся в разы лучше, чем по отдельности, а файл читается
+    до последнего целого кадра, даже если процесс упал посреди записи.
+    Токен и всё, что похоже на "OAuth ...", заменяются на <redacted> до записи.
+
+    write() только ставит кадр в очередь: редактирование, сжатие и запись делает фоновый поток,
+    а не event loop. Файл (0600: в кадрах аккаунт и очередь) создаётся на первом кадре —
+    неудачное подключение не оставляет пустых записей.
+    """
+
+    def __init__(self, path: Path, compress: bool = True, secrets: Sequence[str] = ()):
+        self.path = Path(path)
+        self.compress = compress
+        self._secrets = [s for s in secrets if s]
+        self._queue: "queue.Queue[Optional[Tuple[float, str]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._started_at = time.time()
+        self._started = time.monotonic()
+        self.frames = 0
+
+    @classmethod
+    def from_env(cls, token: str, device_id: str) -> Optional["FrameRecorder"]:
+        """Рекордер для сокета стейта, если задан YM_API_RECORD_DIR; имя файла не содержит токен."""
+        directory = os.getenv("YM_API_RECORD_DIR")
+        if not directory:
+            return None
+        name = f"{hashlib.sha256(token.encode()).hexdigest()[:12]}-{int(time.time())}-{device_id[:8]}.ynrec"
+        return cls(Path(directory) / name, secrets=(token,))
+
+    def redact(self, data: str) -> str:
+        for secret in self._secrets:
+            data = data.replace(secret, REDACTED)
+        return OAUTH_RE.sub(r"\1" + REDACTED, data)
+
+    def write(self, data: str):
+        """Ставит кадр в очередь писателя; первый кадр запускает поток и создаёт файл."""
+        if self._closed:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"ynrec-{self.path.stem}", daemon=True)
+            self._thread.start()
+        self._queue.put((time.monotonic() - self._started, data))
+
+    def flush(self):
+        """Ждёт, пока все принятые кадры лягут на диск. Блокирует: из цикла — через asyncio.to_thread."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Дописывает очередь и закрывает файл. Блокирует: из цикла — через asyncio.to_thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+
+    def _open(self):
+        try:
+            self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            file = open_private(self.path)
+            file.write(HEADER.pack(MAGIC, VERSION, FLAG_ZLIB if self.compress else 0, self._started_at))
+            return file
+        except OSError as e:
+            logger.error(f"Ynison recording disabled: {e}")
+            return None
+
+    def _run(self):
+        file = self._open()
+        compressor = zlib.compressobj(6) if self.compress else None
+        while (item := self._queue.get()) is not None:
+            try:
+                if file is None:
+                    continue
+                at, data = item
+                raw = self.redact(data).encode()
+                record = RECORD.pack(at, len(raw)) + raw
+                if compressor:
+                    record = compressor.compress(record) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                file.write(record)
+                self.frames += 1
+                if self._queue.empty():
+                    file.flush()  # целые кадры на диске, даже если процесс упадёт до close()
+            except OSError as e:
+                logger.error(f"Ynison recording to {self.path} stopped: {e}")
+                file.close()
+                file = None
+            finally:
+                self._queue.task_done()
+        self._queue.task_done()
+        if file is not None:
+            try:
+                if compressor:
+                    file.write(compressor.flush())
+            finally:
+                file.close()
+            logger.info(f"Recorded {self.frames} Ynison frames to {self.path}")
+
+
+def read_frames(path: Path, chunk_size: int = 64 * 1024) -> Iterator[Tuple[float, str]]:
+    """Кадры записи по порядку: (секунды от начала записи, текст кадра). Обрезанный хвост пропускается."""
+    with open(path, "rb") as f:
+        magic, version, flags, _ = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a Ynison recording (v{VERSION})")
+        decompressor = zlib.decompressobj() if flags & FLAG_ZLIB else None
+        buffer = bytearray()
+        while chunk := f.read(chunk_size):
+            buffer += decompressor.decompress(chunk) if decompressor else chunk
+            offset = 0
+            while len(buffer) - offset >= RECORD.size:
+                at, length = RECORD.unpack_from(buffer, offset)
+                end = offset + RECORD.size + length
+                if end > len(buffer):
+                    break
+                yield at, buffer[offset + RECORD.size:end].decode()
+                offset = end
+            del buffer[:offset]
+
+
+def recording_info(path: Path) -> dict:
+    with open(path, "rb") as f:
+        _, version, flags, started_at = HEADER.unpack(f.read(HEADER.size))
+    return {"version": version, "compressed": bool(flags & FLAG_ZLIB), "started_at": started_at}
@@ -427,6 +427,24 @@
     return { success: false, error: 'Mute button unavailable' };
   }
 
+  function seekTo(ctx, sec) {
+    const duration = readProgress(ctx).total_sec;
+    let target = Math.max(0, sec);
+    if (duration > 0) target = Math.min(target, duration);
+    if (window.externalAPI && typeof window.externalAPI.setPosition === 'function') {
+      try {
+        window.externalAPI.setPosition(target);
+        return { success: true, position: target };
+      } catch (e) {}
+    }
+    const slider = resolve(ctx, 'timeline');
+    if (slider) {
+      reactSet(slider, target);
+      return { success: true, position: target };
+    }
+    return { success: false, error: 'Timeline unavailable' };
+  }
+
   function deepDiff(a, b) {
     if (a === b) return undefined;
     if (typeof a !== typeof b || a === null || b === null) return b;
@@ -557,6 +575,22 @@
       }
     }
 
+    seek(action, value) {
+      try {
+        const ctx = buildCtx();
+        switch (action) {
+          case 'SET':
+            return seekTo(ctx, value);
+          case 'BY':
+            return seekTo(ctx, readProgress(ctx).now_sec + value);
+          default:
+            return { success: false, error: 'Unknown action' };
+        }
+      } catch (e) {
+        return { success: false, error: e.toString() };
+      }
+    }
+
     startObservation() {
       if (this.observing) return;
       this.observing = true;
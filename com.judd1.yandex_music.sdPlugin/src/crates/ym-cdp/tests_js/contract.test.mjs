@@ -5,7 +5,7 @@ import { SONATA_HTML, EMPTY_HTML } from './fixtures/sonata.mjs';
 
 const METHODS = [
   'getFullState', 'playPause', 'next', 'prev',
-  'toggleLike', 'toggleDislike', 'changeVolume',
+  'toggleLike', 'toggleDislike', 'changeVolume', 'seek',
   'startObservation', 'stopObservation',
 ];
 
@@ -103,6 +103,42 @@ describe('contract: JS<->Python boundary (must hold across the refactor)', () =>
     assert.equal(r.volume, undefined);
   });
 
+  test('seek SET / BY move the timeline and return the position in seconds', () => {
+    env = mount(SONATA_HTML);
+    const slider = env.window.document.querySelector("[data-test-id='TIMECODE_SLIDER']");
+    assert.deepEqual({ ...env.ctrl.seek('SET', 90) }, { success: true, position: 90 });
+    assert.equal(slider.value, '90');
+    assert.deepEqual({ ...env.ctrl.seek('BY', -30) }, { success: true, position: 60 });
+    assert.equal(slider.value, '60');
+    assert.deepEqual(env.setCalls.slice(-2), [90, 60]);
+  });
+
+  test('seek clamps to 0..duration', () => {
+    env = mount(SONATA_HTML);
+    assert.equal(env.ctrl.seek('SET', 500).position, 240);
+    assert.equal(env.ctrl.seek('BY', -1000).position, 0);
+  });
+
+  test('seek prefers externalAPI.setPosition when present', () => {
+    const positions = [];
+    const externalAPI = {
+      getProgress: () => 100,
+      getDuration: () => 180,
+      getVolume: () => 0.5,
+      getMute: () => false,
+      setPosition: (sec) => { positions.push(sec); },
+    };
+    env = mount(SONATA_HTML, { externalAPI });
+    assert.equal(env.ctrl.seek('BY', 15).position, 115);
+    assert.equal(env.ctrl.seek('SET', 999).position, 180);
+    assert.deepEqual(positions, [115, 180]);
+  });
+
+  test('seek with an unknown action -> {success:false}', () => {
+    env = mount(SONATA_HTML);
+    assert.equal(env.ctrl.seek('JUMP', 10).success, false);
+  });
+
   test('no player surface -> {success:false, reason:BAR_NOT_FOUND}', () => {
     env = mount(EMPTY_HTML);
     const r = env.ctrl.getFullState();
@@ -8,4 +8,6 @@ from src.actions.progress import Progress
 from src.actions.volumeup import VolumeUp
 from src.actions.volumedown import VolumeDown
 from src.actions.volume_display import VolumeDisplay
-from src.actions.mute import Mute
\ No newline at end of file
+from src.actions.mute import Mute
+from src.actions.macro import Macro
+from src.actions.play_preset import PlayPreset
\ No newline at end of file
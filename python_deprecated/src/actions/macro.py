@@ -0,0 +1,105 @@
+from src.core.logger import Logger
+from src.core.types import YnisonCommand
+from src.core.registry import action_handler
+from src.core.schemas.events import KeyDownModel
+from src.actions.base import YandexMusicBaseAction
+
+
+MACRO_PRESETS = {
+    "like_next": "like, next",
+    "dislike_next": "dislike, next",
+    "restart": "seek:0",
+}
+
+# какой иконкой рисовать кнопку: по первому шагу макроса
+STEP_ICONS = {
+    "like": "btn_yandex_music_like_{style}_off",
+    "dislike": "btn_yandex_music_dislike_{style}_off",
+    "prev": "btn_yandex_music_prev_{style}",
+    "seek": "btn_yandex_music_prev_{style}",
+}
+
+
+def parse_macro(spec: str) -> list[dict]:
+    """
+    Разбирает строку вида "like, next, seek:0, seek:+15" в шаги для API.
+    seek:N — на N-ю секунду трека, seek:+N / seek:-N — сдвиг на N секунд.
+    """
+    steps = []
+    for token in (t.strip() for t in spec.split(",")):
+        if not token:
+            continue
+        action, _, arg = token.partition(":")
+        if action != "seek":
+            steps.append({"action": action})
+            continue
+        arg = arg.strip() or "0"
+        ms = int(float(arg) * 1000)
+        key = "offset_ms" if arg[0] in "+-" else "position_ms"
+        steps.append({"action": "seek", "params": {key: ms}})
+    return steps
+
+
+@action_handler("com.judd1.yandex_music.action.macro")
+class Macro(YandexMusicBaseAction):
+    """
+    Несколько команд на одну кнопку: пресет (macro_preset) или своя последовательность (macro_steps).
+    В режиме Ynison весь макрос уходит одной командой и одним обновлением плеера на стороне API.
+    """
+
+    @property
+    def steps(self) -> list[dict]:
+        spec = self.cfg.macro_steps or MACRO_PRESETS.get(self.cfg.macro_preset, "")
+        try:
+            return parse_macro(spec)
+        except ValueError:
+            Logger.error(f"[Macro] Invalid steps: {spec!r}")
+            return []
+
+    async def render_action(self):
+        steps = self.steps
+        first = steps[0]["action"] if steps else "next"
+        icon = STEP_ICONS.get(first, "btn_yandex_music_next_{style}")
+        style_key = "like_style" if first == "like" else "dislike_style" if first == "dislike" else "next_style"
+        icon = icon.format(style=self.settings.get(style_key, "v1"))
+
+        mode = self.get_mode()
+        loading = (mode == "local" and not self.cdp.is_connected) or (mode != "local" and not self.client.is_ready)
+        await self.set_image(f"{icon}_loading.png" if loading else f"{icon}.png")
+
+    async def on_key_down(self, obj: KeyDownModel):
+        steps = self.steps
+        if not steps:
+            await self.show_alert()
+            return
+
+        if self.get_mode() == "local":
+            ok = await self._run_local(steps)
+        else:
+            ok = await self.client.send_command(YnisonCommand.MACRO, {"steps": steps})
+        if not ok:
+            await self.show_alert()
+
+    async def _run_local(self, steps: list[dict]) -> bool:
+        """У десктопного клиента нет пакетного API, поэтому шаги выполняются по очереди через CDP."""
+        for step in steps:
+            params = step.get("params", {})
+            match step["action"]:
+                case "like": result = await self.cdp.toggle_like()
+                case "dislike": result = await self.cdp.toggle_dislike()
+                case "next": result = await self.cdp.next_track()
+                case "prev": result = await self.cdp.previous_track()
+                case "play_pause": result = await self.cdp.play_pause()
+                case "volume_up": result = await self.cdp.change_volume("UP")
+                case "volume_down": result = await self.cdp.change_volume("DOWN")
+                case "mute": result = await self.cdp.change_volume("MUTE")
+                case "seek" if "position_ms" in params:
+                    result = await self.cdp.seek("SET", params["position_ms"] / 1000)
+                case "seek":
+                    result = await self.cdp.seek("BY", params.get("offset_ms", 0) / 1000)
+                case other:
+                    Logger.error(f"[Macro] Unknown step: {other}")
+                    return False
+            if not result.success:
+                return False
+        return True
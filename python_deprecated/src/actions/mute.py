@@ -1,3 +1,4 @@
+from src.core.types import YnisonCommand
 from src.core.registry import action_handler
 from src.actions.mixins import VolumeObservable
 from src.core.schemas.events import KeyDownModel
@@ -38,7 +39,7 @@ class Mute(VolumeObservable, YandexMusicBaseAction):
         if mode == "local":
             await self.cdp.change_volume("MUTE")
         else:
-            pass
+            await self.client.send_command(YnisonCommand.MUTE)
 
     async def on_volume_update(self, data):
         await self.render()
@@ -0,0 +1,53 @@
+from src.core.logger import Logger
+from src.core.types import YnisonCommand
+from src.core.registry import action_handler
+from src.core.schemas.events import KeyDownModel
+from src.actions.base import YandexMusicBaseAction
+
+
+PRESET_KINDS = ("track", "album", "playlist")
+
+
+@action_handler("com.judd1.yandex_music.action.play_preset")
+class PlayPreset(YandexMusicBaseAction):
+    """
+    Быстрый запуск трека, альбома или плейлиста (preset_kind + preset_id).
+    Очередь разрешается на API заранее — при появлении кнопки и смене настроек,
+    так что нажатие сводится к одной отправке в Ynison без REST-запросов.
+    Плейлист задаётся как "owner:kind" или просто kind для своих плейлистов.
+    """
+
+    @property
+    def preset(self) -> tuple[str, str] | None:
+        kind, entity_id = self.cfg.preset_kind, self.cfg.preset_id.strip()
+        if kind not in PRESET_KINDS or not entity_id:
+            return None
+        return kind, entity_id
+
+    async def _prepare(self, preset: tuple[str, str]):
+        if await self.client.prepare_preset(*preset) is not None:
+            self._prepared = preset
+
+    async def render_action(self):
+        style = self.cfg.play_style
+        if self.get_mode() == "local" or not self.client.is_ready:
+            await self.set_image(f"btn_yandex_music_play_{style}_loading.png")
+            return
+
+        preset = self.preset
+        if preset and getattr(self, "_prepared", None) != preset:
+            self.start_task("prepare", self._prepare(preset))
+        await self.set_image(f"btn_yandex_music_play_{style}.png")
+
+    async def on_key_down(self, obj: KeyDownModel):
+        preset = self.preset
+        if self.get_mode() == "local" or not preset:
+            # у десктопного клиента нет API для запуска произвольной очереди
+            await self.show_alert()
+            return
+
+        kind, entity_id = preset
+        ok = await self.client.send_command(YnisonCommand.PLAY_PRESET, {"kind": kind, "entity_id": entity_id})
+        if not ok:
+            Logger.error(f"[PlayPreset] Failed to start {kind}:{entity_id}")
+            await self.show_alert()
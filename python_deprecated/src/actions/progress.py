@@ -1,24 +1,44 @@
 import time
 import asyncio
 from src.core.logger import Logger
+from src.core.types import YnisonCommand
+from src.core.scrubber import SeekScrubber
 from src.core.registry import action_handler
 from src.actions.base import YandexMusicBaseAction
 from src.actions.mixins import PlaybackObservable
 from src.core.renderers.progress import ProgressRenderer
-from src.core.schemas.events import WillAppearModel, WillDisappearModel
+from src.core.schemas.events import WillAppearModel, WillDisappearModel, KeyDownModel
 
 
 @action_handler("com.judd1.yandex_music.action.progress")
 class Progress(PlaybackObservable, YandexMusicBaseAction):
-    """Кнопка с прогресс-баром прослушивания"""
+    """Кнопка с прогресс-баром прослушивания. В режиме scrub нажатия перематывают трек."""
     def __init__(self, action: str, context: str, settings: dict, plugin, **kwargs):
         self.renderer = ProgressRenderer()
         super().__init__(action, context, settings, plugin, **kwargs)
+        self.scrubber = SeekScrubber(self._send_seek, interval=self.cfg.scrub_interval_ms / 1000)
+
+    async def _send_seek(self, position_ms: int):
+        if self.get_mode() == "local":
+            await self.cdp.seek("SET", position_ms / 1000)
+        else:
+            await self.client.send_command(YnisonCommand.SEEK, {"position_ms": position_ms})
+
+    async def _scrub(self, steps: int):
+        if not self.cfg.progress_scrub or not steps:
+            return
+        progress, duration = self._playback_position()
+        self.scrubber.interval = self.cfg.scrub_interval_ms / 1000
+        self.scrubber.nudge(steps * self.cfg.scrub_step_sec * 1000, progress, duration)
+        await self.render()
+
+    async def on_key_down(self, obj: KeyDownModel):
+        await self._scrub(1)
 
     async def progress_loop(self):
         while True:
             try:
-                mode = self.settings.get("control_mode", "local")
+                mode = self.get_mode()
                 should_sleep = False
                 
                 if mode == "local":
@@ -43,14 +63,15 @@ class Progress(PlaybackObservable, YandexMusicBaseAction):
         self.start_task("progress", self.progress_loop())
 
     async def on_will_disappear(self, obj: WillDisappearModel):
+        self.scrubber.cancel()
         await super().on_will_disappear(obj)
 
-    async def render(self):
-        mode = self.settings.get("progress_mode", "stacked")
+    def _playback_position(self):
+        """Текущие (progress, duration) в мс с учётом времени, прошедшего с последнего апдейта."""
         progress = 0
         duration = 0
         
-        control_mode = self.settings.get("control_mode", "local")
+        control_mode = self.get_mode()
         if control_mode == "local":
              if self.cdp.is_connected:
                  pb = self.cdp.playback_state
@@ -73,6 +94,14 @@ class Progress(PlaybackObservable, YandexMusicBaseAction):
                 elapsed_ms = (time.time() - self.client.last_state_update_time) * 1000
                 progress += elapsed_ms
                 if progress > duration: progress = duration
+
+        return progress, duration
+
+    async def render(self):
+        mode = self.settings.get("progress_mode", "stacked")
+        progress, duration = self._playback_position()
+        if self.scrubber.active:
+            progress = self.scrubber.target_ms
             
         loop = asyncio.get_running_loop()
         b64 = await loop.run_in_executor(
@@ -465,5 +465,19 @@ class CDPMediaController:
                 
         return result
 
+    async def seek(self, action: str, value: float = 0):
+        """
+        Перемотка: action "SET" — на абсолютную позицию, "BY" — относительно текущей; value в секундах.
+        """
+        result = await self._exec_command(JSMethod.SEEK, action, value)
+        if result.success and result.position is not None:
+            pb = self.last_state.playback
+            pb.current_sec = result.position
+            if pb.total_sec: pb.progress = result.position / pb.total_sec
+            pb.timestamp = time.time()
+            self._playback_optimistic_until = time.time() + 1.0
+            self._notify_observers(EventType.PLAYBACK, pb)
+        return result
+
 def get_cdp_controller():
     return CDPMediaController()
@@ -23,16 +23,20 @@ class Logger:
             cls._instance = Logger()
         return cls._instance
     
+    @staticmethod
+    def log_dir() -> str:
+        """Каталог plugin.log; рядом с ним пишутся и профили (src/core/profiler.py)."""
+        if getattr(sys, 'frozen', False):
+            return os.path.join(os.path.dirname(sys.executable), 'logs')
+        return os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs')
+
     @classmethod
     def _setup_logger(cls):
         if cls._logger is None:
             cls._logger = logging.getLogger('StreamDock')
             cls._logger.setLevel(logging.INFO)
             
-            if getattr(sys, 'frozen', False):
-                base_path = os.path.join(os.path.dirname(sys.executable), 'logs')
-            else:
-                base_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs')
+            base_path = cls.log_dir()
             
             try:
                 os.makedirs(base_path, exist_ok=True)
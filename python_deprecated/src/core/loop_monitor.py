@@ -0,0 +1,92 @@
+import sys
+import time
+import bisect
+import asyncio
+import threading
+from collections import Counter
+from src.core.logger import Logger
+from src.core.profiler import collapse
+from typing import List, Optional
+
+
+LAG_BUCKETS_MS = (5, 25, 100, 250, 1000)
+
+
+class LoopMonitor(threading.Thread):
+    """
+    Сторож event loop плагина в отдельном потоке.
+
+    Каждые `interval` секунд кладёт в цикл пустой колбэк (call_soon_threadsafe) и меряет, через сколько
+    он выполнился — это задержка планирования. Если дольше `threshold`, цикл чем-то занят (рендер PIL,
+    разбор большого кадра, синхронный лог): пока колбэк не выполнится, снимаются стек потока цикла
+    и текущая задача, и блокировка пишется в plugin.log. Раз в `report_every` секунд туда же уходит
+    гистограмма задержек.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, threshold: float = 0.2, interval: float = 0.25,
+                 sample_every: float = 0.01, report_every: float = 300.0):
+        super().__init__(name="loop-monitor", daemon=True)
+        self.loop = loop
+        self.threshold = threshold
+        self.interval = interval
+        self.sample_every = sample_every
+        self.report_every = report_every
+        self.lags: List[float] = []
+        self.blocks = 0
+        self._thread_id: Optional[int] = None
+        self._done = threading.Event()
+
+    def start(self):
+        self._thread_id = threading.get_ident()  # запускается из потока цикла
+        super().start()
+
+    def stop(self):
+        self._done.set()
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        reported = time.monotonic()
+        while not self._done.wait(self.interval):
+            pong = threading.Event()
+            sent = time.monotonic()
+            try:
+                self.loop.call_soon_threadsafe(pong.set)
+            except RuntimeError:  # цикл закрыт
+                return
+            if not pong.wait(self.threshold):
+                self._trace_block(pong, sent)
+            self.lags.append(time.monotonic() - sent)
+            if time.monotonic() - reported >= self.report_every:
+                Logger.info(self.report())
+                reported = time.monotonic()
+
+    def _trace_block(self, pong: threading.Event, sent: float):
+        stacks, tasks = Counter(), Counter()
+        while not pong.is_set() and not self._done.is_set():
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                stacks[collapse(frame)] += 1
+                task = asyncio.current_task(self.loop)
+                tasks[getattr(task.get_coro(), "__qualname__", "?") if task else "callback"] += 1
+            del frame
+            pong.wait(self.sample_every)
+        if not stacks:
+            return
+        self.blocks += 1
+        frames = stacks.most_common(1)[0][0].split(";")
+        Logger.warning(f"Event loop blocked {(time.monotonic() - sent) * 1000:.0f} ms in {tasks.most_common(1)[0][0]}: "
+                       f"{' <- '.join(reversed(frames[-6:]))}")
+
+    def report(self) -> str:
+        """Гистограмма задержек с прошлого отчёта; счётчики сбрасываются."""
+        lags, blocks = sorted(self.lags), self.blocks
+        self.lags, self.blocks = [], 0
+        if not lags:
+            return "Loop lag: no samples"
+        names = [f"<={b}" for b in LAG_BUCKETS_MS] + [f">{LAG_BUCKETS_MS[-1]}"]
+        counts = Counter(names[bisect.bisect_left(LAG_BUCKETS_MS, lag * 1000)] for lag in lags)
+        histogram = ", ".join(f"{name} ms: {counts[name]}" for name in names if counts[name])
+        p50, p99 = lags[len(lags) // 2], lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+        return (f"Loop lag over {len(lags)} probes: p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms, "
+                f"max {lags[-1] * 1000:.0f} ms, blocks {blocks} [{histogram}]")
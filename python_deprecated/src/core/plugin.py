@@ -1,15 +1,17 @@
 import aiohttp
 import asyncio
 import src.actions
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from src.core.action import Action
 from src.core.logger import Logger
+from src.core.loop_monitor import LoopMonitor
 from src.core.schemas.events import *
 from src.core.registry import ACTION_REGISTRY
 from src.core.mixins.router import RouterMixin
+from src.core.mixins.task import BackgroundTaskMixin
 from src.core.event_handlers import PluginEventHandlersMixin
 
-class Plugin(RouterMixin, PluginEventHandlersMixin):
+class Plugin(RouterMixin, PluginEventHandlersMixin, BackgroundTaskMixin):
     def __init__(self, port: int, plugin_uuid: str, event: str, info: Dict[str, Any]):
         self.port = port
         self.plugin_uuid = plugin_uuid
@@ -21,6 +23,7 @@ class Plugin(RouterMixin, PluginEventHandlersMixin):
         self.running = False
         self.ws_session = None
         self.ws = None
+        self.loop_monitor: Optional[LoopMonitor] = None
         
         try:
             from src.core.cdp import get_cdp_controller
@@ -38,6 +41,9 @@ class Plugin(RouterMixin, PluginEventHandlersMixin):
 
     def cleanup(self):
         self.running = False
+        self.cancel_all_tasks()
+        if self.loop_monitor:
+            self.loop_monitor.stop()
         if self.cdp:
             self.cdp.stop()
         if self.client:
@@ -56,6 +62,8 @@ class Plugin(RouterMixin, PluginEventHandlersMixin):
         """
         self.running = True
         Logger.info("Plugin Run Loop Started")
+        self.loop_monitor = LoopMonitor(asyncio.get_running_loop())
+        self.loop_monitor.start()
 
         if hasattr(self.cdp, "start_async"):
              asyncio.create_task(self.cdp.start_async())
@@ -213,6 +221,12 @@ class Plugin(RouterMixin, PluginEventHandlersMixin):
                     await self.set_settings(act.context, act.settings)
                 
                 await self.recalculate_ynison_state()
+
+            elif obj.payload.get("event") == "profile":
+                from src.core.profiler import write_profile
+                self.start_task("profile", write_profile(
+                    obj.payload.get("mode", "cpu"), float(obj.payload.get("seconds", 10))
+                ))
         except Exception as e:
             Logger.warn(f"on_send_to_plugin parse error or ignore: {e}")
 
@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import tracemalloc
+from collections import Counter
+from src.core.logger import Logger
+from typing import Optional
+
+
+MODES = ("cpu", "alloc")
+MAX_SECONDS = 60.0
+
+
+def collapse(frame) -> str:
+    """Стек от внешнего вызова к внутреннему: "main.py:<module>;base_events.py:run_forever;..."."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}")  # co_qualname — с 3.11
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """
+    Сэмплер стека потока event loop: раз в `interval` секунд снимает его через sys._current_frames
+    и копит свёрнутые стеки "a;b;c N" (вход для flamegraph.pl / speedscope).
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.01):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+            del frame
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+async def profile_cpu(seconds: float) -> str:
+    sampler = StackSampler(threading.get_ident())
+    sampler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+    return "".join(f"{stack} {count}\n" for stack, count in sampler.stacks.most_common())
+
+
+async def profile_alloc(seconds: float, limit: int = 30) -> str:
+    """Рост аллокаций за окно по tracemalloc; на время окна плагин заметно медленнее."""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(5)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+    lines = []
+    for stat in after.compare_to(before, "traceback")[:limit]:
+        lines.append(f"{stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks), now {stat.size / 1024:.1f} KiB")
+        lines.extend(f"    {line}" for line in stat.traceback.format(most_recent_first=True))
+    return "\n".join(lines) + "\n"
+
+
+async def write_profile(mode: str = "cpu", seconds: float = 10.0, directory: Optional[str] = None) -> Optional[str]:
+    """
+    Снимает профиль и пишет его рядом с plugin.log: profile-<mode>-<время>.txt.
+    Запускается событием sendToPlugin {"event": "profile", "mode": "cpu"|"alloc", "seconds": N}.
+    Возвращает путь к файлу или None, если параметры неверны.
+    """
+    if mode not in MODES or not 0 < seconds <= MAX_SECONDS:
+        Logger.warning(f"Profile ignored: mode={mode!r} seconds={seconds!r}")
+        return None
+
+    Logger.info(f"Profiling ({mode}) for {seconds:g} s...")
+    text = await (profile_cpu(seconds) if mode == "cpu" else profile_alloc(seconds))
+
+    directory = directory or Logger.log_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"profile-{mode}-{time.strftime('%Y%m%d-%H%M%S')}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    Logger.info(f"Profile written to {path}")
+    return path
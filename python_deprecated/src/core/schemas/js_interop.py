@@ -12,6 +12,7 @@ class JSMethod(str, Enum):
     TOGGLE_LIKE = "toggleLike"
     TOGGLE_DISLIKE = "toggleDislike"
     CHANGE_VOLUME = "changeVolume"
+    SEEK = "seek"
 
     def __str__(self):
         return self.value
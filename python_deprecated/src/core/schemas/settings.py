@@ -15,6 +15,13 @@ class PluginSettings:
     like_style: str = "v1"
     dislike_style: str = "v1"
     progress_mode: str = "stacked"
+    progress_scrub: bool = False
+    scrub_step_sec: int = 10
+    scrub_interval_ms: int = 300
+    macro_preset: str = "like_next"
+    macro_steps: str = ""
+    preset_kind: str = "track"
+    preset_id: str = ""
     volume_style: str = "v1"
     mute_style: str = "v1"
     
@@ -34,6 +41,13 @@ class PluginSettings:
             like_style=data.get("like_style", "v1"),
             dislike_style=data.get("dislike_style", "v1"),
             progress_mode=data.get("progress_mode", "stacked"),
+            progress_scrub=data.get("progress_scrub", False),
+            scrub_step_sec=data.get("scrub_step_sec", 10),
+            scrub_interval_ms=data.get("scrub_interval_ms", 300),
+            macro_preset=data.get("macro_preset", "like_next"),
+            macro_steps=data.get("macro_steps", ""),
+            preset_kind=data.get("preset_kind", "track"),
+            preset_id=data.get("preset_id", ""),
             volume_style=data.get("volume_style", "v1"),
             mute_style=data.get("mute_style", "v1"),
             show_cover=data.get("show_cover", True),
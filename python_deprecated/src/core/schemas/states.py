@@ -118,6 +118,7 @@ class ActionResultData:
     is_playing: Optional[bool] = None
     volume: Optional[float] = None
     is_muted: Optional[bool] = None
+    position: Optional[float] = None
     
     @classmethod
     def from_dict(cls, data: dict):
@@ -129,5 +130,6 @@ class ActionResultData:
             new_state=data.get("new_state") if "new_state" in data else data.get("is_disliked"),
             is_playing=data.get("is_playing"),
             volume=data.get("volume"),
-            is_muted=data.get("is_muted")
+            is_muted=data.get("is_muted"),
+            position=data.get("position")
         )
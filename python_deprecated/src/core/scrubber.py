@@ -0,0 +1,61 @@
+import time
+import asyncio
+from src.core.logger import Logger
+from typing import Awaitable, Callable, Optional
+
+
+class SeekScrubber:
+    """
+    Копит нажатия в одну абсолютную цель перемотки.
+
+    Цель отправляется не чаще раза в `interval` секунд: промежуточные позиции
+    не уходят ни в Ynison, ни в десктопный клиент. Пока идёт перемотка (и ещё `hold`
+    секунд после неё) следующий шаг считается от цели, а не от позиции плеера,
+    которая может ещё не успеть обновиться.
+    """
+
+    def __init__(self, send: Callable[[int], Awaitable[object]], interval: float = 0.3, hold: float = 2.0):
+        self.send = send
+        self.interval = interval
+        self.hold = hold
+        self.target_ms: Optional[int] = None
+        self._dirty = False
+        self._last_sent = 0.0
+        self._last_nudge = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        return self.target_ms is not None and time.monotonic() - self._last_nudge < self.hold
+
+    def nudge(self, delta_ms: int, current_ms: float, duration_ms: float = 0) -> int:
+        base = self.target_ms if self.active else current_ms
+        target = max(0, int(base + delta_ms))
+        if duration_ms:
+            target = min(target, int(duration_ms))
+
+        self.target_ms = target
+        self._dirty = True
+        self._last_nudge = time.monotonic()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_later())
+        return target
+
+    async def _flush_later(self):
+        while self._dirty:
+            wait = self._last_sent + self.interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._dirty = False
+            self._last_sent = time.monotonic()
+            try:
+                await self.send(self.target_ms)
+            except Exception as e:
+                Logger.error(f"Seek failed: {e}")
+
+    def cancel(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        self._dirty = False
+        self.target_ms = None
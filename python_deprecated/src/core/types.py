@@ -9,6 +9,10 @@ class YnisonCommand(str, Enum):
     DISLIKE = "dislike"
     VOLUME_UP = "volume_up"
     VOLUME_DOWN = "volume_down"
+    MUTE = "mute"
+    SEEK = "seek"
+    MACRO = "macro"
+    PLAY_PRESET = "play_preset"
 
 
 class HealthStatus(str, Enum):
@@ -1,6 +1,7 @@
 import os
 import time
 import json
+import uuid
 import asyncio
 import logging
 import aiohttp
@@ -33,12 +34,16 @@ class YandexMusicClient:
         
         self.running = False
         self._ws_task = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._pending_acks: Dict[str, asyncio.Future] = {}
+        self.ws_ack_timeout = 1.5
         
         self.enabled = True 
         self._enabled_event = asyncio.Event() 
         self._token_event = asyncio.Event()
         
         self.current_state = None
+        self.state_is_stale = False  # current_state пришёл из снимка прошлого запуска API
         self.current_track_data = None
         self.current_cover_data = None
         self.current_cover_img = None
@@ -141,20 +146,25 @@ class YandexMusicClient:
                 headers = {"Authorization": self.token}
                 async with self.session.ws_connect(self.ws_url, headers=headers, timeout=10) as ws:
                     self.ws_connected = True
-                    async for msg in ws:
-                        if not self.running: break
-                        match msg.type:
-                            case aiohttp.WSMsgType.TEXT:
-                                await self.on_api_message(msg.data)
-                            case aiohttp.WSMsgType.CLOSED:
-                                if msg.extra == 4001:
-                                    self.is_auth_error = True
-                                    self._token_event.clear()
-                                break
-                            case aiohttp.WSMsgType.ERROR:
-                                break
-                            case _:
-                                pass
+                    self._ws = ws
+                    try:
+                        async for msg in ws:
+                            if not self.running: break
+                            match msg.type:
+                                case aiohttp.WSMsgType.TEXT:
+                                    await self.on_api_message(msg.data)
+                                case aiohttp.WSMsgType.CLOSED:
+                                    if msg.extra == 4001:
+                                        self.is_auth_error = True
+                                        self._token_event.clear()
+                                    break
+                                case aiohttp.WSMsgType.ERROR:
+                                    break
+                                case _:
+                                    pass
+                    finally:
+                        self._ws = None
+                        self._fail_pending_acks()
                     self.ws_connected = False
                     self.is_ready = False
                     if not self.is_auth_error and ws.close_code == 4001:
@@ -184,9 +194,13 @@ class YandexMusicClient:
             if self.is_auth_error:
                 self.is_auth_error = False
             state = json.loads(data)
+            if "event" in state:
+                await self.on_api_event(state)
+                return
             self.last_state_update_time = time.time()
-            if not self.current_state:
+            if not self.current_state or self.state_is_stale:
                 self.current_state = state
+                self.state_is_stale = False
             else:
                 self.deep_update(self.current_state, state)
             
@@ -195,6 +209,29 @@ class YandexMusicClient:
         except:
             pass
 
+    async def on_api_event(self, event: dict):
+        """Служебные события API (результаты команд и т.п.) — это не стейт, в current_state их не мержим."""
+        if event.get("event") == "command_ack":
+            fut = self._pending_acks.pop(event.get("request_id"), None)
+            if fut and not fut.done():
+                fut.set_result(event)
+        elif event.get("event") == "snapshot":
+            # снимок с прошлого запуска API: показываем, пока не придёт живой стейт, но поверх живого не кладём
+            if self.current_state and not self.state_is_stale:
+                return
+            self.current_state = event.get("state") or {}
+            self.state_is_stale = bool(event.get("stale", True))
+            await self.process_track_data()
+            await self._notify_ui()
+        elif event.get("event") == "command_result" and event.get("status") == "failed":
+            logger.warning(f"Command {event.get('action')} failed: {event.get('error')}")
+
+    def _fail_pending_acks(self):
+        for fut in self._pending_acks.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError("WS closed before ack"))
+        self._pending_acks.clear()
+
     def deep_update(self, target, source):
         for k, v in source.items():
             if isinstance(v, dict) and k in target and isinstance(target[k], dict):
@@ -273,19 +310,73 @@ class YandexMusicClient:
         except:
             pass
 
-    async def send_command(self, command: Union[YnisonCommand, str]):
+    async def send_command(self, command: Union[YnisonCommand, str], params: Optional[dict] = None):
+        """Отправляет команду через уже открытый /ws, а если сокета нет — обычным POST /control."""
         if not self.token or not self.session: return False
         
         endpoint = command.value if isinstance(command, YnisonCommand) else command
+        delivered = await self._send_ws_command(endpoint, params)
+        if delivered is not None:
+            return delivered
+        return await self._send_http_command(endpoint, params)
+
+    async def _send_ws_command(self, action: str, params: Optional[dict] = None) -> Optional[bool]:
+        """
+        None — команду в сокет отправить не удалось, можно смело идти через HTTP.
+        Если же сообщение ушло, повторять по HTTP нельзя (команда выполнилась бы дважды),
+        поэтому таймаут ожидания ack — это просто False.
+        """
+        ws = self._ws
+        if ws is None or ws.closed:
+            return None
+
+        request_id = uuid.uuid4().hex
+        fut = asyncio.get_running_loop().create_future()
+        self._pending_acks[request_id] = fut
+        try:
+            message = {"type": "command", "id": request_id, "action": action}
+            if params:
+                message["params"] = params
+            await ws.send_str(json.dumps(message))
+        except Exception as e:
+            self._pending_acks.pop(request_id, None)
+            logger.debug(f"WS command send failed, falling back to HTTP: {e}")
+            return None
+
+        try:
+            ack = await asyncio.wait_for(fut, timeout=self.ws_ack_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            self._pending_acks.pop(request_id, None)
+            logger.warning(f"No ack for WS command {action}")
+            return False
+        return ack.get("status") == "accepted"
+
+    async def _send_http_command(self, endpoint: str, params: Optional[dict] = None) -> bool:
         url = f"{self.api_base}/control/{endpoint}"
         
         headers = {"Authorization": f"Bearer {self.token}"}
         try:
-            async with self.session.post(url, headers=headers) as resp:
-                return resp.status == 200
+            async with self.session.post(url, headers=headers, json=params) as resp:
+                return resp.status in (200, 202)
         except:
             return False
 
+    async def prepare_preset(self, kind: str, entity_id: str) -> Optional[dict]:
+        """Просит API заранее разрешить пресет, чтобы нажатие не ждало REST-запросов."""
+        if not self.token or not self.session: return None
+
+        url = f"{self.api_base}/presets/{kind}/{entity_id}"
+        headers = {"Authorization": f"Bearer {self.token}"}
+        try:
+            async with self.session.post(url, headers=headers) as resp:
+                if resp.status != 200:
+                    logger.warning(f"Preset {kind}:{entity_id} not prepared: HTTP {resp.status}")
+                    return None
+                return await resp.json()
+        except Exception as e:
+            logger.debug(f"Preset prepare failed: {e}")
+            return None
+
     @property
     def is_paused(self):
         if not self.current_state:
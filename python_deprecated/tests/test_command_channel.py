@@ -0,0 +1,72 @@
+import json
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+from src.core.ynison import YandexMusicClient
+from src.core.types import YnisonCommand
+
+
+class FakeWS:
+    def __init__(self, client, status="accepted", fail=False, silent=False):
+        self.client = client
+        self.status = status
+        self.fail = fail
+        self.silent = silent
+        self.closed = False
+        self.sent = []
+
+    async def send_str(self, data):
+        if self.fail:
+            raise ConnectionResetError("gone")
+        message = json.loads(data)
+        self.sent.append(message)
+        if not self.silent:
+            ack = {"event": "command_ack", "request_id": message["id"], "status": self.status}
+            asyncio.get_running_loop().call_soon(
+                asyncio.ensure_future, self.client.on_api_message(json.dumps(ack))
+            )
+
+
+class TestCommandChannel(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        YandexMusicClient._instance = None
+        self.client = YandexMusicClient()
+        self.client.token = "token"
+        self.client.session = object()
+        self.client._send_http_command = AsyncMock(return_value=True)
+        self.client.ws_ack_timeout = 0.2
+
+    def tearDown(self):
+        YandexMusicClient._instance = None
+
+    async def test_prefers_ws_channel(self):
+        ws = self.client._ws = FakeWS(self.client)
+        self.assertTrue(await self.client.send_command(YnisonCommand.NEXT))
+        self.assertEqual(ws.sent[0]["type"], "command")
+        self.assertEqual(ws.sent[0]["action"], "next")
+        self.client._send_http_command.assert_not_called()
+        self.assertEqual(self.client._pending_acks, {})
+
+    async def test_rejected_ack(self):
+        self.client._ws = FakeWS(self.client, status="rejected")
+        self.assertFalse(await self.client.send_command("bogus"))
+        self.client._send_http_command.assert_not_called()
+
+    async def test_falls_back_to_http_without_socket(self):
+        self.assertTrue(await self.client.send_command(YnisonCommand.PREV))
+        self.client._send_http_command.assert_awaited_once_with("prev", None)
+
+    async def test_falls_back_to_http_when_send_fails(self):
+        self.client._ws = FakeWS(self.client, fail=True)
+        self.assertTrue(await self.client.send_command(YnisonCommand.PLAY_PAUSE))
+        self.client._send_http_command.assert_awaited_once()
+
+    async def test_no_http_retry_after_ack_timeout(self):
+        self.client._ws = FakeWS(self.client, silent=True)
+        self.assertFalse(await self.client.send_command(YnisonCommand.LIKE))
+        self.client._send_http_command.assert_not_called()
+        self.assertEqual(self.client._pending_acks, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
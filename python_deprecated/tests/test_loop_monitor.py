@@ -0,0 +1,45 @@
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+from src.core.loop_monitor import LoopMonitor
+
+
+def render_fallback(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestLoopMonitor(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.monitor = LoopMonitor(asyncio.get_running_loop(), threshold=0.05, interval=0.02)
+        self.monitor.start()
+
+    async def asyncTearDown(self):
+        self.monitor.stop()
+
+    async def test_block_logged_with_task_and_stack(self):
+        async def render():
+            await asyncio.sleep(0.05)
+            render_fallback(0.3)
+
+        with patch("src.core.loop_monitor.Logger.warning") as warning:
+            await asyncio.create_task(render())
+            await asyncio.sleep(0.05)
+
+        message, = [call.args[0] for call in warning.call_args_list]
+        self.assertIn(f"in {render.__qualname__}: test_loop_monitor.py:render_fallback <- ", message)
+        self.assertEqual(self.monitor.blocks, 1)
+
+    async def test_report_histogram(self):
+        await asyncio.sleep(0.2)
+        self.monitor.lags.append(0.3)
+        report = self.monitor.report()
+        self.assertIn("<=5 ms: ", report)
+        self.assertIn("<=1000 ms: 1", report)
+        self.assertEqual(self.monitor.lags, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+from src.actions.macro import parse_macro, MACRO_PRESETS
+
+
+class TestParseMacro(unittest.TestCase):
+    def test_presets_parse(self):
+        for spec in MACRO_PRESETS.values():
+            self.assertTrue(parse_macro(spec))
+
+    def test_plain_steps(self):
+        self.assertEqual(parse_macro("like, next"), [{"action": "like"}, {"action": "next"}])
+
+    def test_seek_absolute_and_relative(self):
+        self.assertEqual(parse_macro("seek:0, seek:+15, seek:-2.5"), [
+            {"action": "seek", "params": {"position_ms": 0}},
+            {"action": "seek", "params": {"offset_ms": 15000}},
+            {"action": "seek", "params": {"offset_ms": -2500}},
+        ])
+
+    def test_blank_tokens_ignored(self):
+        self.assertEqual(parse_macro(" next,, "), [{"action": "next"}])
+
+    def test_bad_seek_value(self):
+        with self.assertRaises(ValueError):
+            parse_macro("seek:soon")
+
+
+if __name__ == "__main__":
+    unittest.main()
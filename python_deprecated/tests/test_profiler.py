@@ -0,0 +1,44 @@
+import os
+import time
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+from src.core.profiler import write_profile
+
+
+def busy_render(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestWriteProfile(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # настоящий Logger пишет в logs/plugin.log рабочего дерева
+        logger = patch("src.core.profiler.Logger")
+        self.logger = logger.start()
+        self.addCleanup(logger.stop)
+
+    async def test_cpu_profile_written_next_to_log(self):
+        async def blocker():
+            await asyncio.sleep(0.05)
+            busy_render(0.2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            task = asyncio.create_task(blocker())
+            path = await write_profile("cpu", 0.4, directory=directory)
+            await task
+            self.assertEqual(os.path.dirname(path), directory)
+            with open(path, encoding="utf-8") as f:
+                self.assertIn("test_profiler.py:busy_render", f.read())
+
+    async def test_bad_mode_ignored(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertIsNone(await write_profile("io", 1, directory=directory))
+            self.assertEqual(os.listdir(directory), [])
+        self.logger.warning.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import time
+import asyncio
+import unittest
+from src.core.scrubber import SeekScrubber
+
+
+class TestSeekScrubber(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_is_one_seek(self):
+        sent = []
+
+        async def send(ms):
+            sent.append(ms)
+
+        scrubber = SeekScrubber(send, interval=0.05)
+        scrubber._last_sent = time.monotonic()  # первая отправка тоже ждёт окно
+        for _ in range(5):
+            scrubber.nudge(10_000, current_ms=30_000, duration_ms=200_000)
+
+        await asyncio.sleep(0.15)
+        self.assertEqual(sent, [80_000])
+
+    async def test_rate_limited_while_scrubbing(self):
+        sent = []
+
+        async def send(ms):
+            sent.append(ms)
+
+        scrubber = SeekScrubber(send, interval=0.05)
+        for _ in range(10):
+            scrubber.nudge(1_000, current_ms=0)
+            await asyncio.sleep(0.01)
+
+        await asyncio.sleep(0.1)
+        self.assertLess(len(sent), 10)
+        self.assertEqual(sent[-1], 10_000)
+
+    async def test_clamped_to_track(self):
+        sent = []
+
+        async def send(ms):
+            sent.append(ms)
+
+        scrubber = SeekScrubber(send, interval=0.01)
+        self.assertEqual(scrubber.nudge(-5_000, current_ms=2_000), 0)
+        self.assertEqual(scrubber.nudge(500_000, current_ms=2_000, duration_ms=180_000), 180_000)
+        await asyncio.sleep(0.05)
+        self.assertEqual(sent[-1], 180_000)
+
+
+if __name__ == "__main__":
+    unittest.main()